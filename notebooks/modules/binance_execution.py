@@ -0,0 +1,239 @@
+"""
+Async Binance Execution for Bitcoin Trading Agent
+
+Purpose: Non-blocking order execution for trade_executor_03. The synchronous binance Client blocked
+the event loop on every order, and order sizes were only checked against a hardcoded 0.0001 BTC.
+
+- AsyncBinanceExecutor wraps python-binance's AsyncClient (one pooled aiohttp session, keep-alive),
+  created lazily with the API key / secret of the existing sync Client; testnet and the REST base
+  URL are passed explicitly (the sync Client is built without testnet=True, only its API_URL is set)
+- Exchange filters from exchangeInfo are cached per symbol for FILTER_CACHE_TTL_SECONDS
+  (shared by all executors): LOT_SIZE / MARKET_LOT_SIZE, MIN_NOTIONAL / NOTIONAL, PRICE_FILTER
+  and the quote asset precision
+- Orders are rounded and validated locally before they are sent: quantities are floored to the
+  step size, quote amounts to the quote precision, and an order below minQty / minNotional (or
+  above maxQty) raises OrderRejected without a network round-trip
+
+Usage:
+    executor = get_async_executor(client, testnet_mode, client.API_URL)   # client: binance.client.Client
+    order = await executor.market_buy('BTCUSDT', 150, current_price)
+    order = await executor.market_sell('BTCUSDT', 0.0012345, current_price)
+    await close_async_executors()
+
+Dependencies: python-binance (AsyncClient, aiohttp)
+"""
+
+import asyncio
+import time
+from decimal import Decimal, ROUND_DOWN
+
+from binance import AsyncClient
+
+FILTER_CACHE_TTL_SECONDS = 3600   # exchangeInfo filters change rarely
+
+_filter_cache = {}   # symbol -> (loaded_at, SymbolFilters)
+_executors = {}      # (id(sync client), id(event loop)) -> AsyncBinanceExecutor
+
+
+class OrderRejected(Exception):
+    """The order breaks an exchange filter; it was not sent."""
+
+
+def _decimal(value, default='0'):
+    return Decimal(str(value if value not in (None, '') else default))
+
+
+def _floor_to_step(value, step):
+    value = _decimal(value)
+    if step <= 0:
+        return value
+    return (value / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+
+def _format(value):
+    text = format(value.normalize(), 'f')
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+class SymbolFilters:
+    def __init__(self, symbol, min_qty, max_qty, step_size, market_min_qty, market_max_qty, market_step_size,
+                 min_notional, apply_min_to_market, max_notional, tick_size, min_price, max_price, quote_precision):
+        self.symbol = symbol
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+        self.step_size = step_size
+        self.market_min_qty = market_min_qty
+        self.market_max_qty = market_max_qty
+        self.market_step_size = market_step_size
+        self.min_notional = min_notional
+        self.apply_min_to_market = apply_min_to_market
+        self.max_notional = max_notional
+        self.tick_size = tick_size
+        self.min_price = min_price
+        self.max_price = max_price
+        self.quote_precision = quote_precision
+
+    @classmethod
+    def from_symbol_info(cls, info):
+        filters = {f['filterType']: f for f in info.get('filters', [])}
+        lot = filters.get('LOT_SIZE', {})
+        market_lot = filters.get('MARKET_LOT_SIZE', {})
+        price = filters.get('PRICE_FILTER', {})
+        notional = filters.get('NOTIONAL') or filters.get('MIN_NOTIONAL') or {}
+        apply_to_market = notional.get('applyMinToMarket', notional.get('applyToMarket', True))
+        # MARKET_LOT_SIZE values of 0 mean "use LOT_SIZE"
+        market_step = _decimal(market_lot.get('stepSize'))
+        market_min = _decimal(market_lot.get('minQty'))
+        market_max = _decimal(market_lot.get('maxQty'))
+        return cls(
+            symbol=info.get('symbol'),
+            min_qty=_decimal(lot.get('minQty')),
+            max_qty=_decimal(lot.get('maxQty')),
+            step_size=_decimal(lot.get('stepSize')),
+            market_min_qty=market_min if market_min > 0 else None,
+            market_max_qty=market_max if market_max > 0 else None,
+            market_step_size=market_step if market_step > 0 else None,
+            min_notional=_decimal(notional.get('minNotional')),
+            apply_min_to_market=bool(apply_to_market),
+            max_notional=_decimal(notional.get('maxNotional')) if notional.get('maxNotional') else None,
+            tick_size=_decimal(price.get('tickSize')),
+            min_price=_decimal(price.get('minPrice')),
+            max_price=_decimal(price.get('maxPrice')),
+            quote_precision=int(info.get('quoteAssetPrecision', info.get('quotePrecision', 8))),
+        )
+
+    def round_price(self, price):
+        """Price floored to the tick size (PRICE_FILTER), e.g. for limit orders."""
+        return _floor_to_step(price, self.tick_size)
+
+    def check_price(self, price):
+        price = self.round_price(price)
+        if self.min_price > 0 and price < self.min_price:
+            raise OrderRejected(f"{self.symbol} price {price} below minPrice {self.min_price}")
+        if self.max_price > 0 and price > self.max_price:
+            raise OrderRejected(f"{self.symbol} price {price} above maxPrice {self.max_price}")
+        return price
+
+    def _check_notional(self, notional):
+        if self.apply_min_to_market and self.min_notional > 0 and notional < self.min_notional:
+            raise OrderRejected(f"{self.symbol} order value {notional:.2f} below minNotional {self.min_notional}")
+        if self.max_notional and notional > self.max_notional:
+            raise OrderRejected(f"{self.symbol} order value {notional:.2f} above maxNotional {self.max_notional}")
+
+    def market_quantity(self, quantity, price):
+        """Market order quantity floored to the step size and checked; returns the order string."""
+        step = self.market_step_size or self.step_size
+        min_qty = max(self.min_qty, self.market_min_qty or 0)
+        max_qty = self.market_max_qty or self.max_qty
+        rounded = _floor_to_step(quantity, step)
+        if rounded <= 0 or rounded < min_qty:
+            raise OrderRejected(f"{self.symbol} quantity {quantity} rounds to {rounded}, below minQty {min_qty}")
+        if max_qty > 0 and rounded > max_qty:
+            raise OrderRejected(f"{self.symbol} quantity {rounded} above maxQty {max_qty}")
+        self._check_notional(rounded * _decimal(price))
+        return _format(rounded)
+
+    def market_quote_amount(self, amount, price):
+        """quoteOrderQty floored to the quote precision and checked; returns the order string."""
+        rounded = _floor_to_step(amount, Decimal(1).scaleb(-self.quote_precision))
+        if rounded <= 0:
+            raise OrderRejected(f"{self.symbol} quote amount {amount} rounds to 0")
+        self._check_notional(rounded)
+        # The resulting quantity must still clear the lot size at the current price
+        quantity = rounded / _decimal(price)
+        min_qty = max(self.min_qty, self.market_min_qty or 0)
+        if quantity < min_qty:
+            raise OrderRejected(f"{self.symbol} {rounded} buys about {quantity:.8f}, below minQty {min_qty}")
+        return _format(rounded)
+
+
+class AsyncBinanceExecutor:
+    def __init__(self, api_key, api_secret, testnet=True, api_url=None, filter_ttl=FILTER_CACHE_TTL_SECONDS):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self.api_url = api_url
+        self.filter_ttl = filter_ttl
+        self._client = None
+        self._client_lock = asyncio.Lock()
+        self.orders_sent = 0
+        self.orders_rejected_locally = 0
+
+    async def client(self):
+        """The shared AsyncClient (one aiohttp session reused for every request)."""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    client = await AsyncClient.create(self.api_key, self.api_secret, testnet=self.testnet)
+                    if self.api_url:
+                        client.API_URL = self.api_url  # same REST endpoint as the sync client
+                    self._client = client
+        return self._client
+
+    async def filters(self, symbol):
+        cached = _filter_cache.get(symbol)
+        if cached is not None and time.time() - cached[0] < self.filter_ttl:
+            return cached[1]
+        client = await self.client()
+        info = await client.get_symbol_info(symbol)
+        if not info:
+            raise OrderRejected(f"Unknown symbol {symbol}")
+        filters = SymbolFilters.from_symbol_info(info)
+        _filter_cache[symbol] = (time.time(), filters)
+        print(f"[INFO] Loaded {symbol} filters: step {filters.step_size}, minQty {filters.min_qty}, "
+              f"minNotional {filters.min_notional}, tick {filters.tick_size}")
+        return filters
+
+    async def market_buy(self, symbol, quote_amount, price):
+        """Market buy for quote_amount (quoteOrderQty); raises OrderRejected before sending if invalid."""
+        filters = await self.filters(symbol)
+        try:
+            quote_str = filters.market_quote_amount(quote_amount, price)
+        except OrderRejected:
+            self.orders_rejected_locally += 1
+            raise
+        client = await self.client()
+        self.orders_sent += 1
+        return await client.order_market_buy(symbol=symbol, quoteOrderQty=quote_str)
+
+    async def market_sell(self, symbol, quantity, price):
+        """Market sell of quantity (floored to the step size); raises OrderRejected before sending if invalid."""
+        filters = await self.filters(symbol)
+        try:
+            quantity_str = filters.market_quantity(quantity, price)
+        except OrderRejected:
+            self.orders_rejected_locally += 1
+            raise
+        client = await self.client()
+        self.orders_sent += 1
+        return await client.order_market_sell(symbol=symbol, quantity=quantity_str)
+
+    async def get_account(self):
+        client = await self.client()
+        return await client.get_account()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close_connection()
+            self._client = None
+
+
+def get_async_executor(client, testnet, api_url=None):
+    """
+    AsyncBinanceExecutor with the sync client's credentials, one per event loop.
+    testnet / api_url must match how the sync client was set up (trade_executor_03.testnet_mode).
+    """
+    loop = asyncio.get_running_loop()
+    key = (id(client), id(loop), bool(testnet), api_url)
+    executor = _executors.get(key)
+    if executor is None:
+        executor = _executors[key] = AsyncBinanceExecutor(client.API_KEY, client.API_SECRET, testnet=testnet,
+                                                          api_url=api_url)
+    return executor
+
+
+async def close_async_executors():
+    """Close the sessions of the executors created on the running event loop."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _executors if key[1] == loop_id]:
+        await _executors.pop(key).close()
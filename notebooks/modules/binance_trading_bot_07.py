@@ -105,6 +105,10 @@ import ta
 from strategy_manager_05 import manage_trades
 from llm_decision_04 import get_llm_decision
 from trade_executor_03 import execute_buy, execute_sell, log_trade  # <-- Import logging and trade functions
+from dataset_cache import load_hourly_dataset, add_unified_ohlcv
+from market_snapshot import MarketSnapshot
+from decision_gate import DecisionGate
+from decision_scheduler import DecisionScheduler, answer_early
 
 def refresh_config():
     import subprocess
@@ -131,14 +135,8 @@ def load_config():
     return config
 
 async def run_backtest():
-    df = pd.read_excel('btc_hourly_yahoo_binance_6mo.xlsx')
-    df['date'] = pd.to_datetime(df['date'])
-    df.sort_values('date', inplace=True)
-    df['close'] = df['binance_close'].fillna(df['yahoo_close'])
-    df['open'] = df['binance_open'].fillna(df['yahoo_open'])
-    df['high'] = df['binance_high'].fillna(df['yahoo_high'])
-    df['low'] = df['binance_low'].fillna(df['yahoo_low'])
-    df['volume'] = df['binance_volume'].fillna(df['yahoo_volume'])
+    df = load_hourly_dataset('btc_hourly_yahoo_binance_6mo.xlsx').reset_index()
+    df = add_unified_ohlcv(df)
     df['atr_14'] = ta.volatility.AverageTrueRange(df['high'], df['low'], df['close'], window=14).average_true_range()
     df['rsi_14'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
     df['sma_20'] = ta.trend.sma_indicator(df['close'], window=20)
@@ -158,6 +156,8 @@ async def run_backtest():
 
     prev_day = None
     prev_day_value = None
+    decision_gate = DecisionGate()  # reuses the last HOLD while the market has not moved materially
+    scheduler = DecisionScheduler()  # LLM deadline; on timeout manage_trades runs the rules without a suggestion
 
     for i, row in df.iterrows():
         if pd.isna(row['close']):
@@ -172,37 +172,19 @@ async def run_backtest():
             'macd': row['macd'],
             'macd_signal': row['macd_signal']
         }
-        # Generate markdown for current hour for LLM (simulate live mode input)
-        md_content = f"""
-# Complete Bitcoin Data Collection Report
-
-## Yahoo Finance Data
-
-| Date | Open | High | Low | Close | Volume |
-|------|------|------|-----|-------|--------|
-| {current_date.strftime('%Y-%m-%d %H:%M:%S')} | ${row['open']:,.2f} | ${row['high']:,.2f} | ${row['low']:,.2f} | ${row['close']:,.2f} | {row['volume']:,.0f} |
-
-### Technical Indicators (Current Values)
-
-- **ATR (14)**: ${indicators['atr_14']:,.2f}
-- **RSI (14)**: {indicators['rsi_14']:.2f}
-- **SMA 20**: ${indicators['sma_20']:,.2f}
-- **SMA 50**: ${indicators['sma_50']:,.2f}
-- **MACD**: {indicators['macd']:.2f}
-- **MACD Signal**: {indicators['macd_signal']:.2f}
-
-## Portfolio Status
-
-- BTC: {portfolio['btc']}
-- USDT: {portfolio['usdt']}
-- Portfolio Value: {portfolio['btc'] * current_price + portfolio['usdt']}
-"""
-        temp_md_path = "temp_bitcoin_data.md"
-        with open(temp_md_path, "w", encoding="utf-8") as f:
-            f.write(md_content)
-
-        llm_suggestion = get_llm_decision(md_path=temp_md_path, use_google_sheet=False)
-        decisions, active_trades = manage_trades(portfolio, active_trades, llm_suggestion)
+        # Typed bar data for the LLM and the strategy rules (no markdown / temp file per bar)
+        snapshot = MarketSnapshot.from_row(row, indicators, timestamp=current_date)
+
+        frozen_portfolio = dict(portfolio)  # a call past its deadline must not see this bar's fills
+        llm_suggestion = decision_gate.decide(
+            snapshot, portfolio,
+            lambda: scheduler.decide(
+                lambda: get_llm_decision(snapshot=snapshot, portfolio=frozen_portfolio, use_google_sheet=False,
+                                         on_early_decision=answer_early),
+                lambda: None, cycle=current_date
+            )
+        )
+        decisions, active_trades = manage_trades(portfolio, active_trades, llm_suggestion, latest_data=snapshot)
         for decision in decisions:
             if decision['action'] == 'BUY' and portfolio['usdt'] >= decision['amount']:
                 btc_bought = decision['amount'] / current_price
@@ -253,6 +235,10 @@ async def run_backtest():
             prev_day = day
             prev_day_value = portfolio_value
 
+    decision_gate.report()
+    print(f"[INFO] LLM deadline: {scheduler.stats()}")
+    scheduler.close()
+
     # Final day P&L
     if prev_day is not None:
         daily_pnl = portfolio_value - prev_day_value
@@ -294,9 +280,6 @@ async def run_backtest():
     plt.tight_layout()
     plt.show()
 
-    if os.path.exists(temp_md_path):
-        os.remove(temp_md_path)
-
 if __name__ == "__main__":
     refresh_config()
     print("Running in backtest mode...")
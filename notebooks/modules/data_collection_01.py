@@ -2,6 +2,10 @@
 Module 1 : Data Collection
 Bitcoin Trading Agent - Optimized Data Collection Module
 Async parallel data collection from Yahoo Finance, CoinMarketCap, and Investing.com
+
+Blocking clients (yfinance, requests) run on a small shared thread pool so they do not block the
+event loop; each source has its own timeout, so total latency is the slowest source instead of
+the sum of all sources. Per-source timings are printed at the end of the run.
 """
 
 import os
@@ -12,16 +16,50 @@ import requests
 import yfinance as yf
 from datetime import datetime
 import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import warnings
 import json
 from bs4 import BeautifulSoup
 from crawl4ai import AsyncWebCrawler
 import ta  # Technical Analysis library
+from market_snapshot import MarketSnapshot, SNAPSHOT_PATH
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
 
+# Thread pool for the blocking clients (yfinance, requests)
+COLLECTION_MAX_WORKERS = 4
+# Per-source timeouts in seconds; a source that exceeds it is reported as failed
+SOURCE_TIMEOUTS = {
+    'yahoo': 30,
+    'coinmarketcap': 15,
+    'investing': 60,
+}
+
+_executor = None
+_http_session = None
+
+def get_collection_executor():
+    """Shared bounded thread pool for blocking source clients (created on first use)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=COLLECTION_MAX_WORKERS, thread_name_prefix='collect')
+    return _executor
+
+def get_http_session():
+    """Pooled requests session (keep-alive connections reused across calls)."""
+    global _http_session
+    if _http_session is None:
+        _http_session = requests.Session()
+    return _http_session
+
+async def run_blocking(func, *args):
+    """Run a blocking call on the collection thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_collection_executor(), func, *args)
+
 def setup_environment():
     """Setup environment and load variables"""
     print("Setting up environment...")
@@ -40,7 +78,11 @@ def setup_environment():
     print(f"Data directory ready: {os.path.abspath('../data')}")
 
 async def collect_yahoo_async():
-    """Collect Yahoo Finance data async with technical indicators"""
+    """Collect Yahoo Finance data async with technical indicators (runs on the collection thread pool)"""
+    return await run_blocking(collect_yahoo)
+
+def collect_yahoo():
+    """Collect Yahoo Finance data with technical indicators (blocking)"""
     try:
         print("\n[INFO] Fetching Yahoo Finance data...")
         btc = yf.Ticker("BTC-USD")
@@ -110,7 +152,11 @@ async def collect_yahoo_async():
         return None, None, None
 
 async def collect_coinmarketcap_async():
-    """Collect CoinMarketCap data async"""
+    """Collect CoinMarketCap data async (runs on the collection thread pool)"""
+    return await run_blocking(collect_coinmarketcap)
+
+def collect_coinmarketcap():
+    """Collect CoinMarketCap data (blocking)"""
     try:
         print("\n[INFO] Fetching CoinMarketCap data...")
         api_key = os.getenv('COINMARKETCAP_API_KEY')
@@ -123,7 +169,7 @@ async def collect_coinmarketcap_async():
         headers = {'X-CMC_PRO_API_KEY': api_key}
         params = {'symbol': 'BTC', 'convert': 'USD'}
         
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = get_http_session().get(url, headers=headers, params=params, timeout=10)
         data = response.json()
         
         if response.status_code == 200 and 'data' in data:
@@ -221,6 +267,33 @@ async def collect_investing_crawl4ai_async():
         print(f"[ERROR] Investing.com scraping failed: {e}")
         return None
 
+async def timed_source(name, coro, default=None):
+    """
+    Await one source with its timeout from SOURCE_TIMEOUTS.
+    Returns (result, timing) where timing is {'source', 'seconds', 'status'}; on timeout or error
+    the result is `default`.
+    """
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        result = await asyncio.wait_for(coro, timeout=SOURCE_TIMEOUTS.get(name))
+        if result is None or (isinstance(result, tuple) and result[0] is None):
+            status = 'failed'
+    except asyncio.TimeoutError:
+        print(f"[ERROR] {name} timed out after {SOURCE_TIMEOUTS.get(name)}s")
+        result, status = default, 'timeout'
+    except Exception as e:
+        print(f"[ERROR] {name} failed: {e}")
+        result, status = default, 'error'
+    return result, {'source': name, 'seconds': time.perf_counter() - started, 'status': status}
+
+def print_source_timings(timings, total_seconds):
+    """Per-source latency table; with parallel collection the total is close to the slowest source."""
+    print("\n[INFO] Source timings:")
+    for timing in sorted(timings, key=lambda t: t['seconds'], reverse=True):
+        print(f"   {timing['source']:<15} {timing['seconds']:7.2f}s  {timing['status']}")
+    print(f"   {'total (wall)':<15} {total_seconds:7.2f}s  (sum of sources: {sum(t['seconds'] for t in timings):.2f}s)")
+
 def generate_markdown_report(yahoo_df, yahoo_price, coinmarketcap_data, investing_df, yahoo_indicators=None):
     """Generate comprehensive markdown report with technical indicators"""
     
@@ -402,18 +475,21 @@ async def main():
     # Run all data collection in parallel
     print("\n[INFO] Starting parallel data collection from all sources...")
     
-    yahoo_task = collect_yahoo_async()
-    cmc_task = collect_coinmarketcap_async()
-    investing_task = collect_investing_crawl4ai_async()
+    collection_started = time.perf_counter()
+    yahoo_task = timed_source('yahoo', collect_yahoo_async(), default=(None, None, None))
+    cmc_task = timed_source('coinmarketcap', collect_coinmarketcap_async())
+    investing_task = timed_source('investing', collect_investing_crawl4ai_async())
     
-    # Wait for all tasks to complete
-    results = await asyncio.gather(yahoo_task, cmc_task, investing_task, return_exceptions=True)
+    # Wait for all tasks to complete (each one is bounded by its own timeout)
+    results = await asyncio.gather(yahoo_task, cmc_task, investing_task)
+    timings = [timing for _, timing in results]
+    print_source_timings(timings, time.perf_counter() - collection_started)
     
     # Extract results
-    yahoo_result = results[0] if not isinstance(results[0], Exception) else (None, None, None)
+    yahoo_result = results[0][0]
     yahoo_df, yahoo_price, yahoo_indicators = yahoo_result if len(yahoo_result) == 3 else (yahoo_result[0], yahoo_result[1], None)
-    coinmarketcap_data = results[1] if not isinstance(results[1], Exception) else None
-    investing_df = results[2] if not isinstance(results[2], Exception) else None
+    coinmarketcap_data = results[1][0]
+    investing_df = results[2][0]
     
     # Ensure dataframes are sorted from latest to oldest before generating report
     # Sort Yahoo DataFrame by date descending if available
@@ -440,6 +516,21 @@ async def main():
     except Exception as e:
         print(f"[ERROR] Failed to save report: {e}")
 
+    # Typed snapshot of the latest bar for the strategy (strategy_manager_05 reads it instead of parsing the markdown)
+    if yahoo_df is not None and yahoo_price:
+        latest = yahoo_df.iloc[0]
+        snapshot = MarketSnapshot(latest['date'], latest['open'], latest['high'], latest['low'], yahoo_price, latest['volume'], {
+            'atr_14': latest['atr_14'], 'rsi_14': latest['rsi_14'],
+            'sma_20': latest['sma_20'], 'sma_50': latest['sma_50'],
+            'ema_12': latest['ema_12'], 'ema_26': latest['ema_26'],
+            'bb_upper': latest['bb_high'], 'bb_middle': latest['bb_mid'], 'bb_lower': latest['bb_low'],
+            'macd': latest['macd'], 'macd_signal': latest['macd_signal'],
+            'volume_sma_20': latest['volume_sma'],
+            'atr_volatility_ratio': latest['atr_14'] / yahoo_price,
+        })
+        snapshot.save(SNAPSHOT_PATH)
+        print(f"[OK] Market snapshot saved: {os.path.abspath(SNAPSHOT_PATH)}")
+
     # Save data files
     print("\n[INFO] Saving data files...")
     if yahoo_df is not None:
@@ -0,0 +1,143 @@
+"""
+Dataset Cache for Bitcoin Trading Agent
+
+Purpose: Loads the merged hourly BTC dataset written by last_6_months_hourly_data_btc.merge_and_export
+(btc_hourly_yahoo_binance_6mo.xlsx / .csv) through a columnar on-disk cache.
+
+- The first load parses the Excel/CSV file once and writes a Parquet (or Feather) copy with
+  float64 columns and a sorted DatetimeIndex named 'date'
+- Later loads read the columnar copy directly (milliseconds instead of openpyxl parsing)
+- A sidecar '<cache>.meta.json' records the source file's size and modification time; when the
+  source changes, the cached copy is rebuilt automatically
+- add_unified_ohlcv() builds the open/high/low/close/volume columns used by the backtesters
+  (Binance values first, Yahoo as fallback)
+
+Usage:
+    df = load_hourly_dataset('btc_hourly_yahoo_binance_6mo.xlsx')   # DatetimeIndex 'date'
+    df = add_unified_ohlcv(df.reset_index())
+
+Dependencies: pandas, pyarrow
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+CACHE_DIR_NAME = '.dataset_cache'
+OHLCV_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def default_cache_path(source_path, fmt='parquet'):
+    """Cache file next to the source, e.g. ./.dataset_cache/btc_hourly_yahoo_binance_6mo.parquet"""
+    directory = os.path.dirname(os.path.abspath(source_path))
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(directory, CACHE_DIR_NAME, f"{name}.{fmt}")
+
+
+def _source_signature(source_path):
+    stat = os.stat(source_path)
+    return {'source': os.path.abspath(source_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_source(source_path):
+    if source_path.endswith('.csv'):
+        return pd.read_csv(source_path)
+    return pd.read_excel(source_path)
+
+
+def normalize_dataset(df):
+    """Typed copy of a merged frame: tz-naive DatetimeIndex 'date' (sorted, unique) and float64 columns."""
+    df = df.copy()
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.set_index('date')
+    df.index = pd.to_datetime(df.index)
+    if df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    df.index.name = 'date'
+    for col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+def _write_cache(df, cache_path, fmt, signature):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    if fmt == 'parquet':
+        df.to_parquet(tmp_path)
+    elif fmt == 'feather':
+        df.reset_index().to_feather(tmp_path)
+    else:
+        raise ValueError(f"Unsupported dataset cache format: {fmt}")
+    os.replace(tmp_path, cache_path)
+
+    meta = dict(signature)
+    meta.update({
+        'format': fmt,
+        'rows': len(df),
+        'columns': list(df.columns),
+        'created': datetime.now().isoformat(timespec='seconds'),
+    })
+    with open(cache_path + '.meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+
+def _read_cache(cache_path, fmt):
+    if fmt == 'parquet':
+        return pd.read_parquet(cache_path)
+    return pd.read_feather(cache_path).set_index('date')
+
+
+def _cache_is_fresh(cache_path, signature):
+    meta_path = cache_path + '.meta.json'
+    if not (os.path.exists(cache_path) and os.path.exists(meta_path)):
+        return False
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('size') == signature['size'] and meta.get('mtime_ns') == signature['mtime_ns']
+
+
+def write_dataset_cache(df, source_path, fmt='parquet', cache_path=None):
+    """Write the columnar copy for a frame that was just exported to source_path."""
+    cache_path = cache_path or default_cache_path(source_path, fmt)
+    _write_cache(normalize_dataset(df), cache_path, fmt, _source_signature(source_path))
+    return cache_path
+
+
+def load_hourly_dataset(source_path='btc_hourly_yahoo_binance_6mo.xlsx', fmt='parquet', cache_path=None):
+    """
+    Load the merged hourly dataset, converting the Excel/CSV source to Parquet/Feather on first use
+    or whenever the source file has changed. Returns a frame indexed by 'date' with float64 columns.
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Data file '{source_path}' not found")
+    cache_path = cache_path or default_cache_path(source_path, fmt)
+    signature = _source_signature(source_path)
+
+    if _cache_is_fresh(cache_path, signature):
+        try:
+            return _read_cache(cache_path, fmt)
+        except Exception as e:
+            print(f"[WARNING] Could not read dataset cache {cache_path}, rebuilding: {e}")
+
+    print(f"[INFO] Converting {source_path} to {fmt} cache...")
+    df = normalize_dataset(_read_source(source_path))
+    try:
+        _write_cache(df, cache_path, fmt, signature)
+        print(f"[OK] Dataset cache written: {cache_path} ({len(df)} rows)")
+    except Exception as e:
+        print(f"[WARNING] Could not write dataset cache: {e}")
+    return df
+
+
+def add_unified_ohlcv(df):
+    """Add open/high/low/close/volume columns: Binance values, filled with Yahoo where missing."""
+    for field in OHLCV_FIELDS:
+        df[field] = df[f'binance_{field}'].fillna(df[f'yahoo_{field}'])
+    return df
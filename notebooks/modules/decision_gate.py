@@ -0,0 +1,129 @@
+"""
+Decision Gate for Bitcoin Trading Agent
+
+Purpose: Skips the LLM call when the market and the portfolio have not changed materially since
+the bar that last triggered one, and reuses that previous decision instead. Most hourly answers
+are HOLD, so most of those round-trips buy nothing.
+
+The LLM is queried again as soon as any of these is true (compared with the last queried bar):
+- price moved by at least PRICE_ATR_THRESHOLD x ATR(14)
+- RSI(14) crossed into another band (oversold / neutral / overbought)
+- the MACD histogram (macd - macd_signal) changed sign
+- the portfolio changed by at least PORTFOLIO_CHANGE_THRESHOLD of its value
+- MAX_CONSECUTIVE_SKIPS bars in a row were skipped (periodic refresh)
+- the previous decision was not HOLD (a BUY/SELL/PROFIT is never replayed, it would trade twice)
+  or came from the rule-based fallback (decision_scheduler) rather than the LLM
+- required indicators are missing (warm-up bars)
+
+Usage:
+    gate = DecisionGate()
+    decision = gate.decide(snapshot, portfolio, lambda: get_llm_decision(context))
+    gate.report()   # calls / skips / skip rate
+
+Dependencies: none (standard library); MarketSnapshot is accepted as market input
+"""
+
+PRICE_ATR_THRESHOLD = 0.5           # price move, in ATRs, that forces a new LLM call
+RSI_BANDS = (30.0, 70.0)            # oversold / overbought band edges
+PORTFOLIO_CHANGE_THRESHOLD = 0.01   # fraction of portfolio value (BTC at current price + USDT)
+MAX_CONSECUTIVE_SKIPS = 12          # always re-query after this many skipped bars
+REPORT_EVERY = 100                  # print the skip rate every N decisions (0 = only on report())
+
+
+def _market_values(market):
+    """current price / atr / rsi / macd histogram from a MarketSnapshot or a market_data dict."""
+    if hasattr(market, 'as_latest_data'):
+        market = market.as_latest_data()
+    price = market.get('current_price', market.get('close'))
+    macd, macd_signal = market.get('macd'), market.get('macd_signal')
+    histogram = macd - macd_signal if macd is not None and macd_signal is not None else None
+    return {'price': price, 'atr': market.get('atr_14'), 'rsi': market.get('rsi_14'), 'macd_hist': histogram}
+
+
+def _rsi_band(rsi):
+    return sum(rsi >= edge for edge in RSI_BANDS)
+
+
+def _portfolio_value(portfolio, price):
+    return portfolio.get('btc', 0.0) * price + portfolio.get('usdt', 0.0)
+
+
+class DecisionGate:
+    def __init__(self, price_atr_threshold=PRICE_ATR_THRESHOLD, portfolio_change_threshold=PORTFOLIO_CHANGE_THRESHOLD,
+                 max_consecutive_skips=MAX_CONSECUTIVE_SKIPS, report_every=REPORT_EVERY, enabled=True):
+        self.price_atr_threshold = price_atr_threshold
+        self.portfolio_change_threshold = portfolio_change_threshold
+        self.max_consecutive_skips = max_consecutive_skips
+        self.report_every = report_every
+        self.enabled = enabled
+        self.calls = 0
+        self.skips = 0
+        self.reasons = {}
+        self._last_market = None
+        self._last_portfolio = None
+        self._last_decision = None
+        self._consecutive_skips = 0
+
+    def query_reason(self, market, portfolio):
+        """Why the LLM has to be asked for this bar, or None if the previous decision still holds."""
+        if not self.enabled:
+            return 'disabled'
+        if self._last_decision is None:
+            return 'first_bar'
+        if self._last_decision.get('action') != 'HOLD':
+            return 'previous_not_hold'
+        if self._last_decision.get('fallback'):
+            return 'previous_fallback'
+        if self._consecutive_skips >= self.max_consecutive_skips:
+            return 'max_skips'
+        last = self._last_market
+        if None in (market['price'], market['atr'], last['price'], last['atr']) or not last['atr']:
+            return 'missing_indicators'
+        if abs(market['price'] - last['price']) >= self.price_atr_threshold * last['atr']:
+            return 'price_move'
+        if market['rsi'] is not None and last['rsi'] is not None and _rsi_band(market['rsi']) != _rsi_band(last['rsi']):
+            return 'rsi_band'
+        if market['macd_hist'] is not None and last['macd_hist'] is not None \
+                and (market['macd_hist'] >= 0) != (last['macd_hist'] >= 0):
+            return 'macd_flip'
+        value = _portfolio_value(portfolio, market['price'])
+        btc_change = abs(portfolio.get('btc', 0.0) - self._last_portfolio.get('btc', 0.0)) * market['price']
+        usdt_change = abs(portfolio.get('usdt', 0.0) - self._last_portfolio.get('usdt', 0.0))
+        if value > 0 and (btc_change + usdt_change) / value >= self.portfolio_change_threshold:
+            return 'portfolio_change'
+        return None
+
+    def decide(self, market, portfolio, call):
+        """
+        Return call() when the gate opens, else the previous (HOLD) decision.
+        `market` is a MarketSnapshot or market_data dict; `call` is a zero-argument LLM query.
+        """
+        values = _market_values(market)
+        reason = self.query_reason(values, portfolio)
+        if reason is None:
+            self.skips += 1
+            self._consecutive_skips += 1
+            decision = dict(self._last_decision)
+        else:
+            self.calls += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            self._consecutive_skips = 0
+            decision = call()
+            self._last_market = values
+            self._last_portfolio = dict(portfolio)
+            self._last_decision = dict(decision) if decision else None
+        if self.report_every and (self.calls + self.skips) % self.report_every == 0:
+            self.report()
+        return decision
+
+    def skip_rate(self):
+        total = self.calls + self.skips
+        return self.skips / total if total else 0.0
+
+    def stats(self):
+        return {'llm_calls': self.calls, 'skipped': self.skips, 'skip_rate': round(self.skip_rate(), 4),
+                'call_reasons': dict(self.reasons)}
+
+    def report(self):
+        print(f"[INFO] Decision gate: {self.calls} LLM calls, {self.skips} skipped "
+              f"({self.skip_rate():.0%} skip rate), call reasons {self.reasons}")
@@ -0,0 +1,377 @@
+"""
+Decision Protocol for Bitcoin Trading Agent
+
+Purpose: One place that turns an LLM answer into a trade decision that is safe to act on.
+
+- Requests JSON mode (response_format={"type": "json_object"}) and remembers models that reject it
+- JsonObjectExtractor: incremental brace-depth scanner (string / escape aware) that finds the
+  first complete JSON object, so a streamed answer can be closed as soon as the object ends
+  (no greedy regex over the whole text, trailing chatter is never read)
+- validate_decision(): known action, numeric amount field for BUY / SELL / PROFIT, and the amount
+  within the portfolio limits (USDT incl. fee for BUY, BTC for SELL, BTC at current price for PROFIT);
+  the fee is FEE_RATE (live Binance spot) unless the backtester sets its own with set_fee_rate()
+- One cheap repair retry: only the rejected answer, the problems and the limits are sent back
+  (no system prompt or market context), instead of re-querying with the full prompt
+- Streamed answers still report token usage: after the object closes, up to USAGE_DRAIN_CHUNKS
+  more chunks are read for the usage Groq sends on the last chunk (x_groq.usage), which is
+  recorded in the LLMClientManager stats and returned as a response-like StreamedCompletion
+- Early decision: while streaming, top-level fields are parsed as soon as each one closes; once
+  `action` and its amount field are in and valid, on_early_decision(decision) is called with the
+  stream still open (the rationale, last in the schema, keeps streaming in)
+
+Usage:
+    limits = limits_from_context(context)
+    decision, response, info = request_decision(messages, model, limits, temperature=0.2)
+    request_decision(messages, model, limits, on_early_decision=submit_order)   # streaming only
+
+Dependencies: groq (through llm_client)
+"""
+
+import json
+import time
+
+import groq
+
+from llm_client import get_llm_client
+
+DECISION_RESPONSE_FORMAT = {"type": "json_object"}
+DECISION_STREAMING = True   # read the answer as a stream and stop at the end of the JSON object
+FEE_RATE = 0.001            # Binance spot fee, a BUY must leave room for it
+REPAIR_MAX_TOKENS = 200
+RAW_ANSWER_PREVIEW = 600    # characters of the rejected answer sent back in the repair prompt
+USAGE_DRAIN_CHUNKS = 8      # chunks read after the object closed, waiting for the usage chunk
+
+# Amount field each action needs (HOLD needs none)
+ACTION_AMOUNT_FIELDS = {'BUY': 'buy_amount', 'SELL': 'quantity', 'PROFIT': 'profit_amount', 'HOLD': None}
+
+REPAIR_SYSTEM_PROMPT = (
+    'Fix the trading decision below. Reply with ONE JSON object only: {"action": "BUY|SELL|HOLD|PROFIT", '
+    '"buy_amount": <USD, BUY only>, "quantity": <BTC, SELL only>, "profit_amount": <USD, PROFIT only>, '
+    '"confidence": <0-100>, "rationale": "<short>"}. Amounts must respect the limits; use HOLD if no trade fits.'
+)
+
+# Models that answered 400 to response_format; they are asked without JSON mode afterwards
+_json_mode_unsupported = set()
+_fee_rate = FEE_RATE
+
+
+def set_fee_rate(rate):
+    """Fee rate used in the BUY limit, e.g. the simulator's BINANCE_FEE_RATE (None: FEE_RATE)."""
+    global _fee_rate
+    _fee_rate = FEE_RATE if rate is None else rate
+
+
+class JsonObjectExtractor:
+    """
+    Feed text chunks; `result` holds the first complete top-level JSON object once it has closed.
+    `fields` holds the top-level key/value pairs that are already complete (filled while streaming).
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.result = None
+        self.fields = {}
+        self._pair_start = None
+
+    def _close_pair(self):
+        """Parse the top-level `"key": value` text between the last separator and this one."""
+        pair = ''.join(self.buffer[self._pair_start:-1]).strip()
+        self._pair_start = len(self.buffer)
+        if not pair:
+            return
+        try:
+            self.fields.update(json.loads('{' + pair + '}'))
+        except ValueError:
+            pass  # malformed pair: the full object will fail validation later
+
+    @property
+    def complete(self):
+        return self.result is not None
+
+    def feed(self, chunk):
+        """Consume a chunk; returns the object text when it completes in this chunk, else None."""
+        if self.complete or not chunk:
+            return None
+        for char in chunk:
+            if not self.started:
+                if char != '{':
+                    continue  # text / code fences before the object
+                self.started = True
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.depth += 1
+                if self.depth == 1:
+                    self._pair_start = len(self.buffer)
+            elif char == ',' and self.depth == 1:
+                self._close_pair()
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    self._close_pair()
+                    self.result = ''.join(self.buffer)
+                    return self.result
+        return None
+
+
+def extract_json_object(text):
+    """First complete JSON object in text as a dict, or None."""
+    extractor = JsonObjectExtractor()
+    extractor.feed(text or '')
+    if not extractor.complete:
+        return None
+    try:
+        value = json.loads(extractor.result)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def limits_from_context(context):
+    """Portfolio limits for validation from a decision context (portfolio + market_data)."""
+    portfolio = context.get('portfolio') or {}
+    market = context.get('market_data') or {}
+    return {
+        'usdt': portfolio.get('usdt', 0.0),
+        'btc': portfolio.get('btc', 0.0),
+        'price': market.get('current_price', market.get('close')),
+        'fee_rate': _fee_rate,
+    }
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(',', '').replace('$', ''))
+        except ValueError:
+            return None
+    return None
+
+
+def validate_decision(decision, limits=None):
+    """
+    Normalize a parsed decision and check it against the schema and the portfolio limits.
+    Returns (decision, errors); decision is None when errors is not empty.
+    """
+    if not isinstance(decision, dict):
+        return None, ["answer is not a JSON object"]
+    action = str(decision.get('action', '')).strip().upper()
+    if action not in ACTION_AMOUNT_FIELDS:
+        return None, [f"unknown action {decision.get('action')!r}"]
+
+    normalized = {
+        'action': action,
+        'buy_amount': _number(decision.get('buy_amount')),
+        'quantity': _number(decision.get('quantity')),
+        'profit_amount': _number(decision.get('profit_amount')),
+        'confidence': _number(decision.get('confidence')) or 0,
+        'rationale': decision.get('rationale', ''),
+    }
+    normalized['confidence'] = min(max(normalized['confidence'], 0), 100)
+
+    errors = []
+    field = ACTION_AMOUNT_FIELDS[action]
+    amount = normalized[field] if field else None
+    if field and amount is None:
+        errors.append(f"{action} needs a numeric {field}")
+    elif field and amount <= 0:
+        errors.append(f"{field} must be positive")
+    elif field and limits:
+        price = limits.get('price')
+        if action == 'BUY' and amount * (1 + limits.get('fee_rate', _fee_rate)) > limits.get('usdt', 0.0):
+            errors.append(f"buy_amount {amount:.2f} plus fee exceeds USDT balance {limits.get('usdt', 0.0):.2f}")
+        elif action == 'SELL' and amount > limits.get('btc', 0.0):
+            errors.append(f"quantity {amount:.8f} exceeds BTC balance {limits.get('btc', 0.0):.8f}")
+        elif action == 'PROFIT' and price and amount / price > limits.get('btc', 0.0):
+            errors.append(f"profit_amount {amount:.2f} exceeds BTC holdings worth {limits.get('btc', 0.0) * price:.2f}")
+    if errors:
+        return None, errors
+    return normalized, []
+
+
+def early_decision(fields, limits=None):
+    """Decision from partially streamed fields once action and its amount are known, else None."""
+    action = str(fields.get('action', '')).strip().upper()
+    if action not in ACTION_AMOUNT_FIELDS:
+        return None
+    field = ACTION_AMOUNT_FIELDS[action]
+    if field and field not in fields:
+        return None
+    decision, errors = validate_decision(fields, limits)
+    return decision
+
+
+def decision_from_text(text, limits=None):
+    """Extract + validate; returns (decision or None, errors)."""
+    parsed = extract_json_object(text)
+    if parsed is None:
+        return None, ["no complete JSON object in the answer"]
+    return validate_decision(parsed, limits)
+
+
+def repair_messages(raw_text, errors, limits=None):
+    """Minimal follow-up prompt: the rejected answer, what is wrong, and the limits."""
+    lines = [f"Rejected answer: {(raw_text or '').strip()[:RAW_ANSWER_PREVIEW]}",
+             f"Problems: {'; '.join(errors)}"]
+    if limits:
+        lines.append(f"Limits: usdt={limits.get('usdt', 0.0):.2f} btc={limits.get('btc', 0.0):.8f} "
+                     f"price={limits.get('price')} fee_rate={limits.get('fee_rate', _fee_rate)}")
+    return [{"role": "system", "content": REPAIR_SYSTEM_PROMPT},
+            {"role": "user", "content": '\n'.join(lines)}]
+
+
+def json_mode_kwargs(model):
+    """response_format for models that accept JSON mode."""
+    return {} if model in _json_mode_unsupported else {'response_format': DECISION_RESPONSE_FORMAT}
+
+
+def json_mode_rejected(model, error, kwargs):
+    """
+    True if `error` is a 400 refusing the response_format sent in kwargs; the model is then
+    remembered and asked without JSON mode from now on.
+    """
+    if not isinstance(error, groq.BadRequestError) or 'response_format' not in kwargs:
+        return False
+    message = str(error).lower()
+    if 'response_format' not in message and 'json' not in message:
+        return False
+    print(f"[WARNING] {model} rejected JSON mode, retrying without response_format")
+    _json_mode_unsupported.add(model)
+    return True
+
+
+class StreamedCompletion:
+    """Response-like result of a streamed completion: the text read and the usage (None if not sent)."""
+
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage = usage
+
+
+def _chunk_usage(chunk):
+    usage = getattr(chunk, 'usage', None)
+    if usage is None:
+        usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+    return usage
+
+
+def _read_stream(stream, on_fields=None):
+    """
+    Read a streamed completion until the first JSON object closes; returns (text, usage).
+    on_fields(fields) is called whenever another top-level field has been completed.
+    """
+    extractor = JsonObjectExtractor()
+    parts = []
+    usage = None
+    drained = None
+    try:
+        for chunk in stream:
+            usage = _chunk_usage(chunk) or usage
+            if drained is not None:
+                # Object complete: only wait (briefly) for the usage chunk, the text is not needed
+                drained += 1
+                if usage is not None or drained >= USAGE_DRAIN_CHUNKS:
+                    break
+                continue
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ''
+            parts.append(delta)
+            known = len(extractor.fields)
+            done = extractor.feed(delta) is not None
+            if on_fields is not None and len(extractor.fields) > known:
+                on_fields(extractor.fields)
+            if done:
+                if usage is not None:
+                    break
+                drained = 0
+    finally:
+        stream.close()
+    return ''.join(parts), usage
+
+
+def _complete(model, messages, stream, on_fields=None, **kwargs):
+    """One completion in JSON mode (falling back to plain mode if the model rejects it)."""
+    client = get_llm_client()
+    kwargs.update(json_mode_kwargs(model))
+    try:
+        if stream:
+            stream_response = client.chat(model=model, messages=messages, stream=True, **kwargs)
+            text, usage = _read_stream(stream_response, on_fields)
+            response = StreamedCompletion(text, usage)
+            client.record_usage(response)
+            return text, response
+        response = client.chat(model=model, messages=messages, **kwargs)
+    except groq.BadRequestError as e:
+        if not json_mode_rejected(model, e, kwargs):
+            raise
+        return _complete(model, messages, stream, on_fields,
+                         **{k: v for k, v in kwargs.items() if k != 'response_format'})
+    return (response.choices[0].message.content or ''), response
+
+
+def request_json_object(messages, model, **kwargs):
+    """Non-streamed JSON-mode completion; returns (parsed object or None, response, raw text)."""
+    text, response = _complete(model, messages, False, **kwargs)
+    return extract_json_object(text), response, text
+
+
+def request_decision(messages, model, limits=None, stream=DECISION_STREAMING, on_early_decision=None, **kwargs):
+    """
+    Query the model and return (decision, response, info).
+    decision is None if the answer is still invalid after one repair retry. response is the
+    completion (a StreamedCompletion when streamed) for token reporting.
+    info: {'repaired', 'errors', 'early_seconds'} (early_seconds: time to the early decision, or None).
+    on_early_decision(decision) is called at most once, mid-stream, as soon as the action and its
+    amount are valid; the returned decision then has the same action / amounts plus the rationale.
+    API errors are raised to the caller.
+    """
+    started = time.perf_counter()
+    info = {'repaired': False, 'errors': [], 'early_seconds': None}
+    early = {}
+
+    def on_fields(fields):
+        if info['early_seconds'] is not None:
+            return
+        decision = early_decision(fields, limits)
+        if decision is not None:
+            info['early_seconds'] = time.perf_counter() - started
+            early['decision'] = decision
+            print(f"[LLM] {decision['action']} parsed after {info['early_seconds']:.2f}s (rationale still streaming)")
+            on_early_decision(decision)
+
+    text, response = _complete(model, messages, stream, on_fields if on_early_decision else None, **kwargs)
+    decision, errors = decision_from_text(text, limits)
+    if decision is not None:
+        return decision, response, info
+    if early:
+        # Already acted on: keep the early decision rather than repairing into a different one
+        print(f"[WARNING] LLM answer broke after the early decision ({'; '.join(errors)}), keeping it")
+        info['errors'] = errors
+        return early['decision'], response, info
+
+    print(f"[WARNING] Invalid LLM decision ({'; '.join(errors)}), sending repair prompt")
+    repair_kwargs = {key: value for key, value in kwargs.items() if key == 'temperature'}
+    repaired_text, _ = _complete(model, repair_messages(text, errors, limits), False,
+                                 max_tokens=REPAIR_MAX_TOKENS, **repair_kwargs)
+    decision, repair_errors = decision_from_text(repaired_text, limits)
+    if decision is None:
+        print(f"[ERROR] Repaired LLM decision still invalid: {'; '.join(repair_errors)}")
+    info.update(repaired=True, errors=errors + repair_errors)
+    return decision, response, info
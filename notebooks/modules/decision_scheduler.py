@@ -0,0 +1,208 @@
+"""
+Decision Scheduler for Bitcoin Trading Agent
+
+Purpose: Gives the LLM a hard deadline per trading cycle. A slow or failing Groq call no longer
+blocks the cycle or silently turns into HOLD: when the deadline passes (or the call raises), the
+deterministic rules from strategy_manager_05 (DCA, ATR stop-loss, drawdown safeguard) decide instead.
+
+- The LLM call runs on a small worker pool; the cycle waits at most deadline_seconds for it
+- On timeout / error the fallback is used and the decision is marked 'fallback': True
+  (exception types listed in `reraise`, e.g. DecisionCacheMiss in replay mode, still propagate)
+- A late LLM answer is not thrown away: when it arrives it is appended to a JSON Lines file
+  (cycle, deadline, elapsed, decision or error) for later analysis
+- Code running inside the call can ask answer_in_time() before publishing its answer: it commits
+  the answer as on time, or returns False once the deadline has passed. The decision cache uses it
+  to store a "missed deadline" marker instead of a late answer, so a replay falls back on the same
+  bars. A committed answer is always used, even if it arrives a moment after the deadline.
+  Callers pass a copy of the context / portfolio, because an abandoned call keeps running while
+  the fallback trade changes the live portfolio
+- answer_early(decision) is the on_early_decision callback for the call: the cycle gets the decision
+  as soon as the streamed action and amount are valid and acts on it (no fallback), while the call
+  finishes the rationale and caches the full answer in the background
+- rule_based_decision() maps evaluate_rules() output onto the single-decision schema of
+  llm_decision_strategy_05 (action / buy_amount / quantity / confidence / rationale)
+
+Usage:
+    scheduler = DecisionScheduler(deadline_seconds=20)
+    frozen = copy.deepcopy(context)
+    decision = scheduler.decide(lambda: get_llm_decision(frozen, raise_errors=True, on_early_decision=answer_early),
+                                lambda: rule_based_decision(portfolio, active_trades, latest_data, config),
+                                cycle=timestamp)
+
+Dependencies: none (standard library); strategy_manager_05 for the rules
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+from strategy_manager_05 import evaluate_rules
+
+DEFAULT_DEADLINE_SECONDS = 20.0
+LATE_DECISIONS_PATH = "late_llm_decisions.jsonl"
+MAX_PENDING_CALLS = 2   # worker threads; a call still running after its deadline occupies one
+
+_call_state = threading.local()
+
+
+class _CallDeadline:
+    """Decides once, under a lock, whether a call's answer is on time or the fallback is used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.expired = False
+        self.committed = False
+        self.early = None
+        self.answered = threading.Event()   # early decision handed over, or the call finished
+
+    def answer_early(self, decision):
+        with self._lock:
+            if self.expired:
+                return False
+            self.committed = True
+            if self.early is None:
+                self.early = dict(decision)
+        self.answered.set()
+        return True
+
+    def commit(self):
+        with self._lock:
+            if not self.expired:
+                self.committed = True
+            return self.committed
+
+    def expire(self):
+        with self._lock:
+            if not self.committed:
+                self.expired = True
+            return self.expired
+
+
+def answer_in_time():
+    """
+    Inside a scheduled call: commit the answer as on time, or False if the deadline already passed.
+    Outside the scheduler (no deadline) always True.
+    """
+    deadline = getattr(_call_state, 'deadline', None)
+    return deadline is None or deadline.commit()
+
+
+def answer_early(decision):
+    """
+    on_early_decision callback for a scheduled call: hands the decision to the waiting cycle now,
+    the call keeps running. False if the deadline already passed or outside the scheduler.
+    """
+    deadline = getattr(_call_state, 'deadline', None)
+    return deadline is not None and deadline.answer_early(decision)
+
+
+def _run_with_deadline(call, deadline):
+    _call_state.deadline = deadline
+    try:
+        return call()
+    finally:
+        _call_state.deadline = None
+
+
+def rule_based_decision(portfolio, active_trades, latest_data, config):
+    """
+    Deterministic decision from the DCA / ATR stop-loss / drawdown rules, in the LLM decision schema.
+    Stop-loss sells win over DCA buys; active_trades is not modified.
+    """
+    decisions, _ = evaluate_rules(portfolio, list(active_trades), latest_data, config)
+    sells = [d for d in decisions if d['action'] == 'SELL']
+    buys = [d for d in decisions if d['action'] == 'BUY']
+    if sells:
+        quantity = min(sum(d['quantity'] for d in sells), portfolio.get('btc', 0.0))
+        return {'action': 'SELL', 'buy_amount': None, 'quantity': quantity, 'profit_amount': None,
+                'confidence': 100, 'rationale': f"Rule fallback: {len(sells)} ATR stop-loss trigger(s).",
+                'fallback': True}
+    if buys:
+        return {'action': 'BUY', 'buy_amount': buys[0]['amount'], 'quantity': None, 'profit_amount': None,
+                'confidence': 100, 'rationale': f"Rule fallback: {buys[0].get('trade_type', 'DCA')} buy.",
+                'fallback': True}
+    return {'action': 'HOLD', 'buy_amount': None, 'quantity': None, 'profit_amount': None,
+            'confidence': 0, 'rationale': "Rule fallback: no rule triggered.", 'fallback': True}
+
+
+class DecisionScheduler:
+    def __init__(self, deadline_seconds=DEFAULT_DEADLINE_SECONDS, late_log_path=LATE_DECISIONS_PATH,
+                 max_pending=MAX_PENDING_CALLS, reraise=()):
+        self.deadline_seconds = deadline_seconds
+        self.reraise = tuple(reraise)
+        self.late_log_path = late_log_path
+        self._executor = ThreadPoolExecutor(max_workers=max_pending, thread_name_prefix="llm-deadline")
+        self._log_lock = threading.Lock()
+        self.on_time = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.early_answers = 0
+        self.late_answers = 0
+
+    def decide(self, call, fallback, cycle=None):
+        """
+        Return call() if it finishes within the deadline, else fallback().
+        A decision the call hands over with answer_early() is returned at once.
+        `call` may raise; `fallback` must be cheap and must not raise.
+        """
+        if not self.deadline_seconds:
+            return call()
+        started = time.perf_counter()
+        deadline = _CallDeadline()
+        future = self._executor.submit(_run_with_deadline, call, deadline)
+        future.add_done_callback(lambda f: deadline.answered.set())
+        try:
+            if not deadline.answered.wait(self.deadline_seconds) and deadline.expire():
+                raise FutureTimeoutError()
+            if deadline.early is not None:
+                # Acted on mid-stream; the call finishes (and caches) the full answer on its own
+                self.on_time += 1
+                self.early_answers += 1
+                return deadline.early
+            decision = future.result()   # done, or committed just before the deadline
+            if decision:
+                self.on_time += 1
+                return decision
+            self.errors += 1
+            print("[WARNING] LLM returned no usable decision, using rule-based fallback")
+        except FutureTimeoutError:
+            self.timeouts += 1
+            print(f"[WARNING] LLM missed the {self.deadline_seconds:g}s deadline, using rule-based fallback")
+            future.add_done_callback(lambda f: self._record_late(f, cycle, started))
+        except self.reraise:
+            raise
+        except Exception as e:
+            self.errors += 1
+            print(f"[WARNING] LLM decision failed ({type(e).__name__}: {e}), using rule-based fallback")
+        return fallback()
+
+    def _record_late(self, future, cycle, started):
+        entry = {
+            'cycle': str(cycle) if cycle is not None else None,
+            'deadline_seconds': self.deadline_seconds,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        error = future.exception()
+        if error is not None:
+            entry['error'] = f"{type(error).__name__}: {error}"
+        else:
+            entry['decision'] = future.result()
+        with self._log_lock:
+            self.late_answers += 1
+            dir_name = os.path.dirname(self.late_log_path)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            with open(self.late_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, sort_keys=True, default=str) + '\n')
+
+    def stats(self):
+        return {'deadline_seconds': self.deadline_seconds, 'on_time': self.on_time, 'timeouts': self.timeouts,
+                'errors': self.errors, 'early_answers': self.early_answers, 'late_answers_recorded': self.late_answers}
+
+    def close(self, wait=False):
+        """Stop the worker pool; with wait=True, late answers still in flight are recorded first."""
+        self._executor.shutdown(wait=wait)
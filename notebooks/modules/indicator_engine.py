@@ -0,0 +1,408 @@
+"""
+Indicator Engine for Bitcoin Trading Agent
+
+Purpose: Computes the technical indicators used by the backtester and the LLM context
+(ATR, RSI, SMA, EMA, Bollinger Bands, MACD, Volume SMA) in a single place.
+
+- compute_indicator_table(): vectorized pass over the full OHLCV frame, one column per indicator
+- compute_indicator_arrays(): same, for memory-mapped column arrays from ohlcv_store
+- indicators_at(): reads one bar's values from the precomputed table by position
+- calculate_slice_indicators(): legacy per-bar recomputation over the history up to a bar
+- verify_no_lookahead(): checks the precomputed table against per-bar recomputation
+- IncrementalIndicators: streaming engine that updates every indicator in O(1) per bar,
+  shared by the live loop (one update per new kline) and the backtester
+
+Every indicator here is causal: the value at bar i only depends on bars 0..i, so computing
+them once over the whole frame gives the same numbers as recomputing them on
+df[df['date'] <= current_date] at every bar.
+
+Inputs:
+- DataFrame with 'open', 'high', 'low', 'close', 'volume' columns (oldest first)
+
+Outputs:
+- DataFrame of indicator columns aligned with the input index
+- Per-bar indicator dicts with the keys expected by generate_md_report / build_llm_context
+
+Dependencies: pandas, numpy, ta
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import ta
+
+# Minimum number of bars before indicators are reported (matches the backtester's ATR window)
+MIN_WINDOW = 14
+
+INDICATOR_COLUMNS = [
+    'atr_14',
+    'rsi_14',
+    'sma_20',
+    'sma_50',
+    'ema_12',
+    'ema_26',
+    'bb_upper',
+    'bb_middle',
+    'bb_lower',
+    'macd',
+    'macd_signal',
+    'volume_sma_20',
+    'atr_volatility_ratio',
+]
+
+
+def empty_indicators():
+    """Indicator dict used while there is not enough history yet."""
+    return {name: None for name in INDICATOR_COLUMNS}
+
+
+def compute_indicator_table(df):
+    """
+    Compute every indicator column once over the full frame.
+    Returns a DataFrame with INDICATOR_COLUMNS, indexed like df.
+    """
+    close = df['close']
+    table = pd.DataFrame(index=df.index)
+    if len(df) < MIN_WINDOW:
+        for name in INDICATOR_COLUMNS:
+            table[name] = np.nan
+        return table
+
+    atr = ta.volatility.AverageTrueRange(df['high'], df['low'], close, window=14).average_true_range()
+    bb = ta.volatility.BollingerBands(close, window=20, window_dev=2)
+    macd = ta.trend.MACD(close)
+
+    table['atr_14'] = atr
+    table['rsi_14'] = ta.momentum.RSIIndicator(close, window=14).rsi()
+    table['sma_20'] = ta.trend.sma_indicator(close, window=20)
+    table['sma_50'] = ta.trend.sma_indicator(close, window=50)
+    table['ema_12'] = ta.trend.ema_indicator(close, window=12)
+    table['ema_26'] = ta.trend.ema_indicator(close, window=26)
+    table['bb_upper'] = bb.bollinger_hband()
+    table['bb_middle'] = bb.bollinger_mavg()
+    table['bb_lower'] = bb.bollinger_lband()
+    table['macd'] = macd.macd()
+    table['macd_signal'] = macd.macd_signal()
+    table['volume_sma_20'] = ta.trend.sma_indicator(df['volume'], window=20)
+    table['atr_volatility_ratio'] = atr / close
+    return table
+
+
+def compute_indicator_arrays(bars):
+    """
+    compute_indicator_table() for a dict of column arrays, e.g. an OhlcvStore slice.
+    The arrays are wrapped in a frame without copying.
+    """
+    df = pd.DataFrame({name: bars[name] for name in ['open', 'high', 'low', 'close', 'volume']}, copy=False)
+    return compute_indicator_table(df)
+
+
+def indicators_at(table, position):
+    """
+    Read the indicators of the bar at integer position `position` from a precomputed table.
+    Bars with fewer than MIN_WINDOW bars of history get the all-None dict, like the backtester.
+    """
+    if position + 1 < MIN_WINDOW:
+        return empty_indicators()
+    values = table.iloc[position]
+    return {name: values[name] for name in INDICATOR_COLUMNS}
+
+
+def calculate_slice_indicators(df_slice):
+    """
+    Recompute indicators over the full history up to (and including) the last bar of df_slice.
+    This is the original per-bar backtest path; it is O(n) per bar, so O(n^2) per backtest.
+    """
+    if len(df_slice) < MIN_WINDOW:
+        return empty_indicators()
+    atr = ta.volatility.AverageTrueRange(df_slice['high'], df_slice['low'], df_slice['close'], window=14).average_true_range().iloc[-1]
+    bb = ta.volatility.BollingerBands(df_slice['close'], window=20, window_dev=2)
+    macd = ta.trend.MACD(df_slice['close'])
+    return {
+        'atr_14': atr,
+        'rsi_14': ta.momentum.RSIIndicator(df_slice['close'], window=14).rsi().iloc[-1],
+        'sma_20': ta.trend.sma_indicator(df_slice['close'], window=20).iloc[-1],
+        'sma_50': ta.trend.sma_indicator(df_slice['close'], window=50).iloc[-1],
+        'ema_12': ta.trend.ema_indicator(df_slice['close'], window=12).iloc[-1],
+        'ema_26': ta.trend.ema_indicator(df_slice['close'], window=26).iloc[-1],
+        'bb_upper': bb.bollinger_hband().iloc[-1],
+        'bb_middle': bb.bollinger_mavg().iloc[-1],
+        'bb_lower': bb.bollinger_lband().iloc[-1],
+        'macd': macd.macd().iloc[-1],
+        'macd_signal': macd.macd_signal().iloc[-1],
+        'volume_sma_20': ta.trend.sma_indicator(df_slice['volume'], window=20).iloc[-1],
+        'atr_volatility_ratio': atr / df_slice['close'].iloc[-1],
+    }
+
+
+def _same_value(a, b, rtol=1e-9, atol=1e-9):
+    if a is None or b is None:
+        return a is None and b is None
+    if pd.isna(a) or pd.isna(b):
+        return bool(pd.isna(a) and pd.isna(b))
+    return bool(np.isclose(a, b, rtol=rtol, atol=atol))
+
+
+def verify_no_lookahead(df, table, sample_size=25, seed=0):
+    """
+    Check that the precomputed table has no lookahead bias.
+
+    For a sample of bars (always including the first reportable bar and the last bar),
+    recompute the indicators from df.iloc[:i + 1] only and compare them with table row i.
+    Any future bar leaking into row i would make the two disagree.
+    Raises AssertionError with the first mismatch; returns the number of bars checked.
+    """
+    n = len(df)
+    if n < MIN_WINDOW:
+        return 0
+    candidates = np.arange(MIN_WINDOW - 1, n)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(candidates, size=min(sample_size, len(candidates)), replace=False)
+    positions = sorted(set(sample.tolist()) | {MIN_WINDOW - 1, n - 1})
+
+    for position in positions:
+        expected = calculate_slice_indicators(df.iloc[:position + 1])
+        actual = indicators_at(table, position)
+        for name in INDICATOR_COLUMNS:
+            if not _same_value(expected[name], actual[name]):
+                raise AssertionError(
+                    f"Lookahead check failed at bar {position} for '{name}': "
+                    f"table={actual[name]} vs history-only={expected[name]}"
+                )
+    return len(positions)
+
+
+class _RollingWindow:
+    """
+    Fixed-size window with running sums (O(1) mean and population std).
+    Sums are kept relative to a reference value so the variance does not lose precision
+    at BTC price levels; both are re-based once per full window (amortized O(1)).
+    """
+
+    def __init__(self, size, values=None):
+        self.size = size
+        self.values = deque(values or [], maxlen=size)
+        self._pushes = 0
+        self._resum()
+
+    def _resum(self):
+        self.ref = math.fsum(self.values) / len(self.values) if self.values else 0.0
+        self.total = math.fsum(v - self.ref for v in self.values)
+        self.total_sq = math.fsum((v - self.ref) ** 2 for v in self.values)
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            oldest = self.values[0] - self.ref
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.values.append(value)
+        shifted = value - self.ref
+        self.total += shifted
+        self.total_sq += shifted * shifted
+        self._pushes += 1
+        if self._pushes % self.size == 0:
+            self._resum()
+
+    def state(self):
+        return {'values': list(self.values), 'ref': self.ref, 'total': self.total,
+                'total_sq': self.total_sq, 'pushes': self._pushes}
+
+    @classmethod
+    def from_state(cls, size, state):
+        window = cls(size, state['values'])
+        window.ref = state['ref']
+        window.total = state['total']
+        window.total_sq = state['total_sq']
+        window._pushes = state['pushes']
+        return window
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.ref + self.total / self.size if self.full else math.nan
+
+    def std(self):
+        if not self.full:
+            return math.nan
+        shifted_mean = self.total / self.size
+        return math.sqrt(max(self.total_sq / self.size - shifted_mean * shifted_mean, 0.0))
+
+
+class IncrementalIndicators:
+    """
+    Streaming indicator engine: feed one OHLCV bar at a time with update(), get the current
+    indicator dict back. Each update is O(1) regardless of how much history has been seen.
+
+    Values follow the `ta` definitions used by compute_indicator_table():
+    - RSI 14 / ATR 14: Wilder smoothing (alpha = 1/14), ATR seeded with the mean of the first 14 true ranges
+    - EMA 12/26 and MACD signal 9: span EMAs seeded with the first value (pandas adjust=False)
+    - SMA 20/50, Bollinger 20 (2 std, population std) and volume SMA 20: rolling windows
+    Indicators whose window is not filled yet are NaN; before MIN_WINDOW bars everything is None.
+    Bars with a missing close are skipped (state unchanged).
+
+    snapshot() returns a JSON-serializable dict; from_snapshot() rebuilds an identical engine.
+    """
+
+    RSI_WINDOW = 14
+    ATR_WINDOW = 14
+    EMA_FAST = 12
+    EMA_SLOW = 26
+    MACD_SIGNAL = 9
+
+    def __init__(self):
+        self.count = 0
+        self.prev_close = None
+        self.ema_fast = None
+        self.ema_slow = None
+        self.macd_signal = None
+        self.macd_count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.atr = None
+        self.tr_seed = []
+        self.sma_20 = _RollingWindow(20)
+        self.sma_50 = _RollingWindow(50)
+        self.volume_20 = _RollingWindow(20)
+        self.last_close = None
+        self._current = empty_indicators()
+
+    @staticmethod
+    def _ema_step(previous, value, window):
+        alpha = 2.0 / (window + 1)
+        return value if previous is None else previous + alpha * (value - previous)
+
+    def update(self, open_, high, low, close, volume):
+        """Consume one bar and return the indicator dict for it."""
+        if close is None or math.isnan(close):
+            return self.current()
+
+        # True range: the first bar has no previous close, so it is just high - low
+        if self.prev_close is None:
+            true_range = high - low
+            change = 0.0
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+            change = close - self.prev_close
+
+        if self.atr is None:
+            self.tr_seed.append(true_range)
+            if len(self.tr_seed) == self.ATR_WINDOW:
+                self.atr = sum(self.tr_seed) / self.ATR_WINDOW
+                self.tr_seed = []
+        else:
+            self.atr = (self.atr * (self.ATR_WINDOW - 1) + true_range) / self.ATR_WINDOW
+
+        rsi_alpha = 1.0 / self.RSI_WINDOW
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        self.avg_gain += rsi_alpha * (gain - self.avg_gain)
+        self.avg_loss += rsi_alpha * (loss - self.avg_loss)
+
+        self.ema_fast = self._ema_step(self.ema_fast, close, self.EMA_FAST)
+        self.ema_slow = self._ema_step(self.ema_slow, close, self.EMA_SLOW)
+        self.count += 1
+        if self.count >= self.EMA_SLOW:
+            macd = self.ema_fast - self.ema_slow
+            self.macd_signal = self._ema_step(self.macd_signal, macd, self.MACD_SIGNAL)
+            self.macd_count += 1
+
+        self.sma_20.push(close)
+        self.sma_50.push(close)
+        self.volume_20.push(volume)
+        self.prev_close = close
+        self.last_close = close
+        self._current = self._compute_current()
+        return self.current()
+
+    def update_row(self, row):
+        """Convenience wrapper for a DataFrame row / dict with open, high, low, close, volume."""
+        return self.update(row['open'], row['high'], row['low'], row['close'], row['volume'])
+
+    def _compute_current(self):
+        if self.count < MIN_WINDOW:
+            return empty_indicators()
+        nan = math.nan
+        if self.count >= self.RSI_WINDOW:
+            rsi = 100.0 if self.avg_loss == 0 else 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        else:
+            rsi = nan
+        atr = self.atr if self.atr is not None else nan
+        bb_middle = self.sma_20.mean()
+        bb_std = self.sma_20.std()
+        macd = self.ema_fast - self.ema_slow if self.count >= self.EMA_SLOW else nan
+        return {
+            'atr_14': atr,
+            'rsi_14': rsi,
+            'sma_20': bb_middle,
+            'sma_50': self.sma_50.mean(),
+            'ema_12': self.ema_fast if self.count >= self.EMA_FAST else nan,
+            'ema_26': self.ema_slow if self.count >= self.EMA_SLOW else nan,
+            'bb_upper': bb_middle + 2 * bb_std,
+            'bb_middle': bb_middle,
+            'bb_lower': bb_middle - 2 * bb_std,
+            'macd': macd,
+            'macd_signal': self.macd_signal if self.macd_count >= self.MACD_SIGNAL else nan,
+            'volume_sma_20': self.volume_20.mean(),
+            'atr_volatility_ratio': atr / self.last_close,
+        }
+
+    def current(self):
+        """Indicator dict for the last consumed bar (a copy, safe to mutate)."""
+        return dict(self._current)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Warm up an engine on a history frame (oldest first), e.g. before going live."""
+        engine = cls()
+        for row in df[['open', 'high', 'low', 'close', 'volume']].itertuples(index=False):
+            engine.update(row.open, row.high, row.low, row.close, row.volume)
+        return engine
+
+    @classmethod
+    def from_arrays(cls, bars, chunk_size=65536):
+        """Warm up an engine on a dict of column arrays (e.g. an OhlcvStore slice) without building a frame."""
+        engine = cls()
+        columns = [bars[name] for name in ['open', 'high', 'low', 'close', 'volume']]
+        # Convert in chunks so multi-million-row histories never become one big Python list
+        for start in range(0, len(columns[0]), chunk_size):
+            for values in zip(*(column[start:start + chunk_size].tolist() for column in columns)):
+                engine.update(*values)
+        return engine
+
+    def snapshot(self):
+        """Return the full engine state as a JSON-serializable dict."""
+        return {
+            'count': self.count,
+            'prev_close': self.prev_close,
+            'last_close': self.last_close,
+            'ema_fast': self.ema_fast,
+            'ema_slow': self.ema_slow,
+            'macd_signal': self.macd_signal,
+            'macd_count': self.macd_count,
+            'avg_gain': self.avg_gain,
+            'avg_loss': self.avg_loss,
+            'atr': self.atr,
+            'tr_seed': list(self.tr_seed),
+            'sma_20': self.sma_20.state(),
+            'sma_50': self.sma_50.state(),
+            'volume_20': self.volume_20.state(),
+        }
+
+    @classmethod
+    def from_snapshot(cls, state):
+        """Rebuild an engine from snapshot() output."""
+        engine = cls()
+        for key in ('count', 'prev_close', 'last_close', 'ema_fast', 'ema_slow', 'macd_signal',
+                    'macd_count', 'avg_gain', 'avg_loss', 'atr'):
+            setattr(engine, key, state[key])
+        engine.tr_seed = list(state['tr_seed'])
+        engine.sma_20 = _RollingWindow.from_state(20, state['sma_20'])
+        engine.sma_50 = _RollingWindow.from_state(50, state['sma_50'])
+        engine.volume_20 = _RollingWindow.from_state(20, state['volume_20'])
+        if engine.count:
+            engine._current = engine._compute_current()
+        return engine
@@ -1,21 +1,34 @@
 """
 Script: export_hourly_yahoo_binance_excel.py
 Purpose: Collect last 6 months of hourly BTC/USD data from Yahoo Finance and Binance, and save to a single Excel file with separate columns for each source.
-Dependencies: pandas, yfinance, ccxt
-Usage: python last_6_months_hourly_data_btc.py
+Incremental mode (--sync): each source is kept in its own OHLCV store (../data/ohlcv/<source>_<symbol>_1h);
+only bars newer than the last stored candle are fetched (the last candle is refetched since it may have been
+incomplete), the overlap is deduped, and the unified ../data/btc_1h_store is updated from the first changed bar.
+Dependencies: pandas, yfinance, ccxt, pyarrow
+Usage: python last_6_months_hourly_data_btc.py            (full 6-month download + Excel export)
+       python last_6_months_hourly_data_btc.py --sync     (nightly delta refresh; add --excel to also rewrite the Excel file)
 """
 
+import argparse
 import os
 import pandas as pd
 import yfinance as yf
 import ccxt
+from dataset_cache import add_unified_ohlcv, write_dataset_cache
+from ohlcv_store import OhlcvStore, build_store_from_merged, frame_to_bars, is_store
 from datetime import datetime, timedelta, timezone
 
-def fetch_yahoo_hourly():
-    """Fetch 6 months of hourly BTC/USD data from Yahoo Finance."""
+OHLCV_STORE_ROOT = os.path.join('..', 'data', 'ohlcv')
+UNIFIED_STORE_PATH = os.path.join('..', 'data', 'btc_1h_store')
+
+def fetch_yahoo_hourly(start=None):
+    """Fetch 6 months of hourly BTC/USD data from Yahoo Finance (or everything from `start` onwards)."""
     print("[INFO] Fetching Yahoo Finance hourly data...")
     btc = yf.Ticker("BTC-USD")
-    hist = btc.history(period="6mo", interval="1h")
+    if start is not None:
+        hist = btc.history(start=start, interval="1h")
+    else:
+        hist = btc.history(period="6mo", interval="1h")
     hist_df = hist.reset_index()
     hist_df = hist_df.rename(columns={
         'Open': 'yahoo_open',
@@ -34,11 +47,13 @@ def fetch_yahoo_hourly():
     print(f"[OK] Yahoo Finance: {len(hist_df)} hourly records")
     return hist_df
 
-def fetch_binance_hourly(symbol='BTC/USDT', months=6):
-    """Fetch 6 months of hourly BTC/USDT data from Binance using ccxt."""
+def fetch_binance_hourly(symbol='BTC/USDT', months=6, since=None):
+    """Fetch 6 months of hourly BTC/USDT data from Binance using ccxt (or everything from `since`, a UTC datetime)."""
     print("[INFO] Fetching Binance hourly data...")
     exchange = ccxt.binance()
-    since = exchange.parse8601((datetime.now(timezone.utc) - timedelta(days=30*months)).strftime('%Y-%m-%dT%H:%M:%S'))
+    if since is None:
+        since = datetime.now(timezone.utc) - timedelta(days=30*months)
+    since = exchange.parse8601(pd.Timestamp(since).strftime('%Y-%m-%dT%H:%M:%S'))
     all_ohlcv = []
     timeframe = '1h'
     limit = 1000
@@ -59,8 +74,8 @@ def fetch_binance_hourly(symbol='BTC/USDT', months=6):
     print(f"[OK] Binance: {len(df)} hourly records")
     return df
 
-def merge_and_export(yahoo_df, binance_df, output_path):
-    """Merge Yahoo and Binance hourly data on date and export to Excel."""
+def merge_and_export(yahoo_df, binance_df, output_path, store_path=None):
+    """Merge Yahoo and Binance hourly data on date and export to Excel (and optionally an OHLCV store)."""
     print("[INFO] Merging Yahoo and Binance data...")
     yahoo_df['date'] = pd.to_datetime(yahoo_df['date']).dt.tz_localize(None)
     binance_df['date'] = pd.to_datetime(binance_df['date']).dt.tz_localize(None)
@@ -72,9 +87,88 @@ def merge_and_export(yahoo_df, binance_df, output_path):
         os.makedirs(dir_name, exist_ok=True)
     combined.to_excel(output_path, index=False)
     print(f"✅ Combined hourly data saved to Excel: {output_path}")
+    # Columnar copy for fast backtest startup (see dataset_cache.load_hourly_dataset)
+    cache_path = write_dataset_cache(combined, output_path)
+    print(f"✅ Parquet cache saved: {cache_path}")
+    if store_path:
+        # Memory-mapped unified OHLCV columns for the backtester / sweep (see ohlcv_store.py)
+        build_store_from_merged(combined, store_path)
+
+def source_store_path(source, symbol, store_root=OHLCV_STORE_ROOT):
+    """e.g. ../data/ohlcv/binance_BTC-USDT_1h"""
+    return os.path.join(store_root, f"{source}_{symbol.replace('/', '-')}_1h")
+
+def _strip_prefix(df, prefix):
+    """yahoo_* / binance_* frame -> 'date' + open/high/low/close/volume (rows without a close dropped)."""
+    df = df.rename(columns={f"{prefix}_{field}": field for field in ['open', 'high', 'low', 'close', 'volume']})
+    df['date'] = pd.to_datetime(df['date']).dt.tz_localize(None)
+    return df.dropna(subset=['close'])
+
+def _store_to_source_frame(store, prefix, start_time=None):
+    """Rows of a per-source store as a yahoo_* / binance_* frame, as returned by the fetch functions."""
+    df = store.to_frame(*store.locate(start_time))
+    return df.rename(columns={field: f"{prefix}_{field}" for field in ['open', 'high', 'low', 'close', 'volume']})
+
+def sync_source(source, symbol, fetch, store_root=OHLCV_STORE_ROOT):
+    """
+    Bring one source's store up to date. `fetch(start)` returns a prefixed frame from `start`
+    (None = full history). Returns (store, first_changed_date or None).
+    """
+    path = source_store_path(source, symbol, store_root)
+    if is_store(path):
+        store = OhlcvStore.open(path, mode='r+')
+        # Start at the last stored candle: it may have been fetched while still open
+        last_date = pd.to_datetime(store.last_timestamp(), unit='ns') if len(store) else None
+        print(f"[INFO] {source}: {len(store)} stored bars, last {last_date}")
+    else:
+        store = OhlcvStore.create(path, symbol, '1h', source)
+        last_date = None
+
+    fetched = _strip_prefix(fetch(last_date), source)
+    if fetched.empty:
+        print(f"[INFO] {source}: no new bars")
+        return store, None
+    replaced, added = store.upsert_tail(frame_to_bars(fetched))
+    print(f"[OK] {source}: {added} new bars, {replaced} refreshed ({len(store)} total)")
+    return store, fetched['date'].min()
+
+def sync_hourly_stores(symbol='BTC/USDT', store_root=OHLCV_STORE_ROOT, unified_path=UNIFIED_STORE_PATH):
+    """
+    Incremental refresh: sync the Yahoo and Binance stores, then rebuild the unified store's tail
+    from the earliest changed bar. Returns the per-source stores (yahoo, binance).
+    """
+    yahoo_store, yahoo_changed = sync_source('yahoo', 'BTC-USD', lambda start: fetch_yahoo_hourly(start=start), store_root)
+    binance_store, binance_changed = sync_source('binance', symbol, lambda start: fetch_binance_hourly(symbol, since=start), store_root)
+
+    changed = [date for date in (yahoo_changed, binance_changed) if date is not None]
+    if not changed and is_store(unified_path):
+        print("[INFO] Unified store already up to date")
+        return yahoo_store, binance_store
+    changed_from = min(changed) if changed and is_store(unified_path) else None
+
+    combined = pd.merge(_store_to_source_frame(yahoo_store, 'yahoo', changed_from),
+                        _store_to_source_frame(binance_store, 'binance', changed_from), on='date', how='outer')
+    if changed_from is None:
+        build_store_from_merged(combined, unified_path, symbol=symbol, source='binance+yahoo')
+    else:
+        df = add_unified_ohlcv(combined.sort_values('date')).dropna(subset=['close'])
+        unified = OhlcvStore.open(unified_path, mode='r+')
+        replaced, added = unified.upsert_tail(frame_to_bars(df))
+        print(f"[OK] Unified store: {added} new bars, {replaced} refreshed ({len(unified)} total)")
+    return yahoo_store, binance_store
 
 if __name__ == "__main__":
-    yahoo_df = fetch_yahoo_hourly()
-    binance_df = fetch_binance_hourly()
+    parser = argparse.ArgumentParser(description="Hourly BTC data from Yahoo Finance and Binance")
+    parser.add_argument('--sync', action='store_true', help="Incremental refresh of the local OHLCV stores")
+    parser.add_argument('--excel', action='store_true', help="With --sync: also rewrite the merged Excel file")
+    args = parser.parse_args()
     output_path = 'btc_hourly_yahoo_binance_6mo.xlsx'  # Save in current directory
-    merge_and_export(yahoo_df, binance_df, output_path)
+
+    if args.sync:
+        yahoo_store, binance_store = sync_hourly_stores()
+        if args.excel:
+            merge_and_export(_store_to_source_frame(yahoo_store, 'yahoo'), _store_to_source_frame(binance_store, 'binance'), output_path)
+    else:
+        yahoo_df = fetch_yahoo_hourly()
+        binance_df = fetch_binance_hourly()
+        merge_and_export(yahoo_df, binance_df, output_path, store_path=UNIFIED_STORE_PATH)
@@ -0,0 +1,232 @@
+"""
+LLM Client Manager for Bitcoin Trading Agent
+
+Purpose: One long-lived Groq client per process instead of a new client (and .env parse, TLS
+handshake, connection setup) for every decision.
+
+- The API key is loaded from .env once
+- Sync (Groq) and async (AsyncGroq) clients share the same settings and keep their HTTP
+  connections alive in an httpx pool between decisions; async clients are kept per event loop
+  and closed on that loop: await close_async_clients() before a short-lived loop (asyncio.run)
+  ends, long-running loops are closed at interpreter exit (or with close())
+- Configurable connect / read timeouts
+- Retry with exponential backoff and jitter on connection errors, timeouts, 429 and 5xx
+  (Retry-After is honoured when the API sends it); other errors are raised immediately
+- Token usage is accumulated per process, including prompt tokens served from the provider's
+  prefix cache (usage.prompt_tokens_details.cached_tokens) when the API reports them
+
+Usage:
+    from llm_client import get_llm_client
+    response = get_llm_client().chat(model=..., messages=[...], temperature=0.2)
+    response = await get_llm_client().achat(model=..., messages=[...])
+    await close_async_clients()   # at the end of the coroutine passed to asyncio.run()
+
+Dependencies: groq, httpx, python-dotenv
+"""
+
+import asyncio
+import atexit
+import os
+import random
+import threading
+import time
+
+import httpx
+import groq
+from dotenv import load_dotenv
+from groq import AsyncGroq, Groq
+
+REQUEST_TIMEOUT = 60.0      # seconds to wait for a completion
+CONNECT_TIMEOUT = 5.0       # seconds to open a connection
+MAX_RETRIES = 3             # retries after the first attempt
+BACKOFF_BASE = 0.5          # first retry delay in seconds, doubled on every retry
+BACKOFF_MAX = 8.0           # upper bound for a single retry delay
+MAX_CONNECTIONS = 10
+MAX_KEEPALIVE_CONNECTIONS = 5
+KEEPALIVE_EXPIRY = 120.0    # seconds an idle connection is kept open
+
+RETRYABLE_ERRORS = (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
+
+
+class LLMClientManager:
+    def __init__(self, api_key=None, timeout=REQUEST_TIMEOUT, connect_timeout=CONNECT_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        if api_key is None:
+            load_dotenv()
+            api_key = os.getenv('GROQ_API_KEY')
+        if not api_key:
+            raise Exception("Groq API key missing in .env")
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                   max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                                   keepalive_expiry=KEEPALIVE_EXPIRY)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.requests = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cache_reported_prompt_tokens = 0  # prompt tokens of responses that reported a cache figure
+        self._client = None
+        self._async_clients = {}   # event loop -> AsyncGroq bound to that loop
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ clients
+    @property
+    def client(self):
+        """Pooled synchronous Groq client (created on first use). The SDK's own retries are off."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    http_client = httpx.Client(timeout=self.timeout, limits=self.limits)
+                    self._client = Groq(api_key=self.api_key, http_client=http_client,
+                                        timeout=self.timeout, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self):
+        """
+        Pooled AsyncGroq client for the running event loop. httpx async connections belong to the
+        loop that opened them, so a new client is made if called from a different loop.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            with self._lock:
+                stale = [old for old in self._async_clients if old.is_closed()]
+                for old_loop in stale:
+                    del self._async_clients[old_loop]
+            if stale:
+                print(f"[WARNING] Dropped {len(stale)} async LLM client(s) whose event loop ended without close_async_clients()")
+            http_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            client = AsyncGroq(api_key=self.api_key, http_client=http_client,
+                               timeout=self.timeout, max_retries=0)
+            with self._lock:
+                self._async_clients[loop] = client
+        return client
+
+    # ------------------------------------------------------------------ retry policy
+    def _retry_delay(self, attempt, error):
+        """Backoff before retry number `attempt` (1-based); uses Retry-After when provided."""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** (attempt - 1)), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _log_retry(self, attempt, delay, error):
+        self.retries += 1
+        print(f"[WARNING] LLM request failed ({type(error).__name__}: {error}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+
+    # ------------------------------------------------------------------ requests
+    def chat(self, **kwargs):
+        """client.chat.completions.create(**kwargs) with retry/backoff."""
+        self.requests += 1
+        attempt = 0
+        while True:
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+                self.record_usage(response)
+                return response
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                self._log_retry(attempt, delay, e)
+                time.sleep(delay)
+
+    async def achat(self, **kwargs):
+        """Async version of chat() using the pooled AsyncGroq client."""
+        self.requests += 1
+        attempt = 0
+        while True:
+            try:
+                response = await self.async_client.chat.completions.create(**kwargs)
+                self.record_usage(response)
+                return response
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                self._log_retry(attempt, delay, e)
+                await asyncio.sleep(delay)
+
+    def record_usage(self, response):
+        """Add a completion's usage to the run totals (also used for streamed completions)."""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.completion_tokens += usage.completion_tokens or 0
+        cached = cached_prompt_tokens(usage)
+        if cached is not None:
+            self.cached_tokens += cached
+            self.cache_reported_prompt_tokens += usage.prompt_tokens or 0
+
+    def stats(self):
+        ratio = self.cached_tokens / self.cache_reported_prompt_tokens if self.cache_reported_prompt_tokens else 0.0
+        return {'requests': self.requests, 'retries': self.retries,
+                'prompt_tokens': self.prompt_tokens, 'completion_tokens': self.completion_tokens,
+                'cached_tokens': self.cached_tokens, 'cached_token_ratio': ratio}
+
+    def close(self, timeout=5.0):
+        """Close the sync pool and the async pools (on their own loops when those still run)."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        with self._lock:
+            clients, self._async_clients = self._async_clients, {}
+        for loop, client in clients.items():
+            if not loop.is_running() or loop.is_closed():
+                continue  # nothing can await on this loop any more; the pool goes with the client
+            try:
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout)
+            except Exception as e:
+                print(f"[WARNING] Could not close async LLM client: {e}")
+
+    async def aclose(self):
+        """Close the async pool of the running event loop (call before asyncio.run() returns)."""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+
+def cached_prompt_tokens(usage):
+    """Prompt tokens served from the provider's prefix cache, or None if the response does not say."""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if details is None:
+        return None
+    if isinstance(details, dict):
+        return details.get('cached_tokens')
+    return getattr(details, 'cached_tokens', None)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_llm_client():
+    """Process-wide LLMClientManager (created on first use)."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = LLMClientManager()
+                atexit.register(_manager.close)
+    return _manager
+
+
+async def close_async_clients():
+    """Close the pooled async client of the running event loop, if one was created."""
+    if _manager is not None:
+        await _manager.aclose()
@@ -120,20 +120,25 @@ import json  # For formatting and parsing JSON
 import gspread  # For Google Sheets API
 import re  # Import regex for extracting JSON
 import sys
-from groq import Groq  # Groq API client for LLM interaction
+from llm_client import get_llm_client  # Pooled Groq client shared across decisions
 from dotenv import load_dotenv  # Loads environment variables from .env file
 from google.oauth2.service_account import Credentials  # For Google Sheets authentication
-from trade_executor_03 import get_portfolio, initialize_binance_client  # Import portfolio functions
+from trade_executor_03 import get_live_portfolio, initialize_binance_client  # Import portfolio functions
 
 # Add the modules directory to sys.path to import local modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'modules')))
 
+_binance_client = None
+
+def get_binance_client():
+    """Binance client created once per process (its BalanceLedger / stream cache is reused across calls)."""
+    global _binance_client
+    if _binance_client is None:
+        _binance_client = initialize_binance_client()
+    return _binance_client
+
 def initialize_groq_client():
-    load_dotenv()  # Load environment variables from .env
-    api_key = os.getenv('GROQ_API_KEY')  # Get Groq API key
-    if not api_key:
-        raise Exception("Groq API key missing in .env")  # Error if key is missing
-    return Groq(api_key=api_key)  # Return Groq client
+    return get_llm_client().client  # Shared pooled Groq client (key loaded from .env once)
 
 def read_md_market_data(md_path="complete_bitcoin_data.md"):
     try:
@@ -263,23 +268,45 @@ def extract_json_from_response(response_text): # To parse json from LLM Response
 #             "confidence": 50,
 #             "rationale": "LLM decision failed, defaulting to HOLD."
 #         }
+
+# Fixed decision instructions, sent as the first message of every request. Keep this byte-stable:
+# any edit invalidates the provider's cached prompt prefix (bump PROMPT_TEMPLATE_VERSION when it changes).
+PROMPT_TEMPLATE_VERSION = "v2"
+DECISION_SYSTEM_PROMPT = """You are a Bitcoin trading assistant. Analyze the comprehensive market data report, current portfolio status, and recent trade history in the user message. Suggest a trading action (BUY, SELL, or HOLD) with a confidence score (0-100). Provide a brief rationale.
+
+Respond ONLY with valid JSON (no markdown, no explanation, no code block markers):
+
+{
+    "action": "BUY|SELL|HOLD",
+    "confidence": <0-100>,
+    "rationale": "<brief explanation>"
+}
+"""
+
 def get_llm_decision(
     md_path="complete_bitcoin_data.md",
     portfolio=None,
     trade_history=None,
-    use_google_sheet=False
+    use_google_sheet=False,
+    snapshot=None,
+    on_early_decision=None
 ):
     """
     Get trading decision from LLM using market data, portfolio, and trade history.
-    For backtest, pass in portfolio and trade_history directly.
+    For backtest, pass in portfolio and trade_history directly, and the bar's MarketSnapshot as
+    `snapshot` (its values go into the prompt as JSON; no markdown file is written or read).
+    on_early_decision(decision) is called once with a parsed decision (the answer is not streamed
+    here, so it fires with the final decision; same contract as llm_decision_strategy_05).
     """
     count = 0  # ------ setting to only print data passed into llm once
     if portfolio is None:
-        portfolio = get_portfolio(binance_client)  # Get current Binance portfolio
+        portfolio = get_live_portfolio(get_binance_client())  # Ledger / user data stream, not get_account() per call
 
     try:
-        client = initialize_groq_client()  # Initialize Groq client for LLM
-        md_content = read_md_market_data(md_path)  # Read full market data from markdown
+        if snapshot is not None:
+            md_content = json.dumps(snapshot.as_context(), indent=2)  # Structured bar data, no file I/O
+        else:
+            md_content = read_md_market_data(md_path)  # Read full market data from markdown
 
         # Use provided portfolio/trade_history, or fallback to reading from APIs
         if portfolio is None:
@@ -297,10 +324,10 @@ def get_llm_decision(
         if not md_content:
             raise Exception("No market data found in markdown file.")
 
-        system_prompt = f"""
-You are a Bitcoin trading assistant. Analyze the following comprehensive market data report, current portfolio status, and recent trade history. Suggest a trading action (BUY, SELL, or HOLD) with a confidence score (0-100). Provide a brief rationale.
-
-MARKET DATA REPORT:
+        # Static instructions go first (byte-identical every call, so the provider can cache the
+        # prefix); only the per-bar data goes into the user message.
+        system_prompt = DECISION_SYSTEM_PROMPT
+        user_prompt = f"""MARKET DATA REPORT:
 {md_content}
 
 PORTFOLIO STATUS:
@@ -308,14 +335,6 @@ PORTFOLIO STATUS:
 
 RECENT TRADE HISTORY (last {len(trade_history)} trades):
 {json.dumps(trade_history, indent=2)}
-
-Respond ONLY with valid JSON (no markdown, no explanation, no code block markers):
-
-{{
-    "action": "BUY|SELL|HOLD",
-    "confidence": <0-100>,
-    "rationale": "<brief explanation>"
-}}
 """
         if count == 0:
                     # Print out all data being fed to the LLM
@@ -328,20 +347,24 @@ Respond ONLY with valid JSON (no markdown, no explanation, no code block markers
             print(f"\n----- RECENT TRADE HISTORY (last {len(trade_history)} trades) -----")
             print(json.dumps(trade_history, indent=2))
             print("====================================\n")
-            print(f"System Prompt : {system_prompt}")
+            print(f"System Prompt ({PROMPT_TEMPLATE_VERSION}) : {system_prompt}")
+            print(f"User Prompt : {user_prompt}")
             print(f"LLM Input Data Count: {count}")
             count+=1
 
-        response = client.chat.completions.create(
+        response = get_llm_client().chat(  # Pooled client with timeouts and retry/backoff
             model="openai/gpt-oss-120b",
             messages=[
-                {"role": "system", "content": system_prompt}
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
             ],
         )
         response_text = response.choices[0].message.content.strip()
         decision = extract_json_from_response(response_text)
         if decision:
             print(f"[LLM] Decision: {decision['action']} ({decision['confidence']}%) - {decision['rationale']}")
+            if on_early_decision is not None:
+                on_early_decision(decision)
             return decision
         else:
             return {
@@ -0,0 +1,137 @@
+"""
+LLM Decision Cache for Bitcoin Trading Agent
+
+Purpose: Persistent record/replay cache for LLM trading decisions, so a backtest over the same
+period can be re-run (e.g. after changing fees or plotting code) without paying a Groq round-trip
+per bar, and with bit-for-bit identical decisions.
+
+Keys are a SHA-256 of (model name, temperature, prompt template version, context), serialized as
+canonical JSON, so changing the model, the prompt or any part of the context gives a new key.
+
+Modes:
+- off:            cache disabled, always call the LLM
+- record:         always call the LLM and store (overwrite) the decision
+- replay:         only serve stored decisions; a missing key raises DecisionCacheMiss
+- record-missing: serve stored decisions, call the LLM and store only on a miss
+
+A call that finished after the decision_scheduler deadline (in_time() is false) is stored as a
+"missed deadline" marker instead of its answer: the recorded run used the rule-based fallback for
+that bar, so a replay serves None there and the scheduler falls back again.
+
+Storage: append-only JSON Lines file (one decision per line, later lines win), loaded into memory
+once at startup.
+
+Dependencies: none (standard library)
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+CACHE_MODES = ('off', 'record', 'replay', 'record-missing')
+LATE_MARKER = {'missed_deadline': True}
+
+
+class DecisionCacheMiss(KeyError):
+    """Raised in replay mode when a decision was never recorded for this key."""
+
+
+def decision_cache_key(model, temperature, prompt_version, context):
+    """Stable hash of everything that determines the LLM's answer."""
+    payload = json.dumps(
+        {
+            'model': model,
+            'temperature': temperature,
+            'prompt_version': prompt_version,
+            'context': context,
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DecisionCache:
+    def __init__(self, path="llm_decision_cache.jsonl", mode="record-missing"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.llm_calls = 0
+        self.late = 0
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        if self.mode == 'off' or not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash while appending can leave a truncated last line; skip it
+                    print(f"[WARNING] Skipping unreadable LLM cache line {line_number} in {self.path}")
+                    continue
+                self._entries[entry['key']] = entry['decision']
+        print(f"[INFO] Loaded {len(self._entries)} cached LLM decisions from {self.path}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def put(self, key, decision, **meta):
+        """Store a decision in memory and append it to the cache file."""
+        self._entries[key] = decision
+        entry = {'key': key, 'decision': decision, 'recorded_at': datetime.now().isoformat(timespec='seconds')}
+        entry.update(meta)
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, sort_keys=True, default=str) + '\n')
+
+    def lookup_or_call(self, key, call, in_time=None, **meta):
+        """
+        Resolve a decision according to the cache mode.
+        `call` is a zero-argument function querying the LLM; a None result is never stored.
+        `in_time` (optional, zero-argument) is asked once the answer is there; if it is false the
+        caller's deadline has passed and LATE_MARKER is stored instead of the answer (the answer is
+        still returned, the scheduler only logs it).
+        """
+        if self.mode == 'off':
+            self.llm_calls += 1
+            return call()
+
+        if self.mode in ('replay', 'record-missing') and key in self._entries:
+            self.hits += 1
+            if self._entries[key] == LATE_MARKER:
+                return None  # recorded run missed the deadline here and used the fallback
+            return dict(self._entries[key])
+
+        self.misses += 1
+        if self.mode == 'replay':
+            raise DecisionCacheMiss(f"No recorded LLM decision for key {key[:12]}... (replay mode)")
+
+        self.llm_calls += 1
+        decision = call()
+        if in_time is not None and not in_time():
+            self.late += 1
+            self.put(key, dict(LATE_MARKER), **meta)
+            return decision
+        if decision is not None:
+            self.put(key, decision, **meta)
+        return decision
+
+    def stats(self):
+        return {'mode': self.mode, 'entries': len(self._entries), 'hits': self.hits,
+                'misses': self.misses, 'llm_calls': self.llm_calls, 'late': self.late}
@@ -16,14 +16,59 @@ Usage (in trading bot sim loop):
     decision, active_trades = manage_trades(portfolio, active_trades, last_10_trades)
 """
 
-import os
 import re
 import json
 import time
 
 from datetime import datetime
-from groq import Groq
-from dotenv import load_dotenv
+from llm_client import get_llm_client, cached_prompt_tokens
+from llm_decision_cache import decision_cache_key, DecisionCacheMiss
+from decision_scheduler import answer_in_time
+from regime_cache import regime_key
+from llm_hedging import HedgedLLM
+from decision_protocol import (decision_from_text, limits_from_context, request_decision, request_json_object,
+                               validate_decision)
+from market_snapshot import MarketSnapshot
+from prompt_encoder import encode_context, encode_market_line, count_tokens
+
+LLM_MODEL = "moonshotai/kimi-k2-instruct-0905"
+LLM_TEMPERATURE = 0.2
+# Bump whenever the prompt text below changes, so cached decisions are not replayed for a different prompt
+PROMPT_TEMPLATE_VERSION = "v3"
+
+# Token budget for the encoded CONTEXT block of the prompt (prompt_encoder.encode_context)
+PROMPT_CONTEXT_TOKEN_BUDGET = 700
+
+# Optional DecisionCache (llm_decision_cache.py); set by the backtester via set_decision_cache()
+_decision_cache = None
+
+def set_decision_cache(cache):
+    """Route get_llm_decision through a DecisionCache (or disable caching with None)."""
+    global _decision_cache
+    _decision_cache = cache
+
+# Optional RegimeCache (regime_cache.py): reuses decisions across similar market regimes
+_regime_cache = None
+
+def set_regime_cache(cache):
+    """Serve get_llm_decision from a RegimeCache before the exact cache / Groq (None disables it)."""
+    global _regime_cache
+    _regime_cache = cache
+
+# Optional HedgedLLM (llm_hedging.py): primary + secondary model, first valid answer wins
+LLM_SECONDARY_MODEL = "openai/gpt-oss-120b"
+LLM_HEDGE_DELAY_SECONDS = 1.5
+_hedger = None
+
+def set_llm_hedger(hedger):
+    """Send decision requests through a HedgedLLM (None: single request to LLM_MODEL)."""
+    global _hedger
+    _hedger = hedger
+
+def create_llm_hedger(secondary_model=LLM_SECONDARY_MODEL, hedge_delay=LLM_HEDGE_DELAY_SECONDS):
+    """HedgedLLM over LLM_MODEL and secondary_model (JSON mode where accepted), validated with parse_llm_decision."""
+    return HedgedLLM([LLM_MODEL, secondary_model], validate=parse_llm_decision, hedge_delay=hedge_delay,
+                     json_mode=True)
 
 def load_config():
     """Load configuration parameters from config.cfg file."""
@@ -154,12 +199,8 @@ def extract_json_from_response(response_text):
             return None
 
 def initialize_groq_client():
-    """Initialize Groq client with API key from .env."""
-    load_dotenv()
-    api_key = os.getenv('GROQ_API_KEY')
-    if not api_key:
-        raise Exception("Groq API key missing in .env")
-    return Groq(api_key=api_key)
+    """Shared pooled Groq client (API key read from .env once, see llm_client.py)."""
+    return get_llm_client().client
 
 # def build_llm_context(portfolio, active_trades, latest_data, config, last_10_trades):
 #     """Bundle all relevant strategy triggers, market info, and last 10 trades for LLM context."""
@@ -396,15 +437,52 @@ def track_time(func):
         # }
 # ----------------------- Now gives quantity of buy sell as well ----------------------------------------
 @track_time
-def get_llm_decision(context):
+def get_llm_decision(context, raise_errors=False, on_early_decision=None):
     """
     Query Groq LLM for trading decision using full context.
     Returns dict: {action, amount (for BUY), quantity (for SELL), confidence, rationale}
+    When a decision cache is set, decisions are recorded / replayed instead of re-querying Groq;
+    a regime cache, when set, is checked first and serves decisions for similar market states.
+    With raise_errors=True, API errors are raised and an unparseable answer returns None instead
+    of a default HOLD (used by decision_scheduler to fall back to the rules).
+    on_early_decision(decision) is called exactly once for a valid decision: mid-stream as soon as
+    the action and amount are parsed, or with the final decision for cached / non-streamed answers.
     """
+    fired = []
+
+    def early(decision):
+        fired.append(decision)
+        on_early_decision(decision)
+
+    early_callback = early if on_early_decision is not None else None
     try:
-        client = initialize_groq_client()
-        # Compose prompt for LLM
-        system_prompt = f"""
+        if _regime_cache is not None:
+            key = regime_key(context, LLM_MODEL, LLM_TEMPERATURE, PROMPT_TEMPLATE_VERSION)
+            decision = _regime_cache.lookup_or_call(key, context, lambda: cached_llm_decision(context, early_callback))
+        else:
+            decision = cached_llm_decision(context, early_callback)
+        if decision and early_callback is not None and not fired:
+            early_callback(decision)
+        if decision or raise_errors:
+            return decision
+        return {
+            "action": "HOLD",
+            "rationale": "LLM response parsing failed, defaulting to HOLD."
+        }
+    except DecisionCacheMiss:
+        raise
+    except Exception as e:
+        if raise_errors:
+            raise
+        return {
+            "action": "HOLD",
+            "rationale": "LLM decision failed, defaulting to HOLD."
+        }
+
+# Fixed decision instructions, sent byte-for-byte identical as the system message on every call so
+# the provider can reuse its cached prompt prefix; only the CONTEXT user message changes per bar.
+# Any edit to this text requires bumping PROMPT_TEMPLATE_VERSION.
+DECISION_SYSTEM_PROMPT = """
 You are an expert Bitcoin trading algorithm focused on maximizing and securing profits on hourly timeframes.
 Your top priorities are:
 - **Maximize total portfolio value** (BTC value at current price + USDT balance + USD PROFIT).
@@ -458,50 +536,152 @@ TECHNICAL INDICATORS:
 PROVIDE SPECIFIC RATIONALE: Include exact price targets, stop-loss levels, and the specific technical signals that triggered your decision. Always explain why you chose to secure profits, how much is left for reinvestment, and how your action will help maximize total portfolio value and USD PROFIT.
 
 
-CONTEXT:
-{json.dumps(context, indent=2)}
-
 Respond ONLY with valid JSON (no markdown, no explanation, no code block markers):
 
-{{
+{
     "action": "BUY|SELL|HOLD|PROFIT",
     "buy_amount": <USD amount for BUY, omit for others>,
     "quantity": <BTC quantity for SELL, omit for others>,
     "profit_amount": <USD amount for PROFIT, omit for others>,
     "confidence": <0-100>,
     "rationale": "<brief explanation including how much is secured and how much is left for reinvestment>"
-}}
+}
+
+"""
+DECISION_SYSTEM_PROMPT_TOKENS = count_tokens(DECISION_SYSTEM_PROMPT)
+
+def report_prompt_tokens(user_prompt, context_tokens, dropped, response, static_tokens=None):
+    """
+    Print estimated prompt tokens per call, the provider's actual usage and, when returned,
+    how many prompt tokens were served from the provider's prefix cache.
+    """
+    static_tokens = static_tokens or DECISION_SYSTEM_PROMPT_TOKENS
+    line = (f"[LLM] prompt ~{static_tokens + count_tokens(user_prompt)} tokens "
+            f"(static {static_tokens}, context {context_tokens}/{PROMPT_CONTEXT_TOKEN_BUDGET}")
+    if dropped:
+        line += f", dropped {len(dropped)}: {', '.join(sorted(set(dropped)))}"
+    line += ")"
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        line += f" | usage: prompt={usage.prompt_tokens} completion={usage.completion_tokens}"
+        cached = cached_prompt_tokens(usage)
+        if cached is not None and usage.prompt_tokens:
+            stats = get_llm_client().stats()
+            line += (f" cached={cached} ({cached / usage.prompt_tokens:.0%}, "
+                     f"run {stats['cached_token_ratio']:.0%})")
+    print(line)
+
+def cached_llm_decision(context, on_early_decision=None):
+    """request_llm_decision() through the exact-match DecisionCache when one is set."""
+    if _decision_cache is None:
+        return request_llm_decision(context, on_early_decision)
+    key = decision_cache_key(LLM_MODEL, LLM_TEMPERATURE, PROMPT_TEMPLATE_VERSION, context)
+    return _decision_cache.lookup_or_call(
+        key, lambda: request_llm_decision(context, on_early_decision), in_time=answer_in_time,
+        model=LLM_MODEL, prompt_version=PROMPT_TEMPLATE_VERSION
+    )
+
+def parse_llm_decision(response_text):
+    """
+    Parse and schema-check a decision response (decision_protocol, without portfolio limits).
+    Returns the normalized decision dict, or None if it is not usable.
+    """
+    decision, errors = decision_from_text(response_text)
+    if decision is None:
+        print(f"[WARNING] Unusable LLM decision: {'; '.join(errors)}")
+    return decision
 
+def request_llm_decision(context, on_early_decision=None):
+    """
+    Single uncached Groq request (hedged across models when a HedgedLLM is set).
+    on_early_decision is passed to the streamed request (see decision_protocol.request_decision).
+    Returns the normalized decision dict, or None if the response could not be parsed.
+    API errors are raised to the caller.
+    """
+    # Dense, token-budgeted context instead of indented JSON (see prompt_encoder.py)
+    encoded_context, context_tokens, dropped = encode_context(context, PROMPT_CONTEXT_TOKEN_BUDGET)
+    # Fixed instructions first (cacheable prefix), then only the per-bar context
+    user_prompt = f"CONTEXT:\n{encoded_context}"
+    messages = [
+        {"role": "system", "content": DECISION_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+    # Amounts are checked against the balances of this bar (decision_protocol.validate_decision)
+    limits = limits_from_context(context)
+    if _hedger is not None:
+        # Same prompt to the primary and, after the hedge delay, the secondary model; first valid answer wins
+        decision, response, model = _hedger.request(
+            messages=messages, validate=lambda text: decision_from_text(text, limits)[0],
+            temperature=LLM_TEMPERATURE
+        )
+        report_prompt_tokens(user_prompt, context_tokens, dropped, response)
+        print(f"[LLM] Hedged decision answered by {model}")
+        return decision
+    # JSON mode, streamed until the object closes, validated, one short repair retry if invalid
+    decision, response, info = request_decision(messages, LLM_MODEL, limits, temperature=LLM_TEMPERATURE,
+                                                on_early_decision=on_early_decision)
+    report_prompt_tokens(user_prompt, context_tokens, dropped, response)
+    return decision
+
+# Batched research mode: several consecutive bars in one request. The instructions extend the
+# single-bar prompt, so the shared prefix is still served from the provider's prompt cache.
+BATCH_SYSTEM_PROMPT = DECISION_SYSTEM_PROMPT + """
+BATCH MODE:
+The user message holds the shared PORTFOLIO / TRADES context and then BAR 1..N, one MARKET line per
+hourly bar in time order. Decide every bar on its own as if it were the latest bar: use only that bar
+and the bars before it, never later bars, and assume the portfolio shown (earlier decisions in this
+batch are not applied). Respond ONLY with one JSON object holding one decision object per bar, in order:
+
+{"decisions": [{"bar": 1, "action": "...", ...same fields as above...}, ...]}
 """
-        response = client.chat.completions.create(
-            model="moonshotai/kimi-k2-instruct-0905",
-            messages=[
-                {"role": "system", "content": system_prompt}
-            ],
-            temperature=0.2 
+BATCH_SYSTEM_PROMPT_TOKENS = count_tokens(BATCH_SYSTEM_PROMPT)
+BATCH_MAX_TOKENS_PER_BAR = 160
+
+def get_llm_batch_decisions(contexts):
+    """
+    One request for several consecutive bars (contexts share portfolio and trade history; each has
+    its own market_data). Returns a list with one validated decision (or None) per context.
+    Later bars are visible to the model, so this is for research runs, not for execution.
+    """
+    if not contexts:
+        return []
+    shared = {key: value for key, value in contexts[0].items() if key != 'market_data'}
+    encoded_context, context_tokens, dropped = encode_context(shared, PROMPT_CONTEXT_TOKEN_BUDGET)
+    bar_lines = [f"BAR {n} {encode_market_line(context.get('market_data') or {})}"
+                 for n, context in enumerate(contexts, 1)]
+    user_prompt = f"CONTEXT:\n{encoded_context}\nBARS ({len(contexts)}):\n" + '\n'.join(bar_lines)
+    messages = [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+    def request():
+        answer, response, raw = request_json_object(
+            messages, LLM_MODEL, temperature=LLM_TEMPERATURE,
+            max_tokens=BATCH_MAX_TOKENS_PER_BAR * len(contexts)
         )
-        response_text = response.choices[0].message.content.strip()
-        decision = extract_json_from_response(response_text)
-        if decision:
-            # Return full decision including amount/quantity if present
-            return {
-                "action": decision.get("action"),
-                "buy_amount": decision.get("buy_amount"),  # For BUY
-                "quantity": decision.get("quantity"),
-                "profit_amount": decision.get("profit_amount"),  # For PROFIT
-                "confidence": decision.get("confidence", 0),
-                "rationale": decision.get("rationale", "")
-            }
-        else:
-            return {
-                "action": "HOLD",
-                "rationale": "LLM response parsing failed, defaulting to HOLD."
-            }
-    except Exception as e:
-        return {
-            "action": "HOLD",
-            "rationale": "LLM decision failed, defaulting to HOLD."
-        }
+        report_prompt_tokens(user_prompt, context_tokens, dropped, response, BATCH_SYSTEM_PROMPT_TOKENS)
+        items = answer.get('decisions') if isinstance(answer, dict) else None
+        if not isinstance(items, list):
+            print(f"[WARNING] Batched LLM answer has no decisions list: {raw[:200]}")
+            return None
+        by_bar = {item.get('bar'): item for item in items if isinstance(item, dict)}
+        decisions = []
+        for n, context in enumerate(contexts, 1):
+            item = by_bar.get(n, items[n - 1] if n <= len(items) else None)
+            decision, errors = validate_decision(item, limits_from_context(context))
+            if errors:
+                print(f"[WARNING] Batched decision for bar {n} rejected: {'; '.join(errors)}")
+            decisions.append(decision)
+        return decisions
+
+    if _decision_cache is None:
+        decisions = request()
+    else:
+        key = decision_cache_key(LLM_MODEL, LLM_TEMPERATURE, PROMPT_TEMPLATE_VERSION + '-batch', contexts)
+        decisions = _decision_cache.lookup_or_call(key, request, model=LLM_MODEL,
+                                                   prompt_version=PROMPT_TEMPLATE_VERSION + '-batch')
+    return decisions or [None] * len(contexts)
     # def manage_trades(portfolio, active_trades, last_10_trades):
     #     """
     #     Main strategy manager function.
@@ -768,10 +948,14 @@ def manage_trades(portfolio, active_trades, last_10_trades, config, context, lat
     Calls LLM for a decision and returns it, along with active trades.
     No portfolio management or balance updates.
     """
-    # Parse latest_data if provided as a string (md_content)
-    if latest_data is None or isinstance(latest_data, str):
+    # Structured data first (MarketSnapshot / context['market_data']); markdown parsing is the legacy fallback
+    if isinstance(latest_data, MarketSnapshot):
+        latest_data = latest_data.as_latest_data()
+    elif latest_data is None or isinstance(latest_data, str):
         if isinstance(latest_data, str):
             latest_data = parse_latest_data_from_md_content(latest_data)
+        elif isinstance(context, dict) and 'market_data' in context:
+            latest_data = context['market_data']
         elif isinstance(context, dict) and 'md_content' in context:
             latest_data = parse_latest_data_from_md_content(context['md_content'])
         else:
@@ -0,0 +1,182 @@
+"""
+Hedged LLM Requests for Bitcoin Trading Agent
+
+Purpose: Cuts tail latency of LLM decisions by sending the same prompt to a primary model and,
+if no valid answer arrived after hedge_delay seconds, to the next model as well. The first
+response that passes validation wins; the requests still in flight are cancelled.
+
+- Requests run on the pooled AsyncGroq client (llm_client) inside one background event loop,
+  so cancelling a losing request really closes its HTTP request
+- A model that fails or returns an invalid answer immediately triggers the next model
+  (no need to wait for the hedge delay)
+- json_mode=True asks every model for JSON mode with the same per-model fallback as
+  decision_protocol: a model that rejects response_format is retried, and later asked, without it
+- Per-model latency samples (last LATENCY_WINDOW answers) with p50 / p95 / p99, plus wins,
+  invalid answers, failures and cancellations; 'hedged' holds the end-to-end decision latency
+
+Usage:
+    hedger = HedgedLLM(["moonshotai/kimi-k2-instruct-0905", "openai/gpt-oss-120b"],
+                       validate=parse_llm_decision, hedge_delay=1.5)
+    decision, response, model = hedger.request(messages=[...], temperature=0.2)
+    hedger.report()
+
+Dependencies: groq, httpx (through llm_client)
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+from llm_client import get_llm_client
+from decision_protocol import json_mode_kwargs, json_mode_rejected
+
+DEFAULT_HEDGE_DELAY = 1.5   # seconds before the next model is asked as well
+LATENCY_WINDOW = 1000       # latency samples kept per model
+HEDGED_KEY = 'hedged'       # stats entry for the end-to-end decision latency
+
+
+class LLMHedgeError(Exception):
+    """No model returned a valid answer."""
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (None when empty)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counters = {}
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, model, name):
+        with self._lock:
+            counters = self._counters.setdefault(model, {'wins': 0, 'invalid': 0, 'failures': 0, 'cancelled': 0})
+            counters[name] += 1
+
+    def summary(self):
+        with self._lock:
+            models = set(self._samples) | set(self._counters)
+            result = {}
+            for model in sorted(models):
+                samples = list(self._samples.get(model, ()))
+                entry = {'n': len(samples)}
+                for pct in (50, 95, 99):
+                    value = percentile(samples, pct)
+                    entry[f'p{pct}'] = round(value, 3) if value is not None else None
+                entry.update(self._counters.get(model, {}))
+                result[model] = entry
+            return result
+
+
+class HedgedLLM:
+    def __init__(self, models, validate, hedge_delay=DEFAULT_HEDGE_DELAY, latency=None, json_mode=False):
+        """
+        models: model names in priority order.
+        validate: function(response_text) -> parsed answer, or None if the answer is unusable.
+        json_mode: request response_format JSON from the models that accept it.
+        """
+        if not models:
+            raise ValueError("HedgedLLM needs at least one model")
+        self.models = list(models)
+        self.validate = validate
+        self.hedge_delay = hedge_delay
+        self.latency = latency or LatencyTracker()
+        self.json_mode = json_mode
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ background loop
+    def _get_loop(self):
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-hedge-loop", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def request(self, messages, validate=None, **kwargs):
+        """
+        Blocking hedged request; returns (answer, response, model) or raises LLMHedgeError.
+        `validate` overrides the instance validator for this request (e.g. with per-bar limits).
+        """
+        coroutine = self.arequest(messages, validate=validate, **kwargs)
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    # ------------------------------------------------------------------ hedging
+    async def _attempt(self, model, messages, validate, kwargs):
+        started = time.perf_counter()
+        if self.json_mode:
+            kwargs = dict(kwargs, **json_mode_kwargs(model))
+        try:
+            try:
+                response = await get_llm_client().achat(model=model, messages=messages, **kwargs)
+            except Exception as e:
+                if not (self.json_mode and json_mode_rejected(model, e, kwargs)):
+                    raise
+                plain = {k: v for k, v in kwargs.items() if k != 'response_format'}
+                response = await get_llm_client().achat(model=model, messages=messages, **plain)
+        except asyncio.CancelledError:
+            self.latency.count(model, 'cancelled')
+            raise
+        except Exception:
+            self.latency.count(model, 'failures')
+            raise
+        self.latency.record(model, time.perf_counter() - started)
+        answer = validate((response.choices[0].message.content or '').strip())
+        if answer is None:
+            self.latency.count(model, 'invalid')
+        return model, response, answer
+
+    async def arequest(self, messages, validate=None, **kwargs):
+        validate = validate or self.validate
+        started = time.perf_counter()
+        waiting = list(self.models)
+        pending = set()
+        errors = []
+        next_launch = started
+        while waiting or pending:
+            if waiting and (not pending or time.perf_counter() >= next_launch):
+                pending.add(asyncio.ensure_future(self._attempt(waiting.pop(0), messages, validate, kwargs)))
+                next_launch = time.perf_counter() + self.hedge_delay
+                continue
+            timeout = max(0.0, next_launch - time.perf_counter()) if waiting else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    errors.append(f"{type(task.exception()).__name__}: {task.exception()}")
+                    continue
+                model, response, answer = task.result()
+                if answer is None:
+                    errors.append(f"{model}: invalid answer")
+                    continue
+                for other in pending:
+                    other.cancel()
+                self.latency.count(model, 'wins')
+                self.latency.record(HEDGED_KEY, time.perf_counter() - started)
+                return answer, response, model
+        raise LLMHedgeError(f"No valid answer from {self.models}: {'; '.join(errors)}")
+
+    def stats(self):
+        return self.latency.summary()
+
+    def report(self):
+        for model, entry in self.stats().items():
+            latencies = ' '.join(f"p{pct}={entry[f'p{pct}']}s" if entry[f'p{pct}'] is not None else f"p{pct}=-"
+                                 for pct in (50, 95, 99))
+            print(f"[INFO] LLM latency {model}: n={entry['n']} {latencies} wins={entry.get('wins', 0)} "
+                  f"invalid={entry.get('invalid', 0)} failures={entry.get('failures', 0)} "
+                  f"cancelled={entry.get('cancelled', 0)}")
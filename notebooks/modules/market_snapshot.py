@@ -0,0 +1,196 @@
+"""
+Market Snapshot for Bitcoin Trading Agent
+
+Purpose: One bar of market data (OHLCV + technical indicators) as a compact typed object that is
+passed straight from data collection / the backtesters to the strategy rules and the LLM context.
+
+Before, each bar was rendered into a markdown report and the numbers were recovered again with
+regular expressions (and in binance_trading_bot_07 via a temp file on disk). The snapshot keeps
+the floats as floats; markdown is only rendered on demand for humans (to_markdown()).
+
+- MarketSnapshot: __slots__ object with timestamp, open/high/low/close/volume and the
+  indicator_engine.INDICATOR_COLUMNS values (None when not available yet)
+- as_latest_data(): the dict shape the strategy rules expect (current_price + indicators)
+- as_context(): compact dict for the LLM context (timestamp, OHLCV, indicators)
+- save() / load_latest_snapshot(): JSON hand-off from data_collection_01 to the live strategy;
+  the file records when it was saved, and load_latest_snapshot(max_age_seconds=...) refuses a
+  snapshot older than that (e.g. one bar) so a stopped collector never feeds stale prices
+
+Dependencies: none (standard library); indicator_engine for the indicator names
+"""
+
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+from indicator_engine import INDICATOR_COLUMNS
+
+# Next to this module, so the collector and the strategy find it whatever their working directory
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "latest_market_snapshot.json")
+SNAPSHOT_MAX_AGE_SECONDS = 3600   # one hourly bar
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def _clean(value):
+    """float, or None for missing / NaN values."""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class MarketSnapshot:
+    __slots__ = ('timestamp',) + PRICE_FIELDS + tuple(INDICATOR_COLUMNS)
+
+    def __init__(self, timestamp, open, high, low, close, volume, indicators=None):
+        self.timestamp = timestamp
+        self.open = _clean(open)
+        self.high = _clean(high)
+        self.low = _clean(low)
+        self.close = _clean(close)
+        self.volume = _clean(volume)
+        indicators = indicators or {}
+        for name in INDICATOR_COLUMNS:
+            setattr(self, name, _clean(indicators.get(name)))
+
+    @classmethod
+    def from_row(cls, row, indicators=None, timestamp=None):
+        """Build from a backtest row (open/high/low/close/volume, 'date') and an indicator dict."""
+        return cls(timestamp if timestamp is not None else row['date'],
+                   row['open'], row['high'], row['low'], row['close'], row['volume'], indicators)
+
+    @property
+    def current_price(self):
+        return self.close
+
+    def indicators(self):
+        return {name: getattr(self, name) for name in INDICATOR_COLUMNS}
+
+    def as_latest_data(self):
+        """Strategy input: current_price plus every available indicator (missing values are left out)."""
+        latest_data = {'current_price': self.close} if self.close is not None else {}
+        for name in INDICATOR_COLUMNS:
+            value = getattr(self, name)
+            if value is not None:
+                latest_data[name] = value
+        return latest_data
+
+    def as_context(self):
+        """LLM context: bar time, OHLCV and every available indicator."""
+        context = {'timestamp': self._timestamp_text()}
+        for name in PRICE_FIELDS:
+            context[name] = getattr(self, name)
+        context.update(self.as_latest_data())
+        return context
+
+    def _timestamp_text(self):
+        if hasattr(self.timestamp, 'strftime'):
+            return self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        return str(self.timestamp)
+
+    def to_markdown(self, portfolio=None, profit_threshold=None):
+        """Human-readable report (same layout as the backtester's generate_md_report)."""
+        def value(name):
+            field = getattr(self, name)
+            return field if field is not None else 'N/A'
+
+        def number(name, spec):
+            field = getattr(self, name)
+            return format(field, spec) if field is not None else 'N/A'
+
+        def money(name):
+            field = getattr(self, name)
+            return f"${field:,.2f}" if field is not None else 'N/A'
+
+        lines = [
+            "",
+            "# Complete Bitcoin Data Collection Report",
+            "",
+            "## Yahoo Finance Data",
+            "",
+            "| Date | Open | High | Low | Close | Volume |",
+            "|------|------|------|-----|-------|--------|",
+            f"| {self._timestamp_text()} | {money('open')} | {money('high')} | {money('low')} | {money('close')} | "
+            f"{number('volume', ',.0f')} |",
+            "",
+            "### Technical Indicators (Current Values)",
+            "",
+            f"- **ATR (14)**: ${value('atr_14')}",
+            f"- **RSI (14)**: {value('rsi_14')}",
+            f"- **SMA 20**: ${value('sma_20')}",
+            f"- **SMA 50**: ${value('sma_50')}",
+            f"- **EMA 12**: ${value('ema_12')}",
+            f"- **EMA 26**: ${value('ema_26')}",
+            f"- **Bollinger Upper (20)**: ${value('bb_upper')}",
+            f"- **Bollinger Middle (20)**: ${value('bb_middle')}",
+            f"- **Bollinger Lower (20)**: ${value('bb_lower')}",
+            f"- **MACD**: {value('macd')}",
+            f"- **MACD Signal**: {value('macd_signal')}",
+            f"- **Volume SMA 20**: {value('volume_sma_20')}",
+            f"- **ATR Volatility Ratio**: {value('atr_volatility_ratio')}",
+        ]
+        if portfolio is not None:
+            lines += [
+                "",
+                "## Portfolio Status",
+                "",
+                f"- BTC: {portfolio['btc']}",
+                f"- USDT: {portfolio['usdt']}",
+            ]
+            if 'usd_profit' in portfolio:
+                lines.append(f"- USD PROFIT: {portfolio['usd_profit']}")
+            lines.append(f"- Portfolio Value: {portfolio['btc'] * self.close + portfolio['usdt']}")
+            if profit_threshold is not None:
+                lines.append(f"- PROFIT THRESHOLD: {profit_threshold}")
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        data = {'timestamp': self._timestamp_text()}
+        for name in self.__slots__[1:]:
+            data[name] = getattr(self, name)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        timestamp = data.get('timestamp')
+        try:
+            timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            pass
+        return cls(timestamp, data.get('open'), data.get('high'), data.get('low'), data.get('close'),
+                   data.get('volume'), data)
+
+    def save(self, path=SNAPSHOT_PATH):
+        """Write the snapshot as JSON (atomic rename, so readers never see a partial file)."""
+        tmp_path = path + '.tmp'
+        data = self.to_dict()
+        data['saved_at'] = time.time()
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def __repr__(self):
+        return f"MarketSnapshot({self._timestamp_text()}, close={self.close})"
+
+
+def load_latest_snapshot(path=SNAPSHOT_PATH, max_age_seconds=None):
+    """
+    Snapshot written by the last data collection run, or None if there is none or (with
+    max_age_seconds) it was saved longer ago than that.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        saved_at = data.get('saved_at') or os.path.getmtime(path)  # older files: file time
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Could not read market snapshot {path}: {e}")
+        return None
+    age = time.time() - float(saved_at)
+    if max_age_seconds is not None and age > max_age_seconds:
+        print(f"[WARNING] Market snapshot {path} is {age / 60:.0f} min old (limit {max_age_seconds / 60:.0f} min), ignoring it")
+        return None
+    return MarketSnapshot.from_dict(data)
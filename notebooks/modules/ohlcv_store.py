@@ -0,0 +1,287 @@
+"""
+OHLCV Store for Bitcoin Trading Agent
+
+Purpose: Memory-mapped columnar storage for long BTC histories (years of hourly or 1-minute bars),
+so backtests, sweep workers and the indicator engine can read millions of rows without loading
+them into pandas in every process.
+
+Layout (one directory per store):
+- header.json      symbol, interval, source, row count, column dtypes
+- timestamp.bin    int64, nanoseconds since epoch (UTC), strictly increasing
+- open.bin, high.bin, low.bin, close.bin, volume.bin    float64
+
+Each column is a raw little-endian array opened with np.memmap, so slicing returns views into the
+page cache (no copy, shared between processes). Appends write the new rows first and then update
+the row count in header.json atomically; bytes beyond the recorded row count (from an interrupted
+append) are ignored and truncated on the next append. upsert_tail() merges an overlapping batch
+(incremental sync) by rewriting only the tail from the first new timestamp.
+
+Usage:
+    store = build_store_from_merged(merged_df, 'data/btc_1h_store')      # from merge_and_export output
+    store = OhlcvStore.open('data/btc_1h_store')
+    bars = store.between('2025-06-01', '2025-07-01')                    # dict of zero-copy views
+    df = store.to_frame()
+    df = load_ohlcv_frame('data/btc_1h_store')                          # store dir or merged .xlsx/.csv
+
+Dependencies: numpy, pandas
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+OHLCV_COLUMNS = {
+    'timestamp': '<i8',
+    'open': '<f8',
+    'high': '<f8',
+    'low': '<f8',
+    'close': '<f8',
+    'volume': '<f8',
+}
+
+
+class OhlcvStore:
+    def __init__(self, path, header, mode='r'):
+        self.path = path
+        self.header = header
+        self.mode = mode
+        self._arrays = {}
+        self._map_columns()
+
+    # ------------------------------------------------------------------ creation / opening
+    @classmethod
+    def create(cls, path, symbol, interval, source, overwrite=False):
+        """Create an empty store directory."""
+        if os.path.exists(os.path.join(path, 'header.json')) and not overwrite:
+            raise FileExistsError(f"OHLCV store already exists: {path}")
+        os.makedirs(path, exist_ok=True)
+        header = {
+            'version': STORE_VERSION,
+            'symbol': symbol,
+            'interval': interval,
+            'source': source,
+            'rows': 0,
+            'columns': dict(OHLCV_COLUMNS),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'updated': None,
+        }
+        for name in header['columns']:
+            open(os.path.join(path, f"{name}.bin"), 'wb').close()
+        cls._write_header(path, header)
+        return cls(path, header, mode='r+')
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """Open an existing store; mode 'r' for read-only views, 'r+' to allow appends."""
+        with open(os.path.join(path, 'header.json'), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported OHLCV store version {header.get('version')} in {path}")
+        return cls(path, header, mode=mode)
+
+    @staticmethod
+    def _write_header(path, header):
+        tmp_path = os.path.join(path, 'header.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(header, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(path, 'header.json'))
+
+    def _map_columns(self):
+        rows = self.header['rows']
+        self._arrays = {}
+        for name, dtype in self.header['columns'].items():
+            if rows == 0:
+                self._arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                self._arrays[name] = np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode='r', shape=(rows,))
+
+    # ------------------------------------------------------------------ reading
+    def __len__(self):
+        return self.header['rows']
+
+    @property
+    def symbol(self):
+        return self.header['symbol']
+
+    @property
+    def interval(self):
+        return self.header['interval']
+
+    @property
+    def source(self):
+        return self.header['source']
+
+    @property
+    def columns(self):
+        return list(self.header['columns'])
+
+    def column(self, name):
+        """Read-only memory-mapped array for one column."""
+        return self._arrays[name]
+
+    def __getitem__(self, name):
+        return self._arrays[name]
+
+    def last_timestamp(self):
+        """Timestamp (ns) of the last stored bar, or None for an empty store."""
+        return int(self._arrays['timestamp'][-1]) if len(self) else None
+
+    def slice(self, start=None, stop=None):
+        """Rows [start, stop) as a dict of zero-copy views."""
+        return {name: array[start:stop] for name, array in self._arrays.items()}
+
+    def locate(self, start_time=None, end_time=None):
+        """Row range [start, stop) covering start_time <= timestamp < end_time (binary search)."""
+        timestamps = self._arrays['timestamp']
+        start = 0 if start_time is None else int(np.searchsorted(timestamps, _to_ns(start_time), side='left'))
+        stop = len(self) if end_time is None else int(np.searchsorted(timestamps, _to_ns(end_time), side='left'))
+        return start, stop
+
+    def between(self, start_time=None, end_time=None):
+        """Rows with start_time <= timestamp < end_time (anything pd.Timestamp accepts) as zero-copy views."""
+        return self.slice(*self.locate(start_time, end_time))
+
+    def to_frame(self, start=None, stop=None):
+        """DataFrame with a 'date' column plus the price columns (pandas wraps the mapped arrays)."""
+        bars = self.slice(start, stop)
+        data = {'date': pd.to_datetime(np.asarray(bars['timestamp']), unit='ns')}
+        for name in self.columns:
+            if name != 'timestamp':
+                data[name] = bars[name]
+        return pd.DataFrame(data, copy=False)
+
+    # ------------------------------------------------------------------ writing
+    def append(self, bars):
+        """
+        Append rows given as a dict of equal-length arrays (must include every store column).
+        Timestamps must be strictly increasing and newer than the last stored bar.
+        Returns the number of rows written.
+        """
+        if self.mode != 'r+':
+            raise PermissionError("OHLCV store opened read-only; use OhlcvStore.open(path, mode='r+')")
+        timestamps = np.asarray(bars['timestamp'], dtype='<i8')
+        count = len(timestamps)
+        if count == 0:
+            return 0
+        if np.any(np.diff(timestamps) <= 0):
+            raise ValueError("Appended timestamps must be strictly increasing")
+        last = self.last_timestamp()
+        if last is not None and timestamps[0] <= last:
+            raise ValueError("Appended bars overlap the stored history")
+
+        rows = self.header['rows']
+        for name, dtype in self.header['columns'].items():
+            values = np.ascontiguousarray(np.asarray(bars[name], dtype=dtype))
+            if len(values) != count:
+                raise ValueError(f"Column '{name}' has {len(values)} rows, expected {count}")
+            file_path = os.path.join(self.path, f"{name}.bin")
+            with open(file_path, 'r+b') as f:
+                # Drop bytes left over from an interrupted append before writing
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        self.header['rows'] = rows + count
+        self.header['updated'] = datetime.now().isoformat(timespec='seconds')
+        self._write_header(self.path, self.header)
+        self._map_columns()
+        return count
+
+    def upsert_tail(self, bars):
+        """
+        Merge freshly fetched bars into the end of the store: duplicate timestamps in the batch are
+        dropped (last wins), stored bars from the batch's first timestamp onwards are replaced (e.g. a
+        candle that was still open at the previous sync) and the rest is appended.
+        Returns (replaced, added): stored rows overwritten and rows added beyond the old end.
+        """
+        batch = pd.DataFrame({name: np.asarray(bars[name]) for name in self.header['columns']})
+        batch = batch.drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+        if batch.empty:
+            return 0, 0
+        rows = self.header['rows']
+        start = int(np.searchsorted(self._arrays['timestamp'], batch['timestamp'].iloc[0], side='left'))
+        if start < rows:
+            # Shrink the logical length first; a crash here only loses bars the next sync refetches
+            self.header['rows'] = start
+            self._write_header(self.path, self.header)
+            self._map_columns()
+        self.append({name: batch[name].to_numpy() for name in batch.columns})
+        return rows - start, len(batch) - (rows - start)
+
+
+def _to_ns(value):
+    """Timestamp-like value -> int64 nanoseconds (naive timestamps are taken as UTC)."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return int(ts.value)
+
+
+def frame_to_bars(df):
+    """DataFrame with 'date' + open/high/low/close/volume columns -> dict of arrays for append()."""
+    dates = pd.to_datetime(df['date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    bars = {'timestamp': dates.astype('datetime64[ns]').to_numpy().astype('<i8')}
+    for name in ['open', 'high', 'low', 'close', 'volume']:
+        bars[name] = df[name].to_numpy(dtype='<f8')
+    return bars
+
+
+def is_store(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'header.json'))
+
+
+def load_ohlcv_frame(path, start_time=None, end_time=None):
+    """
+    Backtest frame ('date' + open/high/low/close/volume) from either an OHLCV store directory
+    (memory-mapped, optionally restricted to [start_time, end_time)) or a merged Excel/CSV file
+    loaded through dataset_cache.
+    """
+    if is_store(path):
+        store = OhlcvStore.open(path)
+        start, stop = store.locate(start_time, end_time)
+        print(f"[INFO] Using OHLCV store {path} ({store.symbol} {store.interval}, {stop - start} of {len(store)} bars)")
+        return store.to_frame(start, stop)
+
+    from dataset_cache import add_unified_ohlcv, load_hourly_dataset
+    df = add_unified_ohlcv(load_hourly_dataset(path).reset_index())
+    if start_time is not None:
+        df = df[df['date'] >= pd.Timestamp(start_time)]
+    if end_time is not None:
+        df = df[df['date'] < pd.Timestamp(end_time)]
+    return df.reset_index(drop=True)
+
+
+def build_store_from_merged(merged_df, path, symbol='BTC/USDT', interval='1h', source='binance+yahoo'):
+    """
+    Build a store from the merged Yahoo/Binance frame written by merge_and_export
+    (yahoo_* / binance_* columns; Binance values are used, Yahoo fills the gaps).
+    Rows without a close price in either source are skipped.
+    """
+    from dataset_cache import add_unified_ohlcv, normalize_dataset
+
+    df = add_unified_ohlcv(normalize_dataset(merged_df).reset_index())
+    df = df.dropna(subset=['close'])
+    store = OhlcvStore.create(path, symbol, interval, source, overwrite=True)
+    store.append(frame_to_bars(df))
+    print(f"[OK] OHLCV store built: {path} ({len(store)} bars, {symbol} {interval}, source={source})")
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+    from dataset_cache import load_hourly_dataset
+
+    source_path = sys.argv[1] if len(sys.argv) > 1 else 'btc_hourly_yahoo_binance_6mo.xlsx'
+    store_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join('..', 'data', 'btc_1h_store')
+    store = build_store_from_merged(load_hourly_dataset(source_path), store_path)
+    print(store.to_frame().tail())
@@ -0,0 +1,272 @@
+"""
+Parameter Sweep Runner for Bitcoin Trading Agent
+
+Purpose: Evaluates the rule-based strategy from strategy_manager_05 (DCA, ATR stop-loss,
+drawdown safeguard) over a grid of config.cfg knobs, using every CPU core.
+
+- Indicators are computed once in the parent (indicator_engine.compute_indicator_table)
+- The price / indicator arrays are placed in one shared-memory block; workers attach to it
+  read-only, so each task only pickles its small config dict instead of a DataFrame
+- Each grid point runs in a process pool and produces one row of summary metrics
+- Results are appended to a CSV as runs complete (trade_log_writer.TradeLogWriter)
+
+Notes:
+- No LLM is involved: evaluate_rules() is called without an llm_suggestion.
+- DCA buys are tracked as active trades so the ATR stop-loss rule applies to them.
+- rsi_oversold / rsi_overbought are passed through to the config, but the current rules in
+  strategy_manager_05 do not read them yet, so sweeping them has no effect on results.
+- A rule-based buy is budget * position_size_pct / 100, capped at max_trade_usd (default $10).
+  The cap is swept as well, and grid points with the same effective buy size (and otherwise the
+  same knobs) are run once: the duplicates are listed as skipped instead of reported as new rows.
+  The effective size is written to the trade_amount_usd column.
+
+Usage:
+    python parameter_sweep.py --grid grid.json --output sweep_results.csv --workers 8
+    (grid.json: {"dca_percentage": [2, 3, 4], "atr_multiplier": [1.0, 1.5, 2.0], ...})
+
+Dependencies: pandas, numpy, ta, pyarrow
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from indicator_engine import MIN_WINDOW, compute_indicator_table
+from ohlcv_store import load_ohlcv_frame
+from strategy_manager_05 import MAX_TRADE_USD, evaluate_rules, load_config
+from trade_log_writer import TradeLogWriter
+
+BINANCE_FEE_RATE = 0.001  # 0.1% per trade
+
+# Columns shared with the workers (order defines the column index in the shared array)
+SHARED_COLUMNS = ['close', 'atr_14', 'rsi_14', 'sma_20', 'sma_50', 'macd', 'macd_signal']
+
+DEFAULT_GRID = {
+    'dca_percentage': [1, 2, 3, 4, 5],
+    'atr_multiplier': [1.0, 1.5, 2.0, 2.5],
+    'position_size_pct': [2, 5, 10, 20],
+    'max_trade_usd': [10, 50, 250],
+    'max_drawdown': [15, 25, 35],
+}
+
+METRIC_COLUMNS = [
+    'trade_amount_usd', 'final_value', 'total_return_pct', 'max_drawdown_pct', 'num_buys', 'num_sells',
+    'stop_losses', 'fees_usd', 'safeguard_bars', 'final_btc', 'final_usdt',
+]
+
+# Set in each worker by _init_worker()
+_shared_block = None
+_shared_arrays = None
+
+
+def load_backtest_frame(data_file='btc_hourly_yahoo_binance_6mo.xlsx'):
+    """
+    Load the merged Yahoo/Binance hourly file (via the dataset cache) with unified OHLCV columns,
+    or an ohlcv_store directory (memory-mapped, e.g. multi-year 1-minute history).
+    """
+    return load_ohlcv_frame(data_file)
+
+
+def build_shared_arrays(df):
+    """
+    Compute indicators and copy the columns the rules need into a shared-memory block.
+    Returns (SharedMemory, shape); the caller must close() and unlink() it.
+    """
+    table = compute_indicator_table(df)
+    data = np.column_stack([
+        df['close'].to_numpy(dtype=np.float64) if col == 'close' else table[col].to_numpy(dtype=np.float64)
+        for col in SHARED_COLUMNS
+    ])
+    block = shared_memory.SharedMemory(create=True, size=data.nbytes)
+    view = np.ndarray(data.shape, dtype=np.float64, buffer=block.buf)
+    view[:] = data
+    return block, data.shape
+
+
+def _init_worker(block_name, shape, quiet):
+    """Attach to the shared block once per worker process (read-only view, no copy)."""
+    global _shared_block, _shared_arrays
+    _shared_block = shared_memory.SharedMemory(name=block_name)
+    arrays = np.ndarray(shape, dtype=np.float64, buffer=_shared_block.buf)
+    arrays.flags.writeable = False
+    _shared_arrays = {col: arrays[:, i] for i, col in enumerate(SHARED_COLUMNS)}
+    if quiet:
+        # The rule helpers print every trigger; keep worker output quiet
+        sys.stdout = open(os.devnull, 'w')
+
+
+def simulate_rules(arrays, config):
+    """
+    Run the rule-based strategy over the arrays with one config and return summary metrics.
+    Mirrors the backtest loop in binance_trading_bot_07: BUY if enough USDT, SELL if enough BTC.
+    """
+    close = arrays['close']
+    budget = float(config.get('budget', 10000))
+    portfolio = {'btc': 0.0, 'usdt': budget}
+    active_trades = []
+    num_buys = num_sells = stop_losses = safeguard_bars = 0
+    fees = 0.0
+    peak_value = budget
+    max_drawdown_pct = 0.0
+    portfolio_value = budget
+
+    for t in range(MIN_WINDOW - 1, len(close)):
+        current_price = close[t]
+        if np.isnan(current_price):
+            continue
+        latest_data = {
+            'current_price': current_price,
+            'atr_14': arrays['atr_14'][t],
+            'rsi_14': arrays['rsi_14'][t],
+            'sma_20': arrays['sma_20'][t],
+            'sma_50': arrays['sma_50'][t],
+            'macd': arrays['macd'][t],
+            'macd_signal': arrays['macd_signal'][t],
+        }
+        decisions, active_trades = evaluate_rules(portfolio, active_trades, latest_data, config)
+        if not decisions and portfolio['btc'] * current_price + portfolio['usdt'] < budget * (1 - config.get('max_drawdown', 25) / 100):
+            safeguard_bars += 1
+
+        for decision in decisions:
+            if decision['action'] == 'BUY' and portfolio['usdt'] >= decision['amount']:
+                fee = decision['amount'] * BINANCE_FEE_RATE
+                btc_bought = (decision['amount'] - fee) / current_price
+                portfolio['usdt'] -= decision['amount']
+                portfolio['btc'] += btc_bought
+                fees += fee
+                num_buys += 1
+                if decision.get('trade_type') == 'DCA':
+                    active_trades.append({'entry_price': current_price, 'quantity': btc_bought, 'atr': latest_data['atr_14']})
+            elif decision['action'] == 'SELL' and portfolio['btc'] >= decision['quantity']:
+                proceeds = decision['quantity'] * current_price
+                fee = proceeds * BINANCE_FEE_RATE
+                portfolio['btc'] -= decision['quantity']
+                portfolio['usdt'] += proceeds - fee
+                fees += fee
+                num_sells += 1
+                if decision.get('trade_type') == 'STOP_LOSS':
+                    stop_losses += 1
+                active_trades = [trade for trade in active_trades if trade['quantity'] != decision['quantity']]
+
+        portfolio_value = portfolio['btc'] * current_price + portfolio['usdt']
+        peak_value = max(peak_value, portfolio_value)
+        max_drawdown_pct = max(max_drawdown_pct, (peak_value - portfolio_value) / peak_value * 100)
+
+    return {
+        'trade_amount_usd': trade_amount(config),
+        'final_value': portfolio_value,
+        'total_return_pct': (portfolio_value - budget) / budget * 100,
+        'max_drawdown_pct': max_drawdown_pct,
+        'num_buys': num_buys,
+        'num_sells': num_sells,
+        'stop_losses': stop_losses,
+        'fees_usd': fees,
+        'safeguard_bars': safeguard_bars,
+        'final_btc': portfolio['btc'],
+        'final_usdt': portfolio['usdt'],
+    }
+
+
+def _run_point(config):
+    """Worker entry point: only the config dict crosses the process boundary."""
+    return config, simulate_rules(_shared_arrays, config)
+
+
+def expand_grid(grid, base_config):
+    """Cartesian product of the grid values, each merged over the base config."""
+    keys = list(grid.keys())
+    for values in itertools.product(*(grid[key] for key in keys)):
+        config = dict(base_config)
+        config.update(dict(zip(keys, values)))
+        yield config
+
+
+def trade_amount(config):
+    """Effective rule-based buy size: budget * position_size_pct / 100, capped at max_trade_usd."""
+    amount = float(config.get('budget', 10000)) * config.get('position_size_pct', 2.0) / 100
+    return min(amount, config.get('max_trade_usd', MAX_TRADE_USD))
+
+
+def unique_configs(configs, grid):
+    """
+    Drop grid points that behave like an earlier one: position_size_pct and max_trade_usd only
+    matter through the capped buy size. budget stays in the key (it is also the starting capital
+    and the drawdown safeguard base). Returns (configs to run, number skipped).
+    """
+    sizing_keys = ('position_size_pct', 'max_trade_usd')
+    seen = set()
+    unique = []
+    for config in configs:
+        key = tuple((name, config[name]) for name in grid if name not in sizing_keys)
+        key += (('trade_amount_usd', round(trade_amount(config), 8)),)
+        if key not in seen:
+            seen.add(key)
+            unique.append(config)
+    if 'budget' in grid:
+        missing = set(grid['budget']) - {config['budget'] for config in unique}
+        if missing:
+            raise ValueError(f"Deduplication dropped every grid point for budget {sorted(missing)}")
+    return unique, len(configs) - len(unique)
+
+
+def run_sweep(df, grid, output_path='sweep_results.csv', base_config=None, workers=None, quiet=True):
+    """
+    Evaluate every grid point in a process pool and write one metrics row per point.
+    Returns the results as a DataFrame.
+    """
+    base_config = dict(base_config if base_config is not None else load_config())
+    configs, skipped = unique_configs(list(expand_grid(grid, base_config)), grid)
+    if skipped:
+        print(f"[INFO] Skipped {skipped} grid points with the same capped buy size as an earlier point")
+    workers = workers or os.cpu_count() or 1
+    print(f"[INFO] Sweeping {len(configs)} parameter combinations over {len(df)} bars with {workers} workers")
+
+    block, shape = build_shared_arrays(df)
+    columns = list(grid.keys()) + METRIC_COLUMNS
+    rows = []
+    started = time.perf_counter()
+    try:
+        with TradeLogWriter(output_path, columns=columns, flush_rows=100) as writer, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                    initargs=(block.name, shape, quiet)) as pool:
+            futures = [pool.submit(_run_point, config) for config in configs]
+            for done, future in enumerate(as_completed(futures), 1):
+                config, metrics = future.result()
+                row = {key: config[key] for key in grid}
+                row.update(metrics)
+                writer.append(row)
+                rows.append(row)
+                if done % 100 == 0 or done == len(futures):
+                    print(f"[INFO] {done}/{len(futures)} runs done ({time.perf_counter() - started:.1f}s)")
+    finally:
+        block.close()
+        block.unlink()
+
+    results = pd.DataFrame(rows, columns=columns).sort_values('total_return_pct', ascending=False)
+    print(f"[OK] Sweep finished in {time.perf_counter() - started:.1f}s, results saved to {output_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter sweep over config.cfg knobs (rule-based strategy)")
+    parser.add_argument('--data', default='btc_hourly_yahoo_binance_6mo.xlsx', help="Merged hourly data file (.xlsx / .csv) or OHLCV store directory")
+    parser.add_argument('--grid', help="JSON file mapping config keys to lists of values")
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, 'r') as f:
+            grid = json.load(f)
+    df = load_backtest_frame(args.data)
+    results = run_sweep(df, grid, output_path=args.output, workers=args.workers)
+    print(results.head(10).to_string(index=False))
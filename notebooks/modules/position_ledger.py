@@ -0,0 +1,184 @@
+"""
+Position Ledger for Bitcoin Trading Agent
+
+Purpose: Running BTC position and P&L kept in memory, so a sell no longer re-reads and filters the
+whole trade log to price itself. Every trade costs O(1) (FIFO: amortized over the lots it closes).
+
+- Cost methods: 'fifo' (lots closed oldest first) or 'average' (one pooled lot at average cost)
+- Buys add a lot at their cost incl. fees; sells realize proceeds (after fees) minus the cost of
+  the quantity they close
+- Running totals: position, cost basis, realized P&L, fees, buy / sell counts;
+  unrealized_pnl(price) for the open position
+- Persistence: every trade is appended as one JSON line to the journal (incremental, nothing is
+  rewritten); at startup the journal is replayed, or, if there is none yet, the ledger is rebuilt
+  once from '../data/trade_log.csv' and the journal is seeded from it. The rebuild uses the net
+  amounts and fee the executor logs (net_quantity / net_amount_usd / fee_usd), the same values live
+  trading records; rows logged before those columns existed fall back to the gross amounts, fee 0
+- Quantity sold beyond the known lots (BTC held before the bot started) has no cost basis and is
+  counted as unmatched_qty with zero P&L
+
+Usage:
+    ledger = PositionLedger.load()                      # replay journal / rebuild from trade log
+    ledger.record_buy(0.002, 100.0, fee_usd=0.1)        # quantity received, USDT spent
+    pnl = ledger.record_sell(0.001, 60.0, fee_usd=0.06) # quantity sold, USDT received -> realized P&L
+    ledger.summary(current_price)
+
+Dependencies: pandas (only to rebuild from the trade log)
+"""
+
+import json
+import os
+from collections import deque
+
+import pandas as pd
+
+COST_METHOD = 'fifo'                              # 'fifo' or 'average'
+JOURNAL_PATH = '../data/position_ledger.jsonl'
+TRADE_LOG_PATH = '../data/trade_log.csv'
+QTY_EPSILON = 1e-12                               # lots smaller than this are closed
+
+
+class PositionLedger:
+    def __init__(self, method=COST_METHOD, journal_path=JOURNAL_PATH):
+        if method not in ('fifo', 'average'):
+            raise ValueError(f"Unknown cost method {method!r}, use 'fifo' or 'average'")
+        self.method = method
+        self.journal_path = journal_path
+        self.lots = deque()            # [quantity, unit_cost] oldest first ('average': at most one lot)
+        self.position = 0.0            # BTC held in lots
+        self.cost_basis = 0.0          # USDT cost of the open lots
+        self.realized_pnl = 0.0
+        self.fees_usd = 0.0
+        self.unmatched_qty = 0.0
+        self.buys = 0
+        self.sells = 0
+
+    # ------------------------------------------------------------------ trades
+    def record_buy(self, quantity, cost_usd, fee_usd=0.0, timestamp=None, persist=True):
+        """Add a lot: quantity of BTC received for cost_usd USDT (fee_usd already included)."""
+        if quantity <= 0:
+            return
+        if self.method == 'average' and self.lots:
+            lot = self.lots[0]
+            total_cost = lot[0] * lot[1] + cost_usd
+            lot[0] += quantity
+            lot[1] = total_cost / lot[0]
+        else:
+            self.lots.append([quantity, cost_usd / quantity])
+        self.position += quantity
+        self.cost_basis += cost_usd
+        self.fees_usd += fee_usd
+        self.buys += 1
+        if persist:
+            self._journal('BUY', quantity, cost_usd, fee_usd, timestamp)
+
+    def record_sell(self, quantity, proceeds_usd, fee_usd=0.0, timestamp=None, persist=True):
+        """Close quantity BTC for proceeds_usd USDT (after fees); returns the realized P&L of this sale."""
+        if quantity <= 0:
+            return 0.0
+        remaining = quantity
+        cost = 0.0
+        while remaining > QTY_EPSILON and self.lots:
+            lot = self.lots[0]
+            used = min(lot[0], remaining)
+            cost += used * lot[1]
+            lot[0] -= used
+            remaining -= used
+            if lot[0] <= QTY_EPSILON:
+                self.lots.popleft()
+        matched = quantity - max(remaining, 0.0)
+        if remaining > QTY_EPSILON:
+            self.unmatched_qty += remaining
+            print(f"[WARNING] Sold {remaining:.8f} BTC beyond the ledger position, no cost basis for it")
+        matched_proceeds = proceeds_usd * matched / quantity
+        pnl = matched_proceeds - cost
+        self.position = max(self.position - matched, 0.0)
+        self.cost_basis = max(self.cost_basis - cost, 0.0) if self.lots else 0.0
+        self.realized_pnl += pnl
+        self.fees_usd += fee_usd
+        self.sells += 1
+        if persist:
+            self._journal('SELL', quantity, proceeds_usd, fee_usd, timestamp)
+        return pnl
+
+    # ------------------------------------------------------------------ figures
+    @property
+    def average_cost(self):
+        return self.cost_basis / self.position if self.position > QTY_EPSILON else 0.0
+
+    def unrealized_pnl(self, price):
+        return self.position * price - self.cost_basis
+
+    def summary(self, price=None):
+        result = {
+            'method': self.method, 'position_btc': self.position, 'cost_basis_usd': round(self.cost_basis, 2),
+            'average_cost': round(self.average_cost, 2), 'open_lots': len(self.lots),
+            'realized_pnl_usd': round(self.realized_pnl, 2), 'fees_usd': round(self.fees_usd, 2),
+            'buys': self.buys, 'sells': self.sells, 'unmatched_qty': self.unmatched_qty,
+        }
+        if price is not None:
+            result['unrealized_pnl_usd'] = round(self.unrealized_pnl(price), 2)
+        return result
+
+    # ------------------------------------------------------------------ persistence
+    def _journal(self, side, quantity, amount_usd, fee_usd, timestamp):
+        if not self.journal_path:
+            return
+        dir_name = os.path.dirname(self.journal_path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        entry = {'side': side, 'quantity': quantity, 'amount_usd': amount_usd, 'fee_usd': fee_usd,
+                 'timestamp': str(timestamp) if timestamp is not None else None}
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def _apply(self, side, quantity, amount_usd, fee_usd=0.0, timestamp=None, persist=False):
+        if side == 'BUY':
+            self.record_buy(quantity, amount_usd, fee_usd, timestamp, persist=persist)
+        elif side == 'SELL':
+            self.record_sell(quantity, amount_usd, fee_usd, timestamp, persist=persist)
+
+    @classmethod
+    def load(cls, method=COST_METHOD, journal_path=JOURNAL_PATH, trade_log_path=TRADE_LOG_PATH):
+        """Startup: replay the journal, or rebuild from the trade log and seed the journal from it."""
+        ledger = cls(method, journal_path)
+        if journal_path and os.path.exists(journal_path):
+            with open(journal_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        ledger._apply(entry['side'], entry['quantity'], entry['amount_usd'],
+                                      entry.get('fee_usd', 0.0), entry.get('timestamp'))
+            print(f"[INFO] Position ledger replayed: {ledger.buys} buys, {ledger.sells} sells, "
+                  f"{ledger.position:.8f} BTC, realized P&L ${ledger.realized_pnl:,.2f}")
+            return ledger
+        if trade_log_path and os.path.exists(trade_log_path):
+            ledger.rebuild_from_trade_log(trade_log_path)
+        return ledger
+
+    def rebuild_from_trade_log(self, trade_log_path=TRADE_LOG_PATH):
+        """One-off rebuild from the CSV trade log (type / net amounts / fee); journals every trade."""
+        try:
+            df = pd.read_csv(trade_log_path)
+        except Exception as e:
+            print(f"[WARNING] Could not rebuild position ledger from {trade_log_path}: {e}")
+            return
+        gross_rows = 0
+        for row in df.itertuples(index=False):
+            side = str(getattr(row, 'type', '')).upper()
+            quantity = pd.to_numeric(getattr(row, 'net_quantity', None), errors='coerce')
+            amount_usd = pd.to_numeric(getattr(row, 'net_amount_usd', None), errors='coerce')
+            fee_usd = pd.to_numeric(getattr(row, 'fee_usd', None), errors='coerce')
+            if pd.isna(quantity) or pd.isna(amount_usd):
+                # Logged before net amounts were recorded: gross amounts, commission unknown
+                quantity = pd.to_numeric(getattr(row, 'quantity', None), errors='coerce')
+                amount_usd = pd.to_numeric(getattr(row, 'amount_usd', None), errors='coerce')
+                fee_usd = float('nan')
+                gross_rows += side in ('BUY', 'SELL')
+            if side in ('BUY', 'SELL') and pd.notna(quantity) and pd.notna(amount_usd):
+                self._apply(side, float(quantity), float(amount_usd), float(fee_usd) if pd.notna(fee_usd) else 0.0,
+                            getattr(row, 'timestamp', None), persist=True)
+        if gross_rows:
+            print(f"[WARNING] {gross_rows} trade log rows have no net amounts / fee, rebuilt from gross amounts")
+        print(f"[OK] Position ledger rebuilt from trade log: {self.buys} buys, {self.sells} sells, "
+              f"{self.position:.8f} BTC, realized P&L ${self.realized_pnl:,.2f}")
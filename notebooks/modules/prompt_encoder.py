@@ -0,0 +1,189 @@
+"""
+Prompt Encoder for Bitcoin Trading Agent
+
+Purpose: Serializes the LLM decision context (market data, portfolio, strategy signals, recent
+trades) into a dense, line-oriented text block instead of json.dumps(context, indent=2).
+
+- One "key=value" line per section, numbers rounded to the precision that matters
+- Trade history as a pipe-separated table with short column names (oldest first)
+- Only the config knobs the model can act on are included
+- A token budget is enforced with a local estimate (tiktoken if installed, else ~4 chars/token):
+  oldest trades are dropped first, then active trades, then secondary indicators
+
+Inputs:
+- Context dicts from trading_bot_sim_test (market_data / portfolio / profit_threshold / trade_history)
+  or llm_decision_strategy_05.build_llm_context (adds active_trades, signals, config)
+
+Outputs:
+- (text, tokens, dropped) from encode_context()
+
+Dependencies: none (tiktoken optional)
+"""
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed or no local encoding files
+    _encoding = None
+
+DEFAULT_TOKEN_BUDGET = 700
+CHARS_PER_TOKEN = 4
+
+# (short name, context key, decimals)
+MARKET_FIELDS = [
+    ('t', 'timestamp', None),
+    ('o', 'open', 2), ('h', 'high', 2), ('l', 'low', 2), ('c', 'close', 2), ('v', 'volume', 0),
+    ('px', 'current_price', 2),
+    ('atr', 'atr_14', 2), ('rsi', 'rsi_14', 1),
+    ('sma20', 'sma_20', 2), ('sma50', 'sma_50', 2),
+    ('macd', 'macd', 2), ('macds', 'macd_signal', 2),
+    ('ema12', 'ema_12', 2), ('ema26', 'ema_26', 2),
+    ('bbu', 'bb_upper', 2), ('bbm', 'bb_middle', 2), ('bbl', 'bb_lower', 2),
+    ('volsma20', 'volume_sma_20', 0), ('atr_ratio', 'atr_volatility_ratio', 4),
+]
+# Dropped last, when the budget is still exceeded without trades
+SECONDARY_MARKET_FIELDS = {'o', 'h', 'l', 'v', 'ema12', 'ema26', 'bbm', 'volsma20'}
+
+PORTFOLIO_FIELDS = [('btc', 'btc', 6), ('usdt', 'usdt', 2), ('usd_profit', 'usd_profit', 2)]
+
+# Config knobs the model can act on
+CONFIG_FIELDS = [
+    ('budget', 'budget', 2), ('dca_pct', 'dca_percentage', 2), ('atr_mult', 'atr_multiplier', 2),
+    ('position_pct', 'position_size_pct', 2), ('max_drawdown_pct', 'max_drawdown', 2),
+]
+
+# (short name, candidate keys in backtest / live trade records, decimals)
+TRADE_FIELDS = [
+    ('t', ('Timestamp', 'timestamp'), None),
+    ('type', ('Type', 'type', 'action'), None),
+    ('px', ('Close', 'price'), 2),
+    ('qty', ('Quantity', 'quantity'), 6),
+    ('usd', ('Value USD (Cost)', 'amount_usd', 'amount'), 2),
+    ('btc', ('BTC BALANCE', 'btc_balance', 'btc'), 6),
+    ('usdt', ('USD BALANCE', 'usdt'), 2),
+    ('value', ('Total Portfolio Value', 'portfolio_value'), 2),
+]
+
+LEGEND = ("Legend: MARKET t=bar time o/h/l/c/v=OHLCV px=current price atr=ATR14 rsi=RSI14 "
+          "sma/ema=moving averages macd/macds=MACD/signal bbu/bbm/bbl=Bollinger bands; "
+          "TRADES oldest first.")
+
+
+def count_tokens(text):
+    """Local token estimate: tiktoken cl100k_base when available, else ~4 characters per token."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _fmt(value, decimals):
+    if value is None or value == '':
+        return None
+    if decimals is None or isinstance(value, str):
+        text = str(value)
+        # '2025-01-01 05:00:00' -> '2025-01-01 05:00'
+        return text[:-3] if len(text) == 19 and text[-3] == ':' else text
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if value != value:  # NaN
+        return None
+    return f"{value:.{decimals}f}"
+
+
+def _pairs(source, fields, skip=()):
+    parts = []
+    for short, key, decimals in fields:
+        if short in skip:
+            continue
+        text = _fmt(source.get(key), decimals)
+        if text is not None:
+            parts.append(f"{short}={text}")
+    return ' '.join(parts)
+
+
+def _trade_value(trade, keys):
+    for key in keys:
+        if key in trade:
+            return trade[key]
+    return None
+
+
+def _trade_table(trades):
+    lines = ['|'.join(short for short, _, _ in TRADE_FIELDS)]
+    for trade in trades:
+        cells = [_fmt(_trade_value(trade, keys), decimals) or '' for _, keys, decimals in TRADE_FIELDS]
+        lines.append('|'.join(cells))
+    return lines
+
+
+def encode_market_line(market, skip_market=()):
+    """'MARKET k=v ...' line for one bar (also used for the per-bar lines of batched prompts)."""
+    skip = set(skip_market) | ({'px'} if market.get('close') is not None else set())  # px duplicates c
+    return f"MARKET {_pairs(market, MARKET_FIELDS, skip)}"
+
+
+def _render(context, trades, active_trades, skip_market):
+    lines = [LEGEND]
+    market = context.get('market_data') or {}
+    if market:
+        lines.append(encode_market_line(market, skip_market))
+
+    portfolio = context.get('portfolio') or {}
+    pf = _pairs(portfolio, PORTFOLIO_FIELDS)
+    extras = [(short, context.get(key)) for short, key in (('value', 'portfolio_value'), ('profit_threshold', 'profit_threshold'))]
+    pf += ''.join(f" {short}={_fmt(value, 2)}" for short, value in extras if _fmt(value, 2) is not None)
+    if pf:
+        lines.append(f"PORTFOLIO {pf.strip()}")
+
+    config = context.get('config')
+    if config:
+        lines.append(f"CONFIG {_pairs(config, CONFIG_FIELDS)}")
+
+    if 'dca_triggered' in context:
+        stops = context.get('stop_loss_triggers') or []
+        lines.append(f"SIGNALS dca_triggered={int(bool(context['dca_triggered']))} "
+                     f"dca_drop_pct={_fmt(context.get('dca_price_drop_pct'), 2)} stop_loss_hits={len(stops)}")
+        for stop in stops:
+            lines.append(f"STOP entry={_fmt(stop.get('entry_price'), 2)} stop={_fmt(stop.get('stop_loss'), 2)}")
+
+    if active_trades:
+        lines.append("ACTIVE entry|qty|atr")
+        for trade in active_trades:
+            lines.append('|'.join(_fmt(trade.get(key), decimals) or '' for key, decimals in
+                                  (('entry_price', 2), ('quantity', 6), ('atr', 2))))
+
+    if trades:
+        lines.append(f"TRADES ({len(trades)})")
+        lines.extend(_trade_table(trades))
+    return '\n'.join(lines)
+
+
+def encode_context(context, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Encode a decision context within token_budget.
+    Returns (text, tokens, dropped) where dropped lists what was removed to fit the budget.
+    """
+    trades = list(context.get('trade_history') or context.get('recent_trade_history') or [])
+    active_trades = list(context.get('active_trades') or [])
+    skip_market = set()
+    dropped = []
+
+    text = _render(context, trades, active_trades, skip_market)
+    tokens = count_tokens(text)
+    while token_budget and tokens > token_budget:
+        if trades:
+            trades.pop(0)  # oldest first
+            dropped.append('trade')
+        elif active_trades:
+            active_trades.pop(0)
+            dropped.append('active_trade')
+        elif not skip_market:
+            skip_market = set(SECONDARY_MARKET_FIELDS)
+            dropped.append('secondary_indicators')
+        else:
+            break  # nothing left to drop; report the overrun
+        text = _render(context, trades, active_trades, skip_market)
+        tokens = count_tokens(text)
+    return text, tokens, dropped
@@ -0,0 +1,206 @@
+"""
+Regime Cache for Bitcoin Trading Agent
+
+Purpose: Approximate ("semantic") cache for LLM trading decisions. Many hourly states look the same
+to the model, so instead of hashing the exact context (llm_decision_cache.py) the context is
+quantized into a market regime key and a decision stored for that regime is reused.
+
+Regime key (from the context dict built by build_llm_context / the backtester):
+- price vs SMA 20 and vs SMA 50 (bucketed % distance)
+- RSI(14) bucket
+- MACD histogram sign
+- position inside the Bollinger bands
+- BTC share of the portfolio (allocation bucket)
+- whether the portfolio value is above the profit threshold (PROFIT is only possible then)
+plus the model, temperature and prompt template version.
+
+Amounts are stored relative to the balances they were suggested for (buy_amount as a fraction of
+USDT, quantity as a fraction of BTC, profit_amount - USD of BTC to sell - as a fraction of the BTC
+position value) and rescaled to the current portfolio on a hit. A decision whose amount cannot be
+expressed that way (e.g. a zero balance) is not stored, and every hit is checked with
+decision_protocol.validate_decision() against the current limits; an invalid hit counts as a miss.
+
+- LRU bounded by max_entries; entries older than ttl_seconds are not served
+- TTL is measured on the bar timestamp of the context when present (backtests), else wall clock
+- hits / misses / expired / evictions counters
+
+Usage:
+    cache = RegimeCache(ttl_seconds=6 * 3600, max_entries=5000)
+    set_regime_cache(cache)       # llm_decision_strategy_05
+
+Dependencies: decision_protocol (validation)
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from decision_protocol import ACTION_AMOUNT_FIELDS, limits_from_context, validate_decision
+
+DEFAULT_TTL_SECONDS = 6 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+
+# Bucket edges (a value falls in bucket i when edges[i-1] <= value < edges[i])
+SMA_DISTANCE_EDGES = (-3.0, -1.0, -0.25, 0.25, 1.0, 3.0)   # % distance of price from the SMA
+RSI_EDGES = (30.0, 40.0, 50.0, 60.0, 70.0)
+BB_POSITION_EDGES = (0.0, 0.2, 0.5, 0.8, 1.0)              # 0 = lower band, 1 = upper band
+ALLOCATION_EDGES = (0.05, 0.25, 0.5, 0.75, 0.95)           # BTC value / portfolio value
+
+
+def _bucket(value, edges):
+    if value is None:
+        return None
+    return sum(value >= edge for edge in edges)
+
+
+def _pct_distance(price, reference):
+    if price is None or not reference:
+        return None
+    return (price / reference - 1) * 100
+
+
+def regime_key(context, model, temperature, prompt_version):
+    """Quantized market / portfolio regime of a decision context, as a hashable tuple."""
+    market = context.get('market_data') or {}
+    portfolio = context.get('portfolio') or {}
+    price = market.get('current_price', market.get('close'))
+
+    macd, macd_signal = market.get('macd'), market.get('macd_signal')
+    macd_sign = None if macd is None or macd_signal is None else int(macd >= macd_signal)
+
+    bb_upper, bb_lower = market.get('bb_upper'), market.get('bb_lower')
+    bb_position = None
+    if price is not None and bb_upper is not None and bb_lower is not None and bb_upper > bb_lower:
+        bb_position = (price - bb_lower) / (bb_upper - bb_lower)
+
+    btc_value = portfolio.get('btc', 0.0) * (price or 0.0)
+    total_value = btc_value + portfolio.get('usdt', 0.0)
+    allocation = btc_value / total_value if total_value > 0 else None
+
+    threshold = context.get('profit_threshold')
+    above_threshold = None if threshold is None else int(total_value > threshold)
+
+    return (
+        model, temperature, prompt_version,
+        _bucket(_pct_distance(price, market.get('sma_20')), SMA_DISTANCE_EDGES),
+        _bucket(_pct_distance(price, market.get('sma_50')), SMA_DISTANCE_EDGES),
+        _bucket(market.get('rsi_14'), RSI_EDGES),
+        macd_sign,
+        _bucket(bb_position, BB_POSITION_EDGES),
+        _bucket(allocation, ALLOCATION_EDGES),
+        above_threshold,
+    )
+
+
+def _context_time(context):
+    """Bar time of the context in epoch seconds, or wall-clock time when there is none."""
+    timestamp = (context.get('market_data') or {}).get('timestamp')
+    if hasattr(timestamp, 'timestamp'):
+        return timestamp.timestamp()
+    if isinstance(timestamp, str):
+        try:
+            return datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def _ratio(amount, balance):
+    if amount is None or not balance:
+        return None
+    return float(amount) / balance
+
+
+def _amount_bases(context):
+    """Balance each amount field scales with: USDT, BTC, and the BTC position value in USD."""
+    portfolio = context.get('portfolio') or {}
+    limits = limits_from_context(context)
+    btc = portfolio.get('btc', 0.0)
+    return {'buy_amount': portfolio.get('usdt', 0.0), 'quantity': btc,
+            'profit_amount': btc * limits['price'] if limits.get('price') else None}
+
+
+class RegimeCache:
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalid = 0
+        self._entries = OrderedDict()  # key -> (stored_at, relative decision)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, context):
+        """Decision for this regime scaled to the context's portfolio, or None on a miss."""
+        entry = self._entries.get(key)
+        now = _context_time(context)
+        if entry is not None and self.ttl_seconds and abs(now - entry[0]) > self.ttl_seconds:
+            del self._entries[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        decision = self._scale(entry[1], context)
+        if decision is None:
+            # Not valid for this portfolio (amount over the balance, zero balance, ...)
+            del self._entries[key]
+            self.invalid += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def put(self, key, decision, context):
+        """Store a decision with its amounts expressed relative to the context's balances."""
+        if not decision or not decision.get('action'):
+            return
+        bases = _amount_bases(context)
+        stored = {k: v for k, v in decision.items() if k not in bases}
+        for field, base in bases.items():
+            ratio = _ratio(decision.get(field), base)
+            if ratio is not None:
+                stored[field] = ratio
+        required = ACTION_AMOUNT_FIELDS.get(str(decision.get('action')).upper())
+        if required and required not in stored:
+            return  # amount cannot be expressed relative to this portfolio
+        self._entries[key] = (_context_time(context), stored)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup_or_call(self, key, context, call):
+        decision = self.get(key, context)
+        if decision is not None:
+            return decision
+        decision = call()
+        self.put(key, decision, context)
+        return decision
+
+    @staticmethod
+    def _scale(stored, context):
+        """Stored ratios -> amounts for this context, validated; None if the result is not usable."""
+        bases = _amount_bases(context)
+        decision = {k: v for k, v in stored.items() if k not in bases}
+        for field, base in bases.items():
+            if stored.get(field) is not None and base:
+                decision[field] = stored[field] * base
+        validated, errors = validate_decision(decision, limits_from_context(context))
+        if validated is None:
+            return None
+        result = dict(decision)
+        result.update({k: v for k, v in validated.items() if v is not None})
+        result['rationale'] = f"[regime cache] {stored.get('rationale', '')}"
+        return result
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'expired': self.expired, 'evictions': self.evictions, 'invalid': self.invalid}
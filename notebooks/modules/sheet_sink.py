@@ -0,0 +1,310 @@
+"""
+Google Sheets Sink for Bitcoin Trading Agent
+
+Purpose: Buffered, non-blocking trade logging to Google Sheets. Before, every trade loaded the
+credentials, authorized gspread, opened the spreadsheet and the worksheet, read all values to look
+for a header and appended one row (4-5 API calls per trade, which ran into Sheets quotas in backtests).
+
+- One authorized gspread client and one worksheet handle per worksheet, cached for the process;
+  the header is checked once (first row only) when the worksheet is first opened
+- enqueue(row) puts the row on a bounded queue and returns at once; a background worker drains it
+  and writes up to BATCH_SIZE rows with a single append_rows call
+- Quota-aware retries: 429 / 5xx / network errors back off exponentially (Retry-After is honored);
+  after MAX_ATTEMPTS the batch is spilled to a local JSON Lines file
+- Rows that do not fit in the full queue are spilled as well; spilled rows are sent first
+  (in order) once the API accepts writes again
+- A non-retryable 4xx goes to a separate dead-letter file instead (replaying it would fail again and
+  hold back every later row); 401 / 403 / 404 (credentials, sharing, missing worksheet) also disable
+  the sink with that reason; later rows go straight to the dead-letter file
+- flush() waits for the queue to drain, close() flushes and stops the worker (also at exit)
+
+Usage:
+    sink = get_sheet_sink("Trade Logs BackTest", header=[...])
+    sink.enqueue([timestamp, "BUY", price, ...])
+    sink.report()
+
+Dependencies: gspread, google-auth, dotenv
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import gspread
+from dotenv import load_dotenv
+from google.oauth2.service_account import Credentials
+
+MAX_QUEUE_ROWS = 1000           # rows buffered in memory before new rows are spilled to disk
+BATCH_SIZE = 50                 # rows per append_rows call
+FLUSH_INTERVAL_SECONDS = 2.0    # wait this long for more rows before writing a partial batch
+MAX_ATTEMPTS = 5                # retries of one batch before it is spilled
+INITIAL_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 120.0
+SPILL_DIR = '../data'
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+DISABLING_STATUS = (401, 403, 404)   # every later write would be rejected as well
+
+# _send() results
+SENT, RETRY_LATER, REJECTED = 'sent', 'retry', 'rejected'
+
+_client = None
+_client_lock = threading.Lock()
+_sinks = {}
+
+
+class SheetsUnavailable(Exception):
+    """Google Sheets is not configured (.env) for this process."""
+
+
+def get_gspread_client():
+    """Authorized gspread client, created once from GOOGLE_SHEETS_API_KEY / GOOGLE_SHEETS_SCOPE."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            load_dotenv()
+            creds_path = os.getenv('GOOGLE_SHEETS_API_KEY')
+            scopes_url = os.getenv('GOOGLE_SHEETS_SCOPE')
+            if not creds_path or not scopes_url or not os.getenv('GOOGLE_SHEETS_ID'):
+                raise SheetsUnavailable("missing credentials, sheet ID, or scope in .env")
+            creds = Credentials.from_service_account_file(creds_path, scopes=[scopes_url])
+            _client = gspread.authorize(creds)
+        return _client
+
+
+def _status_code(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class SheetSink:
+    def __init__(self, worksheet_name, header=None, max_queue=MAX_QUEUE_ROWS, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL_SECONDS, spill_path=None):
+        self.worksheet_name = worksheet_name
+        self.header = list(header) if header else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path or os.path.join(
+            SPILL_DIR, f"sheet_spill_{worksheet_name.lower().replace(' ', '_')}.jsonl")
+        self.dead_letter_path = self.spill_path.replace('.jsonl', '_dead_letter.jsonl')
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worksheet = None
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.disabled_reason = None
+        self._dead_letter_when_disabled = False   # disabled by the API: keep later rows in the dead-letter file
+        self.rows_sent = 0
+        self.api_calls = 0
+        self.retries = 0
+        self.rows_spilled = 0
+        self.rows_dead_lettered = 0
+
+    # ------------------------------------------------------------------ producer side
+    def enqueue(self, row):
+        """Queue one row for the worksheet; never blocks on the network."""
+        if self.disabled_reason:
+            if self._dead_letter_when_disabled:
+                self._dead_letter([list(row)])
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(list(row))
+        except queue.Full:
+            self._spill([list(row)])
+
+    def flush(self, timeout=30.0):
+        """Wait until every queued row was written or spilled; False on timeout."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+    def close(self, timeout=30.0):
+        if self._worker is not None and self._worker.is_alive():
+            self.flush(timeout)
+            self._stop.set()
+            self._worker.join(timeout=self.flush_interval + 1)
+
+    # ------------------------------------------------------------------ worker
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._stop.clear()
+                    self._worker = threading.Thread(target=self._run, name=f"sheet-sink-{self.worksheet_name}",
+                                                    daemon=True)
+                    self._worker.start()
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                if self.disabled_reason:
+                    if self._dead_letter_when_disabled:
+                        self._dead_letter(batch)
+                    continue
+                if os.path.exists(self.spill_path) and not self._send_spilled():
+                    self._spill(batch)  # still failing: keep the order on disk
+                    continue
+                result = self._send(batch)
+                if result == RETRY_LATER:
+                    self._spill(batch)
+                elif result == REJECTED:
+                    self._dead_letter(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _open_worksheet(self):
+        if self._worksheet is None:
+            worksheet = get_gspread_client().open_by_key(os.getenv('GOOGLE_SHEETS_ID')).worksheet(self.worksheet_name)
+            self.api_calls += 2
+            if self.header:
+                self.api_calls += 1
+                if not worksheet.row_values(1):
+                    worksheet.append_rows([self.header], value_input_option='USER_ENTERED')
+                    self.api_calls += 1
+            self._worksheet = worksheet
+        return self._worksheet
+
+    def _send(self, rows):
+        """append_rows with backoff; SENT, RETRY_LATER (spill the rows) or REJECTED (dead-letter them)."""
+        backoff = INITIAL_BACKOFF_SECONDS
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                self._open_worksheet().append_rows(rows, value_input_option='USER_ENTERED')
+                self.api_calls += 1
+                self.rows_sent += len(rows)
+                return SENT
+            except SheetsUnavailable as e:
+                self.disabled_reason = str(e)
+                print(f"[WARNING] Google Sheets logging skipped: {e}")
+                return SENT  # not configured: nothing to retry or keep (same as before)
+            except Exception as e:
+                status = _status_code(e)
+                if status is not None and status not in RETRYABLE_STATUS:
+                    print(f"[WARNING] Google Sheet '{self.worksheet_name}' rejected {len(rows)} row(s) "
+                          f"(HTTP {status}): {e}")
+                    self._worksheet = None
+                    if status in DISABLING_STATUS:
+                        self.disabled_reason = f"HTTP {status} from worksheet '{self.worksheet_name}': {e}"
+                        self._dead_letter_when_disabled = True
+                        print(f"[ERROR] Google Sheets logging disabled ({self.disabled_reason}); "
+                              f"rows go to {self.dead_letter_path}")
+                    return REJECTED
+                if attempt == MAX_ATTEMPTS or self._stop.is_set():
+                    print(f"[WARNING] Google Sheet '{self.worksheet_name}' unavailable after {attempt} attempt(s): {e}")
+                    return RETRY_LATER
+                wait = _retry_after(e) or backoff
+                self.retries += 1
+                print(f"[WARNING] Google Sheet write failed ({status or type(e).__name__}), retrying in {wait:.1f}s")
+                if status is None:
+                    self._worksheet = None  # connection problem: reopen the handle next time
+                time.sleep(wait + random.uniform(0, 0.25 * wait))
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+        return RETRY_LATER
+
+    # ------------------------------------------------------------------ spill to disk
+    def _append_rows(self, path, rows):
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + '\n')
+
+    def _spill(self, rows):
+        with self._spill_lock:
+            self._append_rows(self.spill_path, rows)
+            self.rows_spilled += len(rows)
+        print(f"[WARNING] Spilled {len(rows)} row(s) for '{self.worksheet_name}' to {self.spill_path}")
+
+    def _dead_letter(self, rows):
+        """Rows the API refused; kept for inspection, never replayed automatically."""
+        with self._spill_lock:
+            self._append_rows(self.dead_letter_path, rows)
+            self.rows_dead_lettered += len(rows)
+        print(f"[WARNING] Moved {len(rows)} rejected row(s) for '{self.worksheet_name}' to {self.dead_letter_path}")
+
+    def _send_spilled(self):
+        """Send rows spilled earlier, oldest first; True when the spill file is empty again."""
+        with self._spill_lock:
+            with open(self.spill_path, encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            os.remove(self.spill_path)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            result = self._send(batch)
+            if result == SENT:
+                continue
+            if result == REJECTED:
+                self._dead_letter(batch)
+                if not self.disabled_reason:
+                    continue
+            # Put the unsent rows back in front of rows spilled meanwhile (sink disabled: for a later run)
+            remaining = rows[start + len(batch):] if result == REJECTED else rows[start:]
+            with self._spill_lock:
+                existing = []
+                if os.path.exists(self.spill_path):
+                    with open(self.spill_path, encoding='utf-8') as f:
+                        existing = [line for line in f if line.strip()]
+                with open(self.spill_path, 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(row, default=str) + '\n' for row in remaining)
+                    f.writelines(existing)
+            return False
+        if rows:
+            print(f"[OK] Re-sent {len(rows)} spilled row(s) to '{self.worksheet_name}'")
+        return True
+
+    # ------------------------------------------------------------------ stats
+    def stats(self):
+        return {'worksheet': self.worksheet_name, 'queued': self._queue.qsize(), 'rows_sent': self.rows_sent,
+                'api_calls': self.api_calls, 'retries': self.retries, 'rows_spilled': self.rows_spilled,
+                'rows_dead_lettered': self.rows_dead_lettered, 'disabled': self.disabled_reason}
+
+    def report(self):
+        stats = self.stats()
+        print(f"[INFO] Sheet sink '{self.worksheet_name}': {stats['rows_sent']} rows in {stats['api_calls']} API calls, "
+              f"{stats['retries']} retries, {stats['rows_spilled']} spilled, "
+              f"{stats['rows_dead_lettered']} dead-lettered, {stats['queued']} queued")
+        if stats['disabled']:
+            print(f"[WARNING] Sheet sink '{self.worksheet_name}' disabled: {stats['disabled']}")
+
+
+def get_sheet_sink(worksheet_name, header=None):
+    """Shared SheetSink for a worksheet (created on first use, flushed at interpreter exit)."""
+    with _client_lock:
+        sink = _sinks.get(worksheet_name)
+        if sink is None:
+            sink = _sinks[worksheet_name] = SheetSink(worksheet_name, header)
+            atexit.register(sink.close)
+        return sink
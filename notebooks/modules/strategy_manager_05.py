@@ -647,6 +647,9 @@ import pandas as pd     # Import pandas for data manipulation and handling
 import numpy as np      # Import numpy for numerical operations and calculations
 from datetime import datetime  # Import datetime for handling timestamps in trade operations
 import re               # Import re for regular expression parsing of markdown files
+import os               # Import os for file ages and paths
+import time             # Import time for snapshot age checks
+from market_snapshot import MarketSnapshot, load_latest_snapshot, SNAPSHOT_MAX_AGE_SECONDS  # Typed market data from data collection / backtests
 
 def load_config():
     """Loads configuration settings from config.cfg file."""
@@ -701,6 +704,8 @@ def parse_latest_data_from_md(md_path="complete_bitcoin_data.md"):
         print(f"[ERROR] Failed to parse markdown data: {e}")  # Log error message
         return {}  # Return empty dictionary on failure
 
+MAX_TRADE_USD = 10.0  # Cap on a single rule-based buy; config key max_trade_usd overrides it
+
 def check_dca_trigger(latest_data, config, last_price, current_price):
     """Checks if Dollar-Cost Averaging (DCA) condition is met."""
     dca_percentage = config.get('dca_percentage', 3.0)  # Get DCA trigger percentage, default 3%
@@ -712,7 +717,7 @@ def check_dca_trigger(latest_data, config, last_price, current_price):
     if price_drop >= dca_percentage:  # Check if price drop meets or exceeds DCA threshold
         print(f"[DCA] Price dropped {price_drop:.2f}% (>= {dca_percentage}%)")  # Log DCA trigger
         amount = (config.get('budget', 10000) * position_size_pct / 100)  # Calculate trade amount based on budget
-        return {'action': 'BUY', 'amount': min(amount, 10.0), 'trade_type': 'DCA'}  # Return buy decision, capped at $10
+        return {'action': 'BUY', 'amount': min(amount, config.get('max_trade_usd', MAX_TRADE_USD)), 'trade_type': 'DCA'}  # Return buy decision, capped (default $10)
     return None  # Return None if DCA condition not met
 
 def check_atr_stop_loss(active_trades, current_price, config, atr_value):
@@ -742,20 +747,19 @@ def check_opportunistic_trade(llm_suggestion, config, current_price):
         position_size_pct = config.get('position_size_pct', 2.0)  # Get position size percentage, default 2%
         amount = (config.get('budget', 10000) * position_size_pct / 100)  # Calculate trade amount based on budget
         print(f"[LLM] Opportunistic buy suggested: ${amount:,.2f} | Confidence: {llm_suggestion.get('confidence', 'N/A')} | Rationale: {llm_suggestion.get('rationale', '')}")  # Log LLM suggestion details
-        return {'action': 'BUY', 'amount': min(amount, 10.0), 'trade_type': 'SWING'}  # Return buy decision, capped at $10
+        return {'action': 'BUY', 'amount': min(amount, config.get('max_trade_usd', MAX_TRADE_USD)), 'trade_type': 'SWING'}  # Return buy decision, capped (default $10)
     return None  # Return None if no valid LLM buy suggestion
 
-def manage_trades(portfolio, active_trades, llm_suggestion):
+def evaluate_rules(portfolio, active_trades, latest_data, config, llm_suggestion=None):
     """
-    Main strategy manager function.
+    Applies the trading rules to already-loaded market data and config (no file I/O).
+    Used by manage_trades() and by the parameter sweep, which passes its own config per run.
     Orchestrates:
     - DCA buys
     - ATR stop-loss checks
-    - Opportunistic LLM trades (now with full context from llm_decision_04)
+    - Opportunistic LLM trades (only when an llm_suggestion is given)
     - Portfolio safeguard (avoid too much drawdown)
     """
-    config = load_config()  # Load configuration settings
-    latest_data = parse_latest_data_from_md()  # Load latest market data from markdown
     current_price = latest_data.get('current_price', 0)  # Get current Bitcoin price, default 0
     atr_value = latest_data.get('atr_14', 0)  # Get ATR (14) value, default 0
     sma_20 = latest_data.get('sma_20', 0)  # Get SMA (20) value, default 0
@@ -791,6 +795,37 @@ def manage_trades(portfolio, active_trades, llm_suggestion):
 
     return decisions, active_trades  # Return trade decisions and updated active trades
 
+def load_fresh_market_data(max_age_seconds=SNAPSHOT_MAX_AGE_SECONDS, md_path="complete_bitcoin_data.md"):
+    """
+    Latest market data that is at most max_age_seconds old: the JSON snapshot, else the markdown
+    report (by file time). Returns None when both are stale (data collection stopped); the caller
+    then skips the rule-based decisions for this cycle instead of re-collecting on the trading path.
+    """
+    snapshot = load_latest_snapshot(max_age_seconds=max_age_seconds)  # JSON snapshot written by data_collection_01
+    if snapshot is not None:
+        return snapshot
+    if os.path.exists(md_path) and time.time() - os.path.getmtime(md_path) <= max_age_seconds:
+        return parse_latest_data_from_md(md_path)  # Legacy fallback: regex over the markdown report
+    print(f"[WARNING] Market snapshot and report are older than {max_age_seconds}s, is data_collection_01 running?")
+    return None
+
+def manage_trades(portfolio, active_trades, llm_suggestion, latest_data=None):
+    """
+    Main strategy manager function.
+    Loads config.cfg and applies evaluate_rules() to the latest market data: a MarketSnapshot (or
+    latest_data dict) passed in by the caller, else the snapshot saved by data collection, else the
+    markdown report.
+    """
+    config = load_config()  # Load configuration settings
+    if latest_data is None:  # Nothing passed in: use the last data collection run
+        latest_data = load_fresh_market_data()  # Snapshot / report no older than one bar
+        if latest_data is None:
+            print("[ERROR] No market data newer than one bar, no rule-based decisions this cycle")
+            return [], active_trades
+    if isinstance(latest_data, MarketSnapshot):  # Typed snapshot -> plain dict for the rules
+        latest_data = latest_data.as_latest_data()
+    return evaluate_rules(portfolio, active_trades, latest_data, config, llm_suggestion)  # Apply DCA / ATR / LLM / drawdown rules
+
 if __name__ == "__main__":
     """
     Live test section – runs against **real Binance account**.
@@ -798,32 +833,40 @@ if __name__ == "__main__":
     - Uses live LLM decision (with full context)
     - Executes real trades if BUY is signalled
     """
-    from trade_executor_03 import initialize_binance_client, get_portfolio  # Import Binance client functions
-    from llm_decision_04 import get_llm_decision  # Import LLM decision function
+    import asyncio  # The user data stream and the order executor run on an event loop
+    from trade_executor_03 import (get_live_portfolio, start_user_data_stream, stop_user_data_stream,
+                                   execute_buy, close_async_executors)  # Binance balance / order functions
+    from llm_decision_04 import get_llm_decision, get_binance_client  # LLM decision, shared Binance client
+
+    async def live_test():
+        client = get_binance_client()  # Same client (and balance ledger) as the LLM context
+        try:
+            await start_user_data_stream(client)  # Balances pushed by the exchange instead of polled
+            portfolio = get_live_portfolio(client)  # Current portfolio from the stream / ledger
+            active_trades = []  # Initialize empty list for active trades
+
+            # --- live LLM decision (full context: market data, portfolio, trade history) ---
+            llm_suggestion = get_llm_decision(use_google_sheet=True)  # Get LLM decision with Google Sheets context
+            # -------------------------------------------------------------------------------
+
+            decisions, active_trades = manage_trades(portfolio, active_trades, llm_suggestion)  # Run strategy manager
+
+            print(f"[LIVE] Trade decisions: {decisions}")  # Log trade decisions
+            print(f"[LIVE] Active trades: {active_trades}")  # Log active trades
+
+            # execute any BUY signals
+            for d in decisions:  # Iterate through trade decisions
+                if d['action'] == 'BUY':  # Check for buy decisions
+                    rec = await execute_buy(client, d['amount'],  # Execute buy order
+                                            active_trades[-1]['entry_price'],  # Use latest entry price
+                                            d['trade_type'])  # Specify trade type
+                    print(f"[LIVE] Buy executed: {rec}")  # Log executed buy record
+        finally:
+            await stop_user_data_stream()
+            await close_async_executors()
 
     print("Live test: running strategy_manager with real Binance data…")  # Log start of live test
     try:
-        client = initialize_binance_client()  # Initialize Binance API client
-        portfolio = get_portfolio(client)  # Retrieve current portfolio from Binance
-        active_trades = []  # Initialize empty list for active trades
-
-        # --- live LLM decision (full context: market data, portfolio, trade history) ---
-        llm_suggestion = get_llm_decision(use_google_sheet=True)  # Get LLM decision with Google Sheets context
-        # -------------------------------------------------------------------------------
-
-        decisions, active_trades = manage_trades(portfolio, active_trades, llm_suggestion)  # Run strategy manager
-
-        print(f"[LIVE] Trade decisions: {decisions}")  # Log trade decisions
-        print(f"[LIVE] Active trades: {active_trades}")  # Log active trades
-
-        # execute any BUY signals
-        from trade_executor_03 import execute_buy  # Import buy execution function
-        for d in decisions:  # Iterate through trade decisions
-            if d['action'] == 'BUY':  # Check for buy decisions
-                rec = execute_buy(client, d['amount'],  # Execute buy order
-                                  active_trades[-1]['entry_price'],  # Use latest entry price
-                                  d['trade_type'])  # Specify trade type
-                print(f"[LIVE] Buy executed: {rec}")  # Log executed buy record
-
+        asyncio.run(live_test())
     except Exception as e:  # Catch any errors during live test
         print(f"[ERROR] Live test failed: {e}")  # Log error message
\ No newline at end of file
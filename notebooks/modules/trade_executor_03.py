@@ -808,11 +808,22 @@ Inputs:
 - Configuration from config_manager
 
 Outputs:
-- Executed trades (buy/sell)
-- Portfolio status (BTC and USD balance)
-- Transaction logs saved to '../data/trade_log.csv' and Google Sheet 'Trade Logs'
-
-Dependencies: python-binance, pandas, dotenv, gspread, google-auth
+- Orders sent through the async executor (binance_execution.py): pooled AsyncClient session, so an
+  order no longer blocks the event loop, and sizes rounded / checked against the cached exchange
+  filters (LOT_SIZE, MIN_NOTIONAL / NOTIONAL, PRICE_FILTER) before anything is sent
+- Executed trades (buy/sell) as ExecutionResult: executed quantity, average fill price and
+  commission taken from the order response's fills (no approximation from the bar price)
+- Portfolio status (BTC and USD balance) from a local BalanceLedger that applies every fill and is
+  reconciled with get_account() only every RECONCILE_EVERY_TRADES trades / RECONCILE_INTERVAL_SECONDS;
+  after start_user_data_stream(client) the balances come from the push-based user data stream instead,
+  unless a fill applied locally is newer than the last balance the stream pushed.
+  get_live_portfolio(client) is the read used by the live decision code (no get_account() per cycle)
+- Realized P&L of each sell from the in-memory PositionLedger (position_ledger.py, FIFO lots incl.
+  fees), loaded once at startup instead of re-reading the trade log on every sell
+- Transaction logs saved to '../data/trade_log.csv' and Google Sheet 'Trade Logs BackTest'
+  (queued on the buffered SheetSink from sheet_sink.py, written in batches off the trading path)
+
+Dependencies: python-binance, pandas, dotenv, gspread + google-auth (through sheet_sink)
 """
 
 import os
@@ -822,12 +833,26 @@ from dotenv import load_dotenv
 import time
 from datetime import datetime
 import asyncio
-import gspread
-from google.oauth2.service_account import Credentials
+from binance_execution import OrderRejected, close_async_executors, get_async_executor
+from position_ledger import PositionLedger
+from user_data_stream import user_data_stream_for
+from sheet_sink import get_sheet_sink
 
 # Global testnet mode variable
 testnet_mode = True  # Set to False for live trading
 
+SYMBOL = 'BTCUSDT'
+BASE_ASSET = 'BTC'
+QUOTE_ASSET = 'USDT'
+RECONCILE_EVERY_TRADES = 10       # full get_account() after this many trades...
+RECONCILE_INTERVAL_SECONDS = 300  # ...or when the last one is older than this
+BALANCE_DRIFT_TOLERANCE = 1e-8    # differences below this are not reported
+TRADE_SHEET_NAME = "Trade Logs BackTest"
+TRADE_SHEET_HEADER = [
+    "Timestamp", "Type", "Trade Type", "Price BTC", "Quantity", "Value USD (Cost)",
+    "BTC BALANCE", "BTC VALUE USD", "Total Portfolio Value", "USD BALANCE", "PROFIT / LOSS USD"
+]
+
 def initialize_binance_client():
     load_dotenv()
     if testnet_mode:
@@ -851,16 +876,212 @@ def initialize_binance_client():
         print(f"[WARNING] Could not sync time offset: {e}")
     return client
 
+def _async_executor(client):
+    """Async executor on the same network (testnet_mode) and REST base URL as the sync client."""
+    return get_async_executor(client, testnet_mode, client.API_URL)
+
+def fetch_portfolio(client):
+    """Free BTC / USDT balances from get_account(); raises on errors (get_portfolio returns zeros)."""
+    account = client.get_account()
+    btc_balance = float([asset for asset in account['balances'] if asset['asset'] == 'BTC'][0]['free'])
+    usdt_balance = float([asset for asset in account['balances'] if asset['asset'] == 'USDT'][0]['free'])
+    return {'btc': btc_balance, 'usdt': usdt_balance}
+
 def get_portfolio(client):
     try:
-        account = client.get_account()
-        btc_balance = float([asset for asset in account['balances'] if asset['asset'] == 'BTC'][0]['free'])
-        usdt_balance = float([asset for asset in account['balances'] if asset['asset'] == 'USDT'][0]['free'])
-        return {'btc': btc_balance, 'usdt': usdt_balance}
+        return fetch_portfolio(client)
+    except Exception as e:
+        print(f"[ERROR] Failed to get portfolio: {e}")
+        return {'btc': 0, 'usdt': 0}
+
+class ExecutionResult:
+    """Fill summary of one market order, built from the order response (newOrderRespType FULL)."""
+
+    def __init__(self, side, order_id, status, executed_qty, quote_qty, commissions, fills, transact_time):
+        self.side = side
+        self.order_id = order_id
+        self.status = status
+        self.executed_qty = executed_qty      # BTC
+        self.quote_qty = quote_qty            # USDT spent (BUY) / received (SELL), before commission
+        self.commissions = commissions        # {asset: amount}
+        self.fills = fills
+        self.transact_time = transact_time
+
+    @classmethod
+    def from_order(cls, order):
+        fills = order.get('fills') or []
+        executed_qty = float(order.get('executedQty') or sum(float(f['qty']) for f in fills))
+        quote_qty = float(order.get('cummulativeQuoteQty') or sum(float(f['qty']) * float(f['price']) for f in fills))
+        commissions = {}
+        for fill in fills:
+            asset = fill.get('commissionAsset')
+            if asset:
+                commissions[asset] = commissions.get(asset, 0.0) + float(fill.get('commission', 0))
+        transact_time = order.get('transactTime')
+        return cls(order.get('side'), order.get('orderId'), order.get('status'), executed_qty, quote_qty,
+                   commissions, fills, transact_time)
+
+    @property
+    def avg_price(self):
+        return self.quote_qty / self.executed_qty if self.executed_qty else 0.0
+
+    @property
+    def commission_usd(self):
+        """Commission in USDT (BTC commission valued at the average fill price; BNB is not converted)."""
+        return self.commissions.get(QUOTE_ASSET, 0.0) + self.commissions.get(BASE_ASSET, 0.0) * self.avg_price
+
+    @property
+    def btc_delta(self):
+        """Change of the free BTC balance caused by this order."""
+        sign = 1 if self.side == 'BUY' else -1
+        return sign * self.executed_qty - self.commissions.get(BASE_ASSET, 0.0)
+
+    @property
+    def usdt_delta(self):
+        """Change of the free USDT balance caused by this order."""
+        sign = -1 if self.side == 'BUY' else 1
+        return sign * self.quote_qty - self.commissions.get(QUOTE_ASSET, 0.0)
+
+    def timestamp_text(self):
+        if self.transact_time:
+            return datetime.fromtimestamp(self.transact_time / 1000).strftime('%d-%m-%Y %I:%M:%S %p')
+        return datetime.now().strftime('%d-%m-%Y %I:%M:%S %p')
+
+    def __repr__(self):
+        return (f"ExecutionResult({self.side} {self.executed_qty:.8f} BTC @ {self.avg_price:,.2f}, "
+                f"commission {self.commissions}, status {self.status})")
+
+
+class BalanceLedger:
+    """
+    Local BTC / USDT balances: updated from each ExecutionResult and reconciled with the
+    exchange (get_portfolio) only periodically, instead of a get_account() after every trade.
+    """
+
+    def __init__(self, client, reconcile_every=RECONCILE_EVERY_TRADES, reconcile_interval=RECONCILE_INTERVAL_SECONDS):
+        self.client = client
+        self.reconcile_every = reconcile_every
+        self.reconcile_interval = reconcile_interval
+        self.balances = None
+        self.trades_since_reconcile = 0
+        self.last_reconcile = 0.0
+        self.reconciliations = 0
+        self.failed_reconciliations = 0
+        self.updated_ms = 0   # exchange time of the newest local balance information (fill or snapshot)
+
+    def reconcile(self):
+        """
+        Replace the local balances with the exchange balances and report any drift.
+        If the exchange cannot be read the previous balances are kept (and it is retried on the
+        next call); with no previous balances the error is raised.
+        """
+        try:
+            exchange = fetch_portfolio(self.client)
+        except Exception as e:
+            self.failed_reconciliations += 1
+            if self.balances is None:
+                raise
+            print(f"[WARNING] Ledger reconciliation failed ({e}), keeping local balances")
+            return dict(self.balances)
+        if self.balances is not None:
+            for asset in ('btc', 'usdt'):
+                drift = exchange[asset] - self.balances[asset]
+                if abs(drift) > BALANCE_DRIFT_TOLERANCE:
+                    print(f"[WARNING] Ledger {asset.upper()} drift {drift:+.8f} (local {self.balances[asset]:.8f}, exchange {exchange[asset]:.8f})")
+        self.balances = dict(exchange)
+        self.trades_since_reconcile = 0
+        self.last_reconcile = time.time()
+        self.updated_ms = self._exchange_now_ms()
+        self.reconciliations += 1
+        return dict(self.balances)
+
+    def _exchange_now_ms(self):
+        return int(time.time() * 1000) + getattr(self.client, 'time_offset', 0)
+
+    def apply(self, result):
+        """Add a fill to the balances; returns them, or None while they are unknown."""
+        if self.balances is None:
+            try:
+                return self.reconcile()  # first trade: the order is already filled, so this includes it
+            except Exception as e:
+                print(f"[ERROR] Balances unknown after the {result.side} fill, exchange not readable: {e}")
+                return None
+        self.balances['btc'] += result.btc_delta
+        self.balances['usdt'] += result.usdt_delta
+        self.trades_since_reconcile += 1
+        self.updated_ms = max(self.updated_ms, int(result.transact_time or self._exchange_now_ms()))
+        return dict(self.balances)
+
+    def portfolio(self):
+        """
+        Current balances: from the user data stream when it is up and at least as new as the last
+        local fill, else local; reconciles when the trade count or age limit is reached (see reconcile).
+        """
+        if _user_stream is not None and not _user_stream.cache.stale:
+            cache = _user_stream.cache
+            if self.balances is None or cache.last_update_ms >= self.updated_ms:
+                return cache.portfolio()  # pushed by the exchange, no polling needed
+            return dict(self.balances)    # our fill is not in the pushed balances yet
+        if (self.balances is None or self.trades_since_reconcile >= self.reconcile_every
+                or time.time() - self.last_reconcile >= self.reconcile_interval):
+            return self.reconcile()
+        return dict(self.balances)
+
+
+_ledgers = {}
+_user_stream = None
+
+def get_ledger(client):
+    """BalanceLedger for this client (created on first use)."""
+    ledger = _ledgers.get(id(client))
+    if ledger is None or ledger.client is not client:
+        ledger = _ledgers[id(client)] = BalanceLedger(client)
+    return ledger
+
+def get_live_portfolio(client):
+    """
+    Balances for the live decision code: user data stream / local ledger, get_account() only to
+    reconcile. Zeros on errors, like get_portfolio().
+    """
+    try:
+        return get_ledger(client).portfolio()
     except Exception as e:
         print(f"[ERROR] Failed to get portfolio: {e}")
         return {'btc': 0, 'usdt': 0}
 
+async def start_user_data_stream(client):
+    """Start the user data websocket; BalanceLedger.portfolio() then reads balances from memory."""
+    global _user_stream
+    if _user_stream is None:
+        _user_stream = user_data_stream_for(_async_executor(client), testnet=testnet_mode)
+    await _user_stream.start()
+    return _user_stream
+
+async def stop_user_data_stream():
+    global _user_stream
+    if _user_stream is not None:
+        await _user_stream.stop()
+        _user_stream = None
+
+_position_ledger = None
+
+def get_position_ledger():
+    """PositionLedger shared by all trades (journal replayed / trade log rebuilt on first use)."""
+    global _position_ledger
+    if _position_ledger is None:
+        _position_ledger = PositionLedger.load()
+    return _position_ledger
+
+def _append_trade_row(trade_log_path, df):
+    """Append in the file's column order; a log without the new columns is rewritten once with them."""
+    header = list(pd.read_csv(trade_log_path, nrows=0).columns)
+    if set(df.columns) - set(header):
+        existing = pd.read_csv(trade_log_path)
+        pd.concat([existing, df], ignore_index=True).to_csv(trade_log_path, index=False)
+        print(f"[INFO] Trade log {trade_log_path} rewritten with new columns {sorted(set(df.columns) - set(header))}")
+        return
+    df.reindex(columns=header).to_csv(trade_log_path, mode='a', header=False, index=False)
+
 async def log_trade(trade_record):
     """Async log trade details to CSV and Google Sheet."""
     os.makedirs('../data', exist_ok=True)
@@ -868,10 +1089,7 @@ async def log_trade(trade_record):
     df = pd.DataFrame([trade_record])
     loop = asyncio.get_event_loop()
     if os.path.exists(trade_log_path):
-        await loop.run_in_executor(
-            None,
-            lambda: df.to_csv(trade_log_path, mode='a', header=False, index=False)
-        )
+        await loop.run_in_executor(None, lambda: _append_trade_row(trade_log_path, df))
     else:
         await loop.run_in_executor(
             None,
@@ -880,27 +1098,8 @@ async def log_trade(trade_record):
     await log_trade_to_google_sheet(trade_record)
 
 async def log_trade_to_google_sheet(trade_record):
-    """Async append trade record to Google Sheet 'Trade Logs BackTest' with new columns."""
+    """Queue the trade row for 'Trade Logs BackTest'; the sheet sink writes it in the background."""
     try:
-        load_dotenv()
-        sheet_id = os.getenv('GOOGLE_SHEETS_ID')
-        creds_path = os.getenv('GOOGLE_SHEETS_API_KEY')
-        scopes_url = os.getenv('GOOGLE_SHEETS_SCOPE')
-        if not creds_path or not sheet_id or not scopes_url:
-            print("[WARNING] Google Sheets logging skipped: missing credentials, sheet ID, or scope in .env")
-            return
-        scopes = [scopes_url]
-        creds = Credentials.from_service_account_file(creds_path, scopes=scopes)
-        gc = gspread.authorize(creds)
-        sh = gc.open_by_key(sheet_id)
-        worksheet = sh.worksheet("Trade Logs BackTest")
-        # Add header if sheet is empty
-        if worksheet.row_count == 0 or not worksheet.get_all_values():
-            header = [
-                "Timestamp", "Type", "Trade Type", "Price BTC", "Quantity", "Value USD (Cost)",
-                "BTC BALANCE", "BTC VALUE USD", "Total Portfolio Value", "USD BALANCE", "PROFIT / LOSS USD"
-            ]
-            worksheet.append_row(header, value_input_option='USER_ENTERED')
         row = [
             trade_record.get('timestamp', ''),
             trade_record.get('type', ''),
@@ -914,85 +1113,82 @@ async def log_trade_to_google_sheet(trade_record):
             trade_record.get('usdt_balance', ''),      # <-- NEW COLUMN
             trade_record.get('profit_loss_usd', '')    # <-- NEW COLUMN (can be blank)
         ]
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, worksheet.append_row, row, 'USER_ENTERED')
-        print("[OK] Trade logged to Google Sheet")
+        get_sheet_sink(TRADE_SHEET_NAME, TRADE_SHEET_HEADER).enqueue(row)
     except Exception as e:
         print(f"[WARNING] Could not log trade to Google Sheet: {e}")
 
 async def execute_buy(client, amount_usd, current_price, trade_type="DCA"):
     try:
-        # Format amount_usd as a string without trailing zeros (e.g., '150' instead of '150.0')
-        quote_order_qty_str = f"{amount_usd:.8f}".rstrip('0').rstrip('.') if '.' in f"{amount_usd:.8f}" else f"{amount_usd}"
-        
-        # Use quoteOrderQty for market buy to specify USDT amount directly
-        order = client.order_market_buy(symbol='BTCUSDT', quoteOrderQty=quote_order_qty_str)
-        trade_time = datetime.now().strftime('%d-%m-%Y %I:%M:%S %p')
-        
-        # Approximate quantity for logging (actual may vary slightly due to market execution)
-        approx_quantity = amount_usd / current_price
-        
-        # Get updated balances after buy
-        portfolio = get_portfolio(client)
-        btc_balance = portfolio['btc']
-        btc_value_usd = round(btc_balance * current_price, 2)
-        
+        # quoteOrderQty (USDT amount) rounded to the quote precision and checked against the filters locally
+        order = await _async_executor(client).market_buy(SYMBOL, amount_usd, current_price)
+        result = ExecutionResult.from_order(order)
+
+        # Balances from the fills (local ledger), not another get_account() round-trip
+        portfolio = get_ledger(client).apply(result)
+        btc_balance = portfolio['btc'] if portfolio else ''
+        btc_value_usd = round(btc_balance * current_price, 2) if portfolio else ''
+        get_position_ledger().record_buy(result.btc_delta, -result.usdt_delta, result.commission_usd,
+                                         result.timestamp_text())
+
         trade_record = {
-            'timestamp': trade_time,
+            'timestamp': result.timestamp_text(),
             'type': 'BUY',
             'trade_type': trade_type,
-            'price': current_price,
-            'quantity': approx_quantity,  # Use approx for log; fetch actual from order if needed
-            'amount_usd': amount_usd,
+            'price': result.avg_price,  # average fill price
+            'quantity': result.executed_qty,
+            'amount_usd': result.quote_qty,
+            'net_quantity': abs(result.btc_delta),      # BTC received after commission
+            'net_amount_usd': abs(result.usdt_delta),   # USDT spent incl. commission
+            'fee_usd': result.commission_usd,
             'btc_balance': btc_balance,
             'btc_value_usd': btc_value_usd,
             'profit_loss_usd': ''  # Not applicable for buy , only when selling
         }
         await log_trade(trade_record)
-        print(f"[OK] Buy executed: approx {approx_quantity:.6f} BTC at ${current_price:,.2f} ({trade_type}) for ${amount_usd}")
+        print(f"[OK] Buy executed: {result.executed_qty:.8f} BTC at avg ${result.avg_price:,.2f} ({trade_type}) "
+              f"for ${result.quote_qty:,.2f}, commission {result.commissions}")
         return trade_record
+    except OrderRejected as e:
+        print(f"[ERROR] Buy not sent: {e}")
+        return None
     except Exception as e:
         print(f"[ERROR] Buy failed: {e}")
         return None
 
 async def execute_sell(client, quantity, current_price, trade_type="SELL"):
     try:
-        quantity = round(quantity, 6)
-        if quantity < 0.0001:
-            print(f"[ERROR] Sell quantity {quantity} is below minimum lot size (0.0001 BTC)")
-            return None
-        quantity_str = format(quantity, 'f')
-        order = client.order_market_sell(symbol='BTCUSDT', quantity=quantity_str)
-        trade_time = datetime.now().strftime('%d-%m-%Y %I:%M:%S %p')
-        portfolio = get_portfolio(client)
-        btc_balance = portfolio['btc']
-        btc_value_usd = round(btc_balance * current_price, 2)
-        # Calculate profit/loss compared to previous BTC VALUE USD
-        prev_btc_value_usd = None
-        try:
-            df = pd.read_csv('../data/trade_log.csv')
-            last_trade = df[df['btc_value_usd'].notnull() & (df['btc_value_usd'] != '')].iloc[-1] if not df[df['btc_value_usd'].notnull() & (df['btc_value_usd'] != '')].empty else None
-            if last_trade is not None:
-                prev_btc_value_usd = float(last_trade['btc_value_usd'])
-        except Exception:
-            prev_btc_value_usd = None
-        profit_loss_usd = ''
-        if prev_btc_value_usd is not None:
-            profit_loss_usd = round(btc_value_usd - prev_btc_value_usd, 2)
+        # Quantity floored to the LOT_SIZE step and checked (minQty, minNotional) before sending
+        order = await _async_executor(client).market_sell(SYMBOL, quantity, current_price)
+        result = ExecutionResult.from_order(order)
+        portfolio = get_ledger(client).apply(result)  # local ledger, reconciled periodically
+        btc_balance = portfolio['btc'] if portfolio else ''
+        btc_value_usd = round(btc_balance * current_price, 2) if portfolio else ''
+        # Realized profit/loss of this sale against the cost of the lots it closes (no trade log re-read)
+        position_ledger = get_position_ledger()
+        profit_loss_usd = round(position_ledger.record_sell(-result.btc_delta, result.usdt_delta,
+                                                            result.commission_usd, result.timestamp_text()), 2)
         trade_record = {
-            'timestamp': trade_time,
+            'timestamp': result.timestamp_text(),
             'type': 'SELL',
             'trade_type': trade_type,
-            'price': current_price,
-            'quantity': quantity,
-            'amount_usd': quantity * current_price,
+            'price': result.avg_price,  # average fill price
+            'quantity': result.executed_qty,
+            'amount_usd': result.quote_qty,
+            'net_quantity': abs(result.btc_delta),      # BTC leaving the account incl. commission
+            'net_amount_usd': abs(result.usdt_delta),   # USDT received after commission
+            'fee_usd': result.commission_usd,
             'btc_balance': btc_balance,
             'btc_value_usd': btc_value_usd,
             'profit_loss_usd': profit_loss_usd
         }
         await log_trade(trade_record)
-        print(f"[OK] Sell executed: {quantity_str} BTC at ${current_price:,.2f} ({trade_type})")
+        print(f"[OK] Sell executed: {result.executed_qty:.8f} BTC at avg ${result.avg_price:,.2f} ({trade_type}) "
+              f"for ${result.quote_qty:,.2f}, commission {result.commissions}, realized P&L ${profit_loss_usd:,.2f} "
+              f"(total ${position_ledger.realized_pnl:,.2f})")
         return trade_record
+    except OrderRejected as e:
+        print(f"[ERROR] Sell not sent: {e}")
+        return None
     except Exception as e:
         print(f"[ERROR] Sell failed: {e}")
         return None
@@ -1003,7 +1199,8 @@ if __name__ == "__main__":
     async def main():
         try:
             client = initialize_binance_client()
-            portfolio = get_portfolio(client)
+            await start_user_data_stream(client)  # balances pushed by the exchange from here on
+            portfolio = get_live_portfolio(client)
             print(f"[TEST] Initial Portfolio: {portfolio['btc']:.6f} BTC, ${portfolio['usdt']:,.2f} USDT")
             ticker = client.get_symbol_ticker(symbol='BTCUSDT')
             current_price = float(ticker['price'])
@@ -1024,7 +1221,7 @@ if __name__ == "__main__":
             else:
                 print("[TEST] Insufficient USDT balance for test buy")
             
-            portfolio = get_portfolio(client)
+            portfolio = get_live_portfolio(client)
             print(f"[TEST] Portfolio after buy: {portfolio['btc']:.6f} BTC, ${portfolio['usdt']:,.2f} USDT")
             
             # Perform a test sell trade (sell 0.01 BTC if available)
@@ -1037,8 +1234,11 @@ if __name__ == "__main__":
             else:
                 print("[TEST] Insufficient BTC balance for test sell")
             
-            portfolio = get_portfolio(client)
+            portfolio = get_live_portfolio(client)
             print(f"[TEST] Portfolio after sell: {portfolio['btc']:.6f} BTC, ${portfolio['usdt']:,.2f} USDT")
         except Exception as e:
             print(f"[TEST ERROR] {e}")
+        finally:
+            await stop_user_data_stream()
+            await close_async_executors()
     asyncio.run(main())
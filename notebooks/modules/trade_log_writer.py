@@ -0,0 +1,194 @@
+"""
+Trade Log Writer for Bitcoin Trading Agent
+
+Purpose: Append-only, buffered sink for backtest / live trade logs. Rows are collected in memory
+and written in batches, so a run with thousands of bars does not rewrite the whole log every bar.
+
+- CSV: rows are appended to the file on every flush (header written once). Each flush is a single
+  write + fsync, so the file on disk always ends on a complete row, even after a hard kill.
+- Parquet: each flush becomes one row group; the file is written to '<path>.partial' and renamed
+  to <path> when the writer is closed, so readers never see a file without its footer.
+  The schema is fixed by the first flush: `column_types` ('float' / 'int' / 'string' / 'bool')
+  wins, otherwise the type is inferred, and a column that is empty in the first batch becomes a
+  nullable float64. Every later batch is coerced to that schema ('' / unparsable values -> null).
+- A flush happens when `flush_rows` rows are buffered or `flush_interval` seconds have passed.
+- close() is registered with atexit and called by the context manager, so exceptions and Ctrl-C
+  (KeyboardInterrupt) still leave a complete file behind.
+
+Usage:
+    with TradeLogWriter("backtest_trade_log.csv", columns=TRADE_LOG_COLUMNS) as writer:
+        writer.append(trade_record)
+
+Dependencies: pyarrow (only for Parquet output)
+"""
+
+import atexit
+import csv
+import math
+import os
+import time
+
+PARQUET_TYPES = ('float', 'int', 'string', 'bool')
+
+
+class TradeLogWriter:
+    def __init__(self, path, columns=None, fmt=None, flush_rows=50, flush_interval=5.0, overwrite=True,
+                 column_types=None):
+        """
+        path: output file; the format is taken from the extension unless fmt is given ('csv' / 'parquet')
+        columns: fixed column order; defaults to the keys of the first record
+        column_types: {column: 'float' | 'int' | 'string' | 'bool'} for the Parquet schema
+        flush_rows / flush_interval: flush when either limit is reached (None disables that trigger)
+        overwrite: start a new file instead of appending to an existing CSV
+        """
+        self.path = path
+        self.fmt = (fmt or os.path.splitext(path)[1].lstrip('.') or 'csv').lower()
+        if self.fmt not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported trade log format: {self.fmt}")
+        self.columns = list(columns) if columns else None
+        self.column_types = dict(column_types or {})
+        unknown = set(self.column_types.values()) - set(PARQUET_TYPES)
+        if unknown:
+            raise ValueError(f"Unsupported trade log column types: {sorted(unknown)}")
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self._warned_keys = set()
+        self._parquet_writer = None
+        self._parquet_schema = None
+
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        if self.fmt == 'csv':
+            self._needs_header = overwrite or not os.path.exists(path) or os.path.getsize(path) == 0
+            if overwrite and os.path.exists(path):
+                os.remove(path)
+        else:
+            self._partial_path = path + '.partial'
+            if os.path.exists(self._partial_path):
+                os.remove(self._partial_path)
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def append(self, record):
+        """Buffer one trade record (dict); flushes automatically when a limit is reached."""
+        if self._closed:
+            raise ValueError("TradeLogWriter is closed")
+        if self.columns is None:
+            self.columns = list(record.keys())
+        extra = set(record) - set(self.columns) - self._warned_keys
+        if extra:
+            print(f"[WARNING] Trade log columns not in header, dropped: {sorted(extra)}")
+            self._warned_keys |= extra
+        self._buffer.append([record.get(col) for col in self.columns])
+
+        if self.flush_rows and len(self._buffer) >= self.flush_rows:
+            self.flush()
+        elif self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows to disk."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        if self.fmt == 'csv':
+            self._flush_csv(rows)
+        else:
+            self._flush_parquet(rows)
+        self.rows_written += len(rows)
+
+    def _flush_csv(self, rows):
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if self._needs_header:
+                writer.writerow(self.columns)
+                self._needs_header = False
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _flush_parquet(self, rows):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet trade logs require pyarrow (pip install pyarrow)") from e
+
+        data = {col: [row[i] for row in rows] for i, col in enumerate(self.columns)}
+        if self._parquet_writer is None:
+            self._parquet_schema = pa.schema([pa.field(col, self._arrow_type(pa, col, data[col]))
+                                              for col in self.columns])
+            self._parquet_writer = pq.ParquetWriter(self._partial_path, self._parquet_schema)
+        arrays = []
+        for field in self._parquet_schema:
+            values, dropped = _coerce(data[field.name], field.type, pa)
+            if dropped and field.name not in self._warned_keys:
+                print(f"[WARNING] Trade log column '{field.name}' is {field.type}, dropped non-numeric value(s) "
+                      f"such as {dropped[0]!r} (declare it in column_types)")
+                self._warned_keys.add(field.name)
+            arrays.append(pa.array(values, type=field.type))
+        self._parquet_writer.write_table(pa.Table.from_arrays(arrays, schema=self._parquet_schema))
+
+    def _arrow_type(self, pa, column, values):
+        """Declared type, else the type inferred from the first batch (null / int -> float64)."""
+        declared = self.column_types.get(column)
+        if declared:
+            return {'float': pa.float64(), 'int': pa.int64(), 'string': pa.string(), 'bool': pa.bool_()}[declared]
+        present = [value for value in values if value is not None and value != '']
+        if not present:
+            return pa.float64()
+        try:
+            inferred = pa.array(present).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pa.string()
+        if pa.types.is_integer(inferred) or pa.types.is_floating(inferred):
+            return pa.float64()  # later fractional amounts must still fit
+        if pa.types.is_boolean(inferred):
+            return pa.bool_()
+        return pa.string()
+
+    def close(self):
+        """Flush remaining rows and finalize the file. Safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        try:
+            self.flush()
+        finally:
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+                os.replace(self._partial_path, self.path)
+
+
+def _coerce(values, arrow_type, pa):
+    """(values converted to the column type, unparsable values); None / '' / NaN / unparsable -> null."""
+    result = []
+    dropped = []
+    for value in values:
+        if value is None or value == '' or (isinstance(value, float) and math.isnan(value)):
+            result.append(None)
+        elif pa.types.is_string(arrow_type):
+            result.append(str(value))
+        elif pa.types.is_boolean(arrow_type):
+            result.append(value if isinstance(value, bool) else str(value).strip().lower() in ('true', '1', 'yes'))
+        else:
+            try:
+                number = float(value)
+                result.append(int(number) if pa.types.is_integer(arrow_type) else number)
+            except (TypeError, ValueError):
+                result.append(None)
+                dropped.append(value)
+    return result, dropped
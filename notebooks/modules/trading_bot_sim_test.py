@@ -3641,12 +3641,22 @@
 # ---------------------------------------------- Treshold Fix ------------------------------------------------------------------------------------
 import os
 import sys
+import copy
 import asyncio
 import pandas as pd
 from datetime import datetime, timedelta
-import ta
 import json
-from llm_decision_strategy_05 import get_llm_decision
+from llm_decision_strategy_05 import (get_llm_decision, get_llm_batch_decisions, set_decision_cache, set_regime_cache,
+                                      set_llm_hedger, create_llm_hedger)
+from llm_decision_cache import DecisionCache, DecisionCacheMiss
+from decision_protocol import set_fee_rate
+from decision_gate import DecisionGate
+from regime_cache import RegimeCache
+from decision_scheduler import DecisionScheduler, rule_based_decision, answer_early
+from indicator_engine import compute_indicator_table, indicators_at, calculate_slice_indicators, verify_no_lookahead, IncrementalIndicators
+from trade_log_writer import TradeLogWriter
+from ohlcv_store import is_store, load_ohlcv_frame
+from market_snapshot import MarketSnapshot
 from pprint import pprint
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -3700,6 +3710,45 @@ def plot_trade_log(trade_log_path="backtest_trade_log.csv"):
 
 TRADE_INTERVAL_HOURS = 1
 TRADE_DURATION = "1 week"
+# "precomputed": indicators computed once over the whole frame and read by bar index (O(n))
+# "streaming": indicators updated bar by bar with IncrementalIndicators (same engine as the live loop)
+# "rolling": indicators recomputed over the full history at every bar (original O(n^2) path)
+INDICATOR_MODE = "precomputed"
+# Trade log rows are buffered and appended; flushed every N rows or every N seconds
+TRADE_LOG_FLUSH_ROWS = 50
+TRADE_LOG_FLUSH_SECONDS = 5.0
+TRADE_LOG_COLUMNS = [
+    'Timestamp', 'Type', 'Open', 'Close', 'Quantity', 'Buy USD Amount', 'Value USD (Cost)',
+    'BTC BALANCE', 'BTC VALUE USD', 'Total Portfolio Value', 'USD BALANCE', 'USD PROFIT',
+    'PROFIT THRESHOLD', 'Profit Extract Amount',
+]
+# Parquet column types (amounts stay float even when the first rows leave them empty)
+TRADE_LOG_COLUMN_TYPES = {col: 'float' for col in TRADE_LOG_COLUMNS}
+TRADE_LOG_COLUMN_TYPES.update({'Timestamp': 'string', 'Type': 'string'})
+# LLM decision cache: "off", "record", "replay" or "record-missing" (see llm_decision_cache.py)
+LLM_CACHE_MODE = "record-missing"
+LLM_CACHE_PATH = "llm_decision_cache.jsonl"
+# Skip the LLM and reuse the last HOLD while price / RSI / MACD / portfolio barely move (see decision_gate.py)
+DECISION_GATE_ENABLED = True
+# Approximate cache keyed on quantized market regimes (see regime_cache.py). Off by default: hits are
+# decisions made for a similar, not identical, state, so results differ from an uncached run.
+REGIME_CACHE_ENABLED = False
+REGIME_CACHE_TTL_HOURS = 6
+REGIME_CACHE_MAX_ENTRIES = 5000
+# Hard deadline per LLM decision; past it the DCA / ATR stop-loss / drawdown rules decide (see
+# decision_scheduler.py) and the late answer goes to LATE_DECISIONS_PATH. None waits indefinitely.
+LLM_DEADLINE_SECONDS = 20
+LATE_DECISIONS_PATH = "late_llm_decisions.jsonl"
+# Hedged requests: also ask LLM_SECONDARY_MODEL (llm_decision_strategy_05) when the primary model has
+# no valid answer after LLM_HEDGE_DELAY_SECONDS; p50/p95/p99 latency per model is printed at the end
+LLM_HEDGE_ENABLED = False
+# Batched research mode: one LLM request decides the next LLM_BATCH_BARS bars (1 = one request per bar).
+# Decisions are replayed through apply_decision(); after the first bar whose decision changes the
+# balances, the rest of the batch is dropped and the next bar is re-queried with the new portfolio.
+# The model sees the later bars of a batch, so use it for research runs only. Needs "precomputed" indicators.
+LLM_BATCH_BARS = 1
+# Memory-mapped OHLCV store (see ohlcv_store.py); used instead of the merged Excel/CSV file when it exists
+OHLCV_STORE_PATH = os.path.join('..', 'data', 'btc_1h_store')
 
 def parse_duration(duration_str):
     duration_str = duration_str.lower().strip()
@@ -3734,72 +3783,180 @@ def load_config():
     print(f"Fetched Config : {config}")
     return config
 
+def release_active_trades(active_trades, quantity):
+    """Remove `quantity` BTC from the open positions, oldest first (used by the ATR stop-loss fallback)."""
+    while active_trades and quantity > 1e-12:
+        trade = active_trades[0]
+        if trade['quantity'] <= quantity:
+            quantity -= trade['quantity']
+            active_trades.pop(0)
+        else:
+            trade['quantity'] -= quantity
+            quantity = 0
+
 def generate_md_report(current_date, row, indicators, portfolio, current_price, profit_threshold):
-    md_content = f"""
-# Complete Bitcoin Data Collection Report
-
-## Yahoo Finance Data
-
-| Date | Open | High | Low | Close | Volume |
-|------|------|------|-----|-------|--------|
-| {current_date.strftime('%Y-%m-%d %H:%M:%S')} | ${row['open']:,.2f} | ${row['high']:,.2f} | ${row['low']:,.2f} | ${row['close']:,.2f} | {row['volume']:,.0f} |
-
-### Technical Indicators (Current Values)
-
-- **ATR (14)**: ${indicators['atr_14'] if indicators['atr_14'] is not None else 'N/A'}
-- **RSI (14)**: {indicators['rsi_14'] if indicators['rsi_14'] is not None else 'N/A'}
-- **SMA 20**: ${indicators['sma_20'] if indicators['sma_20'] is not None else 'N/A'}
-- **SMA 50**: ${indicators['sma_50'] if indicators['sma_50'] is not None else 'N/A'}
-- **EMA 12**: ${indicators['ema_12'] if indicators['ema_12'] is not None else 'N/A'}
-- **EMA 26**: ${indicators['ema_26'] if indicators['ema_26'] is not None else 'N/A'}
-- **Bollinger Upper (20)**: ${indicators['bb_upper'] if indicators['bb_upper'] is not None else 'N/A'}
-- **Bollinger Middle (20)**: ${indicators['bb_middle'] if indicators['bb_middle'] is not None else 'N/A'}
-- **Bollinger Lower (20)**: ${indicators['bb_lower'] if indicators['bb_lower'] is not None else 'N/A'}
-- **MACD**: {indicators['macd'] if indicators['macd'] is not None else 'N/A'}
-- **MACD Signal**: {indicators['macd_signal'] if indicators['macd_signal'] is not None else 'N/A'}
-- **Volume SMA 20**: {indicators['volume_sma_20'] if indicators['volume_sma_20'] is not None else 'N/A'}
-- **ATR Volatility Ratio**: {indicators['atr_volatility_ratio'] if indicators['atr_volatility_ratio'] is not None else 'N/A'}
-
-## Portfolio Status
-
-- BTC: {portfolio['btc']}
-- USDT: {portfolio['usdt']}
-- USD PROFIT: {portfolio['usd_profit']}
-- Portfolio Value: {portfolio['btc'] * current_price + portfolio['usdt']}
-- PROFIT THRESHOLD: {profit_threshold}
-"""
-    return md_content
+    """Human-readable report for one bar (not used in the backtest loop, which passes MarketSnapshot objects)."""
+    snapshot = MarketSnapshot.from_row(row, indicators, timestamp=current_date)
+    return snapshot.to_markdown(portfolio, profit_threshold)
+
+def apply_decision(decision, row, portfolio, profit_threshold, active_trades, trade_log, trade_log_writer, indicators):
+    """
+    Local portfolio simulator: apply one decision to the portfolio at this bar's close (fees,
+    balance checks, PROFIT extraction) and log the trade record(s).
+    Returns True if the BTC / USDT / USD PROFIT balances changed.
+    """
+    current_date = row['date']
+    current_price = row['close']
+    balances_before = (portfolio['btc'], portfolio['usdt'], portfolio['usd_profit'])
+    action = decision.get('action', 'None')
+    buy_amount = decision.get('buy_amount', 0)
+    quantity = decision.get('quantity', 0)
+    profit_amount = decision.get('profit_amount', 0)
+
+    value_usd_cost = 0
+    fee = 0
+    reason = None
+
+    # --- Portfolio management ---
+    if action == 'BUY':
+        value_usd_cost = buy_amount
+        fee = value_usd_cost * BINANCE_FEE_RATE
+        total_cost = value_usd_cost + fee
+        if buy_amount <= 0:
+            reason = "LLM suggested BUY with zero or negative USD amount"
+        elif portfolio['usdt'] < total_cost:
+            reason = f"Insufficient USD balance for BUY (needed ${total_cost:.2f}, available ${portfolio['usdt']:.2f})"
+        else:
+            btc_bought = buy_amount / current_price
+            portfolio['usdt'] -= total_cost
+            portfolio['btc'] += btc_bought
+            quantity = btc_bought  # For logging
+            active_trades.append({'entry_price': current_price, 'quantity': btc_bought,
+                                  'atr': indicators.get('atr_14') or 0})
+    elif action == 'SELL':
+        value_usd_cost = quantity * current_price
+        fee = value_usd_cost * BINANCE_FEE_RATE
+        net_usd = value_usd_cost - fee
+        if quantity <= 0:
+            reason = "LLM suggested SELL with zero or negative quantity"
+        elif portfolio['btc'] < quantity:
+            reason = f"Insufficient BTC balance for SELL (needed {quantity:.6f}, available {portfolio['btc']:.6f})"
+        else:
+            portfolio['btc'] -= quantity
+            release_active_trades(active_trades, quantity)
+            portfolio['usdt'] += net_usd
+    elif action == 'PROFIT':
+        if profit_amount <= 0:
+            reason = "LLM suggested PROFIT with zero or negative amount"
+        else:
+            btc_to_sell = profit_amount / current_price
+            if portfolio['btc'] < btc_to_sell:
+                reason = f"Insufficient BTC to SELL for PROFIT extraction (needed {btc_to_sell:.6f}, available {portfolio['btc']:.6f})"
+            else:
+                # SELL BTC for profit_amount USD
+                portfolio['btc'] -= btc_to_sell
+                release_active_trades(active_trades, btc_to_sell)
+                portfolio['usdt'] += profit_amount
+                # Log SELL action
+                sell_record = {
+                    'Timestamp': current_date.strftime('%Y-%m-%d %H:%M:%S'),
+                    'Type': 'SELL (for PROFIT)',
+                    'Open': row['open'],
+                    'Close': row['close'],
+                    'Quantity': btc_to_sell,
+                    'Value USD (Cost)': profit_amount,
+                    'BTC BALANCE': portfolio['btc'],
+                    'BTC VALUE USD': portfolio['btc'] * current_price,
+                    'Total Portfolio Value': portfolio['btc'] * current_price + portfolio['usdt'],
+                    'USD BALANCE': portfolio['usdt'],
+                    'USD PROFIT': portfolio['usd_profit'],
+                    'PROFIT THRESHOLD': profit_threshold,
+                }
+                trade_log.append(sell_record)
+                trade_log_writer.append(sell_record)
+                # Move USD to USD PROFIT
+                portfolio['usdt'] -= profit_amount
+                portfolio['usd_profit'] += profit_amount
+                #profit_threshold += profit_amount       # --- commented out so profit threshold does not increase with each profit extraction ---
+                value_usd_cost = profit_amount
+    elif action == 'HOLD':
+        pass
+        # consecutive_hold_count += 1
+        # # Only update threshold if 5 consecutive HOLDs
+        # if consecutive_hold_count >= 5 and len(trade_log) >= 10:
+        #     # last_10_values = [t['Total Portfolio Value'] for t in trade_log[-10:]]
+        #     #profit_threshold = sum(last_10_values) / len(last_10_values)
+        #     profit_threshold =  initial_budget
+        #     #print(f"[THRESHOLD RESET] Updated profit threshold to last 10 trades average: {profit_threshold:.2f}")
+        #     print(f"[THRESHOLD RESET] Updated profit threshold to initial budget: {profit_threshold:.2f}")
+        
+        #     consecutive_hold_count = 0
+    else:
+        buy_amount = 0
+        quantity = 0
+        value_usd_cost = 0
+        fee = 0
+
+    if reason:
+        action = f"Overwrite LLM Decision to HOLD: {reason}"
+        buy_amount = 0
+        quantity = 0
+        value_usd_cost = 0
+        fee = 0
+
+    btc_value_usd = portfolio['btc'] * current_price
+    total_portfolio_value = btc_value_usd + portfolio['usdt']
+
+    trade_record = {
+        'Timestamp': current_date.strftime('%Y-%m-%d %H:%M:%S'),
+        'Type': action if action != 'PROFIT' else 'PROFIT',
+        'Open': row['open'],
+        'Close': row['close'],
+        'Quantity': quantity if action != 'PROFIT' else 0,
+        'Buy USD Amount': buy_amount if action == 'BUY' else 0,
+        'Value USD (Cost)': value_usd_cost,
+        'BTC BALANCE': portfolio['btc'],
+        'BTC VALUE USD': btc_value_usd,
+        'Total Portfolio Value': total_portfolio_value,
+        'USD BALANCE': portfolio['usdt'],
+        'USD PROFIT': portfolio['usd_profit'],
+        'PROFIT THRESHOLD': profit_threshold,
+        'Profit Extract Amount': profit_amount if action == 'PROFIT' else 0  # <-- Added column
+    }
+    trade_log.append(trade_record)
+    trade_log_writer.append(trade_record)
+    return (portfolio['btc'], portfolio['usdt'], portfolio['usd_profit']) != balances_before
 
 async def run_backtest():
-    data_file = 'btc_hourly_yahoo_binance_6mo.csv'
+    data_file = OHLCV_STORE_PATH
+    if not is_store(data_file):
+        data_file = 'btc_hourly_yahoo_binance_6mo.csv'
     if not os.path.exists(data_file):
         data_file = 'btc_hourly_yahoo_binance_6mo.xlsx'
     if not os.path.exists(data_file):
         print(f"ERROR: Data file '{data_file}' not found!")
         return
 
-    if data_file.endswith('.csv'):
-        df = pd.read_csv(data_file)
-    else:
-        df = pd.read_excel(data_file)
-    df['date'] = pd.to_datetime(df['date'])
-    df.sort_values('date', inplace=True)
+    # Store columns are memory-mapped; Excel/CSV is parsed once into a Parquet cache
+    df = load_ohlcv_frame(data_file)
 
     print(f"[INFO] Data range: {df['date'].min().strftime('%Y-%m-%d %H:%M:%S')} to {df['date'].max().strftime('%Y-%m-%d %H:%M:%S')}")
 
-    df['close'] = df['binance_close'].fillna(df['yahoo_close'])
-    df['open'] = df['binance_open'].fillna(df['yahoo_open'])
-    df['high'] = df['binance_high'].fillna(df['yahoo_high'])
-    df['low'] = df['binance_low'].fillna(df['yahoo_low'])
-    df['volume'] = df['binance_volume'].fillna(df['yahoo_volume'])
-
     config = load_config()
     initial_budget = config.get('budget', 10000)
     portfolio = {'btc': 0.0, 'usdt': initial_budget, 'usd_profit': 0.0}
     trade_log = []
     trade_log_path = "backtest_trade_log.csv"
-    if os.path.exists(trade_log_path):
-        os.remove(trade_log_path)
+    decision_cache = DecisionCache(LLM_CACHE_PATH, mode=LLM_CACHE_MODE)
+    set_decision_cache(decision_cache)
+    decision_gate = DecisionGate(enabled=DECISION_GATE_ENABLED)
+    regime_cache = RegimeCache(REGIME_CACHE_TTL_HOURS * 3600, REGIME_CACHE_MAX_ENTRIES) if REGIME_CACHE_ENABLED else None
+    set_regime_cache(regime_cache)
+    scheduler = DecisionScheduler(LLM_DEADLINE_SECONDS, LATE_DECISIONS_PATH, reraise=(DecisionCacheMiss,))
+    active_trades = []  # open BUY positions, for the ATR stop-loss rule in the fallback
+    hedger = create_llm_hedger() if LLM_HEDGE_ENABLED else None
+    set_llm_hedger(hedger)
+    set_fee_rate(BINANCE_FEE_RATE)  # validate BUY amounts with the fee apply_decision charges
 
     subsample = TRADE_INTERVAL_HOURS
     start_date = df['date'].min()
@@ -3812,179 +3969,126 @@ async def run_backtest():
         print(f"[ERROR] No data found for the selected period!")
         return
 
+    df_test = df_test.reset_index(drop=True)
+    if INDICATOR_MODE == "precomputed":
+        # Vectorized over the whole frame once; row i only uses bars 0..i (see indicator_engine)
+        indicator_table = compute_indicator_table(df_test)
+        checked = verify_no_lookahead(df_test, indicator_table)
+        print(f"[INFO] Precomputed indicators for {len(df_test)} bars (lookahead check passed on {checked} bars)")
+    elif INDICATOR_MODE == "streaming":
+        indicator_engine = IncrementalIndicators()
+        bars_fed = 0
+
     df_subsampled = df_test.iloc[::subsample, :].reset_index(drop=True)
     print(f"[INFO] Running backtest on {len(df_subsampled)} data points (interval: {subsample}h, period: {TRADE_DURATION})")
 
     profit_threshold = initial_budget
-    consecutive_hold_count = 0
-
-    for i, row in df_subsampled.iterrows():
-        if pd.isna(row['close']):
-            continue
-        current_date = row['date']
-        current_price = row['close']
-
-        df_slice = df_test[df_test['date'] <= current_date].copy()
-        min_window = 14
-        if len(df_slice) < min_window:
-            indicators = {
-                'atr_14': None,
-                'rsi_14': None,
-                'sma_20': None,
-                'sma_50': None,
-                'ema_12': None,
-                'ema_26': None,
-                'bb_upper': None,
-                'bb_middle': None,
-                'bb_lower': None,
-                'macd': None,
-                'macd_signal': None,
-                'volume_sma_20': None,
-                'atr_volatility_ratio': None
-            }
-        else:
-            indicators = {
-                'atr_14': ta.volatility.AverageTrueRange(df_slice['high'], df_slice['low'], df_slice['close'], window=14).average_true_range().iloc[-1],
-                'rsi_14': ta.momentum.RSIIndicator(df_slice['close'], window=14).rsi().iloc[-1],
-                'sma_20': ta.trend.sma_indicator(df_slice['close'], window=20).iloc[-1],
-                'sma_50': ta.trend.sma_indicator(df_slice['close'], window=50).iloc[-1],
-                'ema_12': ta.trend.ema_indicator(df_slice['close'], window=12).iloc[-1],
-                'ema_26': ta.trend.ema_indicator(df_slice['close'], window=26).iloc[-1],
-                'bb_upper': ta.volatility.BollingerBands(df_slice['close'], window=20, window_dev=2).bollinger_hband().iloc[-1],
-                'bb_middle': ta.volatility.BollingerBands(df_slice['close'], window=20, window_dev=2).bollinger_mavg().iloc[-1],
-                'bb_lower': ta.volatility.BollingerBands(df_slice['close'], window=20, window_dev=2).bollinger_lband().iloc[-1],
-                'macd': ta.trend.MACD(df_slice['close']).macd().iloc[-1],
-                'macd_signal': ta.trend.MACD(df_slice['close']).macd_signal().iloc[-1],
-                'volume_sma_20': ta.trend.sma_indicator(df_slice['volume'], window=20).iloc[-1],
-                'atr_volatility_ratio': (ta.volatility.AverageTrueRange(df_slice['high'], df_slice['low'], df_slice['close'], window=14).average_true_range().iloc[-1] / df_slice['close'].iloc[-1])
+    batch_mode = LLM_BATCH_BARS > 1 and INDICATOR_MODE == "precomputed"
+    if LLM_BATCH_BARS > 1 and not batch_mode:
+        print("[WARNING] LLM_BATCH_BARS needs INDICATOR_MODE='precomputed', running one request per bar")
+    pending_decisions = {}  # bar index -> decision from the last batched request
+    batch_last_bar = -1     # last bar index covered by that request
+    batch_stats = {'requests': 0, 'errors': 0, 'bars_decided': 0, 'dropped': 0, 'single_calls': 0}
+
+    def request_batch(first):
+        """Batched decisions for bars first..last with the current portfolio; returns (decisions, last)."""
+        contexts, bars = [], []
+        last = min(first + LLM_BATCH_BARS, len(df_subsampled)) - 1
+        for j in range(first, last + 1):
+            bar = df_subsampled.iloc[j]
+            if pd.isna(bar['close']):
+                continue
+            bar_snapshot = MarketSnapshot.from_row(bar, indicators_at(indicator_table, j * subsample))
+            contexts.append({
+                'market_data': bar_snapshot.as_context(),
+                'portfolio': dict(portfolio),
+                'portfolio_value': portfolio['btc'] * bar['close'] + portfolio['usdt'],
+                'profit_threshold': profit_threshold,
+                'trade_history': trade_log[-10:]
+            })
+            bars.append(j)
+        batch_stats['requests'] += 1
+        try:
+            decisions = get_llm_batch_decisions(contexts)
+        except DecisionCacheMiss:
+            raise
+        except Exception as e:
+            # API error after the client's retries: these bars fall back to single calls / the scheduler
+            batch_stats['errors'] += 1
+            print(f"[WARNING] Batched LLM request failed ({type(e).__name__}: {e}), deciding bars one by one")
+            return {}, last
+        return {j: decision for j, decision in zip(bars, decisions) if decision is not None}, last
+
+    trade_log_writer = TradeLogWriter(trade_log_path, columns=TRADE_LOG_COLUMNS, column_types=TRADE_LOG_COLUMN_TYPES,
+                                      flush_rows=TRADE_LOG_FLUSH_ROWS, flush_interval=TRADE_LOG_FLUSH_SECONDS)
+    try:
+        for i, row in df_subsampled.iterrows():
+            if pd.isna(row['close']):
+                continue
+            current_date = row['date']
+            current_price = row['close']
+
+            if INDICATOR_MODE == "precomputed":
+                indicators = indicators_at(indicator_table, i * subsample)
+            elif INDICATOR_MODE == "streaming":
+                # Feed every bar up to this one, including bars skipped by subsampling
+                while bars_fed <= i * subsample:
+                    indicators = indicator_engine.update_row(df_test.iloc[bars_fed])
+                    bars_fed += 1
+            else:
+                df_slice = df_test[df_test['date'] <= current_date].copy()
+                indicators = calculate_slice_indicators(df_slice)
+
+            # Numbers go to the LLM context as-is; markdown is only rendered on demand (generate_md_report)
+            snapshot = MarketSnapshot.from_row(row, indicators, timestamp=current_date)
+            context = {
+                'market_data': snapshot.as_context(),
+                'portfolio': portfolio,
+                'portfolio_value': portfolio['btc'] * current_price + portfolio['usdt'],
+                'profit_threshold': profit_threshold,
+                'trade_history': trade_log[-10:]
             }
 
-        md_content = generate_md_report(current_date, row, indicators, portfolio, current_price, profit_threshold)
-        context = {
-            'md_content': md_content,
-            'portfolio': portfolio,
-            'profit_threshold': profit_threshold,
-            'trade_history': trade_log[-10:]
-        }
-
-        decision = get_llm_decision(context)
-        pprint(f"LLM Decision : {decision}")
-        action = decision.get('action', 'None')
-        buy_amount = decision.get('buy_amount', 0)
-        quantity = decision.get('quantity', 0)
-        profit_amount = decision.get('profit_amount', 0)
-
-        value_usd_cost = 0
-        fee = 0
-        reason = None
-
-        # --- Portfolio management ---
-        if action == 'BUY':
-            consecutive_hold_count = 0
-            value_usd_cost = buy_amount
-            fee = value_usd_cost * BINANCE_FEE_RATE
-            total_cost = value_usd_cost + fee
-            if buy_amount <= 0:
-                reason = "LLM suggested BUY with zero or negative USD amount"
-            elif portfolio['usdt'] < total_cost:
-                reason = f"Insufficient USD balance for BUY (needed ${total_cost:.2f}, available ${portfolio['usdt']:.2f})"
-            else:
-                btc_bought = buy_amount / current_price
-                portfolio['usdt'] -= total_cost
-                portfolio['btc'] += btc_bought
-                quantity = btc_bought  # For logging
-        elif action == 'SELL':
-            consecutive_hold_count = 0
-            value_usd_cost = quantity * current_price
-            fee = value_usd_cost * BINANCE_FEE_RATE
-            net_usd = value_usd_cost - fee
-            if quantity <= 0:
-                reason = "LLM suggested SELL with zero or negative quantity"
-            elif portfolio['btc'] < quantity:
-                reason = f"Insufficient BTC balance for SELL (needed {quantity:.6f}, available {portfolio['btc']:.6f})"
-            else:
-                portfolio['btc'] -= quantity
-                portfolio['usdt'] += net_usd
-        elif action == 'PROFIT':
-            consecutive_hold_count = 0
-            if profit_amount <= 0:
-                reason = "LLM suggested PROFIT with zero or negative amount"
-            else:
-                btc_to_sell = profit_amount / current_price
-                if portfolio['btc'] < btc_to_sell:
-                    reason = f"Insufficient BTC to SELL for PROFIT extraction (needed {btc_to_sell:.6f}, available {portfolio['btc']:.6f})"
+            decision = None
+            if batch_mode:
+                if i > batch_last_bar:
+                    pending_decisions, batch_last_bar = request_batch(i)
+                decision = pending_decisions.pop(i, None)
+                if decision is not None:
+                    batch_stats['bars_decided'] += 1
                 else:
-                    # SELL BTC for profit_amount USD
-                    portfolio['btc'] -= btc_to_sell
-                    portfolio['usdt'] += profit_amount
-                    # Log SELL action
-                    sell_record = {
-                        'Timestamp': current_date.strftime('%Y-%m-%d %H:%M:%S'),
-                        'Type': 'SELL (for PROFIT)',
-                        'Open': row['open'],
-                        'Close': row['close'],
-                        'Quantity': btc_to_sell,
-                        'Value USD (Cost)': profit_amount,
-                        'BTC BALANCE': portfolio['btc'],
-                        'BTC VALUE USD': portfolio['btc'] * current_price,
-                        'Total Portfolio Value': portfolio['btc'] * current_price + portfolio['usdt'],
-                        'USD BALANCE': portfolio['usdt'],
-                        'USD PROFIT': portfolio['usd_profit'],
-                        'PROFIT THRESHOLD': profit_threshold,
-                    }
-                    trade_log.append(sell_record)
-                    # Move USD to USD PROFIT
-                    portfolio['usdt'] -= profit_amount
-                    portfolio['usd_profit'] += profit_amount
-                    #profit_threshold += profit_amount       # --- commented out so profit threshold does not increase with each profit extraction ---
-                    value_usd_cost = profit_amount
-        elif action == 'HOLD':
-            pass
-            # consecutive_hold_count += 1
-            # # Only update threshold if 5 consecutive HOLDs
-            # if consecutive_hold_count >= 5 and len(trade_log) >= 10:
-            #     # last_10_values = [t['Total Portfolio Value'] for t in trade_log[-10:]]
-            #     #profit_threshold = sum(last_10_values) / len(last_10_values)
-            #     profit_threshold =  initial_budget
-            #     #print(f"[THRESHOLD RESET] Updated profit threshold to last 10 trades average: {profit_threshold:.2f}")
-            #     print(f"[THRESHOLD RESET] Updated profit threshold to initial budget: {profit_threshold:.2f}")
-                
-            #     consecutive_hold_count = 0
-        else:
-            consecutive_hold_count = 0
-            buy_amount = 0
-            quantity = 0
-            value_usd_cost = 0
-            fee = 0
-
-        if reason:
-            action = f"Overwrite LLM Decision to HOLD: {reason}"
-            buy_amount = 0
-            quantity = 0
-            value_usd_cost = 0
-            fee = 0
-
-        btc_value_usd = portfolio['btc'] * current_price
-        total_portfolio_value = btc_value_usd + portfolio['usdt']
-
-        trade_record = {
-            'Timestamp': current_date.strftime('%Y-%m-%d %H:%M:%S'),
-            'Type': action if action != 'PROFIT' else 'PROFIT',
-            'Open': row['open'],
-            'Close': row['close'],
-            'Quantity': quantity if action != 'PROFIT' else 0,
-            'Buy USD Amount': buy_amount if action == 'BUY' else 0,
-            'Value USD (Cost)': value_usd_cost,
-            'BTC BALANCE': portfolio['btc'],
-            'BTC VALUE USD': btc_value_usd,
-            'Total Portfolio Value': total_portfolio_value,
-            'USD BALANCE': portfolio['usdt'],
-            'USD PROFIT': portfolio['usd_profit'],
-            'PROFIT THRESHOLD': profit_threshold,
-            'Profit Extract Amount': profit_amount if action == 'PROFIT' else 0  # <-- Added column
-        }
-        trade_log.append(trade_record)
-        pd.DataFrame(trade_log).to_csv(trade_log_path, index=False)
+                    batch_stats['single_calls'] += 1  # bar missing / invalid in the batch answer
+            if decision is None:
+                # The LLM call may outlive its deadline while the fallback trade mutates the portfolio:
+                # give it a frozen copy so its cache key and prompt describe this bar only
+                frozen_context = copy.deepcopy(context)
+                decision = decision_gate.decide(snapshot, portfolio, lambda: scheduler.decide(
+                    lambda: get_llm_decision(frozen_context, raise_errors=True, on_early_decision=answer_early),
+                    lambda: rule_based_decision(portfolio, active_trades, snapshot.as_latest_data(), config),
+                    cycle=current_date
+                ))
+            pprint(f"LLM Decision : {decision}")
+            balances_changed = apply_decision(decision, row, portfolio, profit_threshold, active_trades,
+                                              trade_log, trade_log_writer, indicators)
+            if balances_changed and pending_decisions:
+                # Remaining batched decisions assumed the old balances: re-query from the next bar
+                batch_stats['dropped'] += len(pending_decisions)
+                pending_decisions = {}
+            if balances_changed:
+                batch_last_bar = i
+    finally:
+        # Flush on normal exit, exceptions and Ctrl-C so the log on disk is always complete
+        trade_log_writer.close()
+        print(f"[INFO] LLM decision cache: {decision_cache.stats()}")
+        decision_gate.report()
+        print(f"[INFO] LLM deadline: {scheduler.stats()}")
+        scheduler.close()
+        if hedger is not None:
+            hedger.report()
+        if batch_mode:
+            print(f"[INFO] Batched LLM mode: {batch_stats}")
+        if regime_cache is not None:
+            print(f"[INFO] Regime cache: {regime_cache.stats()}")
 
 if __name__ == "__main__":
     print("Running in backtest mode...")
@@ -0,0 +1,232 @@
+"""
+User Data Stream for Bitcoin Trading Agent
+
+Purpose: Push-based balances and order states. Instead of polling get_account() for every cycle,
+a Binance user-data websocket keeps an in-memory AccountCache current, so cycle code reads its
+balances from memory without a network round-trip.
+
+- outboundAccountPosition: free / locked balance of every asset that changed
+- balanceUpdate: deposits / withdrawals / transfers (delta on the free balance)
+- executionReport: order state per orderId (status, executed and quote quantity, last fill,
+  commission); terminal orders are kept for the last ORDER_HISTORY orders
+- Listen key: created on connect, kept alive every KEEPALIVE_SECONDS (Binance expires it after
+  60 minutes), a new one is created on listenKeyExpired
+- Reconnects with exponential backoff; after every (re)connect the balances are re-read with one
+  REST snapshot, so events missed while disconnected leave no gap. Events older than the snapshot
+  are ignored; the cache is `stale` while the stream is down
+- Endpoints and the websocket connect function are injectable, so the stream can be run against a
+  local websocket stand-in
+
+Usage:
+    stream = user_data_stream_for(get_async_executor(client, testnet=True), testnet=True)
+    await stream.start()
+    stream.cache.portfolio()          # {'btc': ..., 'usdt': ...} from memory
+    await stream.stop()
+
+Dependencies: websockets (installed with python-binance)
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+import websockets
+
+LIVE_STREAM_URL = "wss://stream.binance.com:9443/ws/"
+TESTNET_STREAM_URL = "wss://stream.testnet.binance.vision/ws/"
+KEEPALIVE_SECONDS = 30 * 60
+RECV_TIMEOUT_SECONDS = 5 * 60       # no message at all for this long: treat the connection as dead
+INITIAL_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+ORDER_HISTORY = 500
+TERMINAL_ORDER_STATES = ('FILLED', 'CANCELED', 'REJECTED', 'EXPIRED', 'EXPIRED_IN_MATCH')
+
+
+class AccountCache:
+    def __init__(self, order_history=ORDER_HISTORY):
+        self.balances = {}            # asset -> {'free': float, 'locked': float}
+        self.orders = OrderedDict()   # orderId -> order state, oldest first
+        self.order_history = order_history
+        self.last_update_ms = 0       # event / snapshot time of the newest balance information
+        self.updated_at = None        # wall clock of the last change
+        self.stale = True
+        self.events = 0
+
+    # ------------------------------------------------------------------ snapshots / events
+    def apply_account_snapshot(self, account):
+        """Replace the balances with a REST get_account() response."""
+        self.balances = {b['asset']: {'free': float(b['free']), 'locked': float(b['locked'])}
+                         for b in account.get('balances', [])}
+        self.last_update_ms = int(account.get('updateTime') or time.time() * 1000)
+        self.updated_at = time.time()
+
+    def apply_event(self, event):
+        """Apply one user-data event; returns the event type."""
+        event_type = event.get('e')
+        event_ms = int(event.get('u') or event.get('E') or 0)
+        if event_type == 'outboundAccountPosition':
+            if event_ms and event_ms < self.last_update_ms:
+                return event_type   # older than the snapshot we already hold
+            for balance in event.get('B', []):
+                self.balances[balance['a']] = {'free': float(balance['f']), 'locked': float(balance['l'])}
+            self.last_update_ms = max(self.last_update_ms, event_ms)
+        elif event_type == 'balanceUpdate':
+            if event_ms and event_ms < self.last_update_ms:
+                return event_type
+            balance = self.balances.setdefault(event['a'], {'free': 0.0, 'locked': 0.0})
+            balance['free'] += float(event['d'])
+        elif event_type == 'executionReport':
+            self._apply_execution_report(event)
+        else:
+            return event_type
+        self.events += 1
+        self.updated_at = time.time()
+        return event_type
+
+    def _apply_execution_report(self, event):
+        order_id = event['i']
+        order = self.orders.pop(order_id, None) or {
+            'order_id': order_id, 'symbol': event.get('s'), 'side': event.get('S'), 'type': event.get('o'),
+            'client_order_id': event.get('c'), 'fills': 0, 'commissions': {},
+        }
+        order.update(status=event.get('X'), executed_qty=float(event.get('z', 0)),
+                     quote_qty=float(event.get('Z', 0)), update_time=event.get('T') or event.get('E'))
+        if event.get('x') == 'TRADE':
+            order['fills'] += 1
+            order['last_fill_price'] = float(event.get('L', 0))
+            order['last_fill_qty'] = float(event.get('l', 0))
+            asset = event.get('N')
+            if asset:
+                order['commissions'][asset] = order['commissions'].get(asset, 0.0) + float(event.get('n', 0))
+        if order['executed_qty']:
+            order['avg_price'] = order['quote_qty'] / order['executed_qty']
+        self.orders[order_id] = order
+        while len(self.orders) > self.order_history:
+            oldest = next(iter(self.orders))
+            if self.orders[oldest]['status'] not in TERMINAL_ORDER_STATES:
+                break   # never drop an open order
+            del self.orders[oldest]
+
+    # ------------------------------------------------------------------ reads
+    def free(self, asset):
+        return self.balances.get(asset, {}).get('free', 0.0)
+
+    def portfolio(self):
+        """Free BTC / USDT balances, same shape as trade_executor_03.get_portfolio()."""
+        return {'btc': self.free('BTC'), 'usdt': self.free('USDT')}
+
+    def open_orders(self):
+        return [order for order in self.orders.values() if order['status'] not in TERMINAL_ORDER_STATES]
+
+
+class UserDataStream:
+    def __init__(self, create_listen_key, keepalive_listen_key, fetch_account, stream_url=LIVE_STREAM_URL,
+                 cache=None, connect=None, keepalive_seconds=KEEPALIVE_SECONDS, recv_timeout=RECV_TIMEOUT_SECONDS):
+        """
+        create_listen_key(): async -> listen key; keepalive_listen_key(key): async;
+        fetch_account(): async -> get_account() response (REST snapshot);
+        connect(url): async context manager yielding a websocket (default websockets.connect).
+        """
+        self.create_listen_key = create_listen_key
+        self.keepalive_listen_key = keepalive_listen_key
+        self.fetch_account = fetch_account
+        self.stream_url = stream_url
+        self.cache = cache or AccountCache()
+        self.connect = connect or websockets.connect
+        self.keepalive_seconds = keepalive_seconds
+        self.recv_timeout = recv_timeout
+        self.connections = 0
+        self.reconnects = 0
+        self.snapshots = 0
+        self._task = None
+        self._connected = None
+
+    async def start(self, wait_connected=10.0):
+        """Run the stream in the background; waits (up to wait_connected s) for the first snapshot."""
+        if self._task is None or self._task.done():
+            self._connected = asyncio.Event()
+            self._task = asyncio.ensure_future(self.run())
+        if wait_connected:
+            try:
+                await asyncio.wait_for(self._connected.wait(), wait_connected)
+            except asyncio.TimeoutError:
+                print(f"[WARNING] User data stream not connected after {wait_connected:g}s, cache is stale")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.cache.stale = True
+
+    async def run(self):
+        """Connect / consume / reconnect until cancelled."""
+        backoff = INITIAL_BACKOFF_SECONDS
+        while True:
+            try:
+                await self._session()
+                backoff = INITIAL_BACKOFF_SECONDS   # clean end (listen key expired): reconnect at once
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.cache.stale = True
+                print(f"[WARNING] User data stream down ({type(e).__name__}: {e}), reconnecting in {backoff:g}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+    async def _session(self):
+        listen_key = await self.create_listen_key()
+        async with self.connect(self.stream_url + listen_key) as websocket:
+            self.connections += 1
+            if self.connections > 1:
+                self.reconnects += 1
+            # Snapshot after subscribing: anything missed while disconnected is covered, and
+            # events already queued on the socket are newer than or equal to it
+            self.cache.apply_account_snapshot(await self.fetch_account())
+            self.snapshots += 1
+            self.cache.stale = False
+            if self._connected is not None:
+                self._connected.set()
+            print(f"[OK] User data stream connected, balances {self.cache.portfolio()}")
+            keepalive = asyncio.ensure_future(self._keepalive(listen_key))
+            try:
+                while True:
+                    message = await asyncio.wait_for(websocket.recv(), self.recv_timeout)
+                    event = json.loads(message)
+                    if 'data' in event:   # combined-stream envelope
+                        event = event['data']
+                    if self.cache.apply_event(event) == 'listenKeyExpired':
+                        print("[WARNING] Listen key expired, reconnecting with a new one")
+                        self.cache.stale = True
+                        return
+            finally:
+                keepalive.cancel()
+
+    async def _keepalive(self, listen_key):
+        while True:
+            await asyncio.sleep(self.keepalive_seconds)
+            try:
+                await self.keepalive_listen_key(listen_key)
+            except Exception as e:
+                print(f"[WARNING] Listen key keepalive failed: {e}")
+
+    def stats(self):
+        return {'connections': self.connections, 'reconnects': self.reconnects, 'snapshots': self.snapshots,
+                'events': self.cache.events, 'stale': self.cache.stale}
+
+
+def user_data_stream_for(executor, testnet=True, **kwargs):
+    """UserDataStream using an AsyncBinanceExecutor (binance_execution.py) for listen keys and snapshots."""
+    async def create_listen_key():
+        return await (await executor.client()).stream_get_listen_key()
+
+    async def keepalive_listen_key(listen_key):
+        await (await executor.client()).stream_keepalive(listen_key)
+
+    stream_url = TESTNET_STREAM_URL if testnet else LIVE_STREAM_URL
+    return UserDataStream(create_listen_key, keepalive_listen_key, executor.get_account, stream_url, **kwargs)